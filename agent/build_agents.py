@@ -2,15 +2,17 @@
 
 """
 import os
-from typing import Optional, Dict
+import uuid
+from typing import Optional, Dict, Any, Type
 from jinja2 import Environment, FileSystemLoader
+from anthropic import AsyncAnthropic
 from datetime import datetime
 import pytz
 
 from agent.tools import SubTaskAgentToolSet
 from base import ToolSet
 from user import user_0
-from semantics import Engine, AnthropicMessageParams
+from semantics import Engine, AsyncEngine, AnthropicMessageParams, PromptCacheParams
 from navigator import Planner, JourneyMaker, JourneyMakerToolSet
 from tfl_api import (
     TFLClient,
@@ -37,6 +39,10 @@ def build_agent(
         name: str,
         tools: Optional[ToolSet] = None,
         system_prompt_kwargs: Optional[Dict] = None,
+        max_parallel_tools: int = 4,
+        prompt_cache: Optional[PromptCacheParams] = None,
+        engine_class: Type[Engine] = Engine,
+        client: Optional[Any] = None,
 ) -> Engine:
     """Build an agent with a system prompt and optional tools
 
@@ -50,6 +56,10 @@ def build_agent(
         tools: The tool set to include with the agent
         system_prompt_kwargs: The keyword arguments to pass to the system prompt template in case the
             jinja template includes variables
+        max_parallel_tools: The maximum number of tools of a response to run at once
+        prompt_cache: Optional parts of the requests to mark as cacheable with prompt caching
+        engine_class: The class of the engine, `Engine` or `AsyncEngine`
+        client: Optional client of the Anthropic API to share with other agents
 
     """
     system_prompt_template = Environment(
@@ -58,7 +68,7 @@ def build_agent(
     if system_prompt_kwargs is None:
         system_prompt_kwargs = {}
 
-    return Engine(
+    return engine_class(
         name=name,
         api_key_env_var=api_key_env_var,
         system_prompt=system_prompt_template.render(**system_prompt_kwargs),
@@ -68,6 +78,9 @@ def build_agent(
             temperature=temperature,
         ),
         tools=tools,
+        max_parallel_tools=max_parallel_tools,
+        prompt_cache=prompt_cache,
+        client=client,
     )
 
 
@@ -109,80 +122,155 @@ calendar_maker = CalendarEventMakerForPlan(
 
 
 #
-# Instantiate the various sub-task agents, which are forms of LLM engines.
-agent_handle_preferences_and_settings = build_agent(
-    name='agent to handle preference settings',
-    api_key_env_var='ANTHROPIC_API_KEY',
-    system_prompt_template='preferences_and_settings.j2',
-    model_name='claude-3-haiku-20240307',
-    max_tokens=1000,
-    temperature=0.1,
-    tools=JourneyMakerToolSet(
-        maker=maker,
-        tools_to_include=('set_default_journey_parameters',),
+# The sub-task agents are called without memory, so only their system prompts and tool definitions are worth
+# caching.
+SUBTASK_PROMPT_CACHE = PromptCacheParams(messages=False)
+
+
+def build_router(
+        maker: JourneyMaker,
+        drawer: MapDrawer,
+        calendar_maker: CalendarEventMakerForPlan,
+        map_file_path: str = 'temp.html',
+        engine_class: Type[Engine] = Engine,
+        client: Optional[Any] = None,
+) -> Engine:
+    """Build the agent that routes requests to the sub-task agents and speaks with the principal, along with
+    the sub-task agents, around a journey maker
+
+    Args:
+        maker: The journey maker the tools of the agents use
+        drawer: The drawer of the maps of plans
+        calendar_maker: The maker of the calendar events of plans
+        map_file_path: The file the map is saved to
+        engine_class: The class of the engines of the agents, `Engine` or `AsyncEngine`
+        client: Optional client of the Anthropic API the agents share
+
+    """
+    #
+    # Instantiate the various sub-task agents, which are forms of LLM engines.
+    agent_handle_preferences_and_settings = build_agent(
+        engine_class=engine_class,
+        client=client,
+        name='agent to handle preference settings',
+        api_key_env_var='ANTHROPIC_API_KEY',
+        system_prompt_template='preferences_and_settings.j2',
+        model_name='claude-3-haiku-20240307',
+        max_tokens=1000,
+        temperature=0.1,
+        prompt_cache=SUBTASK_PROMPT_CACHE,
+        tools=JourneyMakerToolSet(
+            maker=maker,
+            tools_to_include=('set_default_journey_parameters',),
+        )
     )
-)
-agent_handle_journey_plans = build_agent(
-    name='agent to compute journey plans',
-    api_key_env_var='ANTHROPIC_API_KEY',
-    system_prompt_template='journey_plans.j2',
-    system_prompt_kwargs=user_0.get('user location short-hands', None),
-    model_name='claude-3-haiku-20240307',
-    max_tokens=1000,
-    temperature=0.1,
-    tools=JourneyMakerToolSet(
-        maker=maker,
-        tools_to_include=('compute_journey_plans',
-                          'get_computed_journey',
-                          'get_computed_journey_plan'),
+    agent_handle_journey_plans = build_agent(
+        engine_class=engine_class,
+        client=client,
+        name='agent to compute journey plans',
+        api_key_env_var='ANTHROPIC_API_KEY',
+        system_prompt_template='journey_plans.j2',
+        system_prompt_kwargs=user_0.get('user location short-hands', None),
+        model_name='claude-3-haiku-20240307',
+        max_tokens=1000,
+        temperature=0.1,
+        prompt_cache=SUBTASK_PROMPT_CACHE,
+        tools=JourneyMakerToolSet(
+            maker=maker,
+            tools_to_include=('compute_journey_plans',
+                              'compute_departure_profile',
+                              'get_computed_journey',
+                              'get_computed_journey_plan'),
+        )
     )
-)
-agent_handle_output_artefacts = build_agent(
-    name='agent to generate output artifacts',
-    api_key_env_var='ANTHROPIC_API_KEY',
-    system_prompt_template='output_artefacts.j2',
-    model_name='claude-3-5-sonnet-20241022',
-#    model_name='claude-3-haiku-20240307',
-    max_tokens=1000,
-    temperature=0.1,
-    tools=OutputArtefactsToolSet(
-        drawer=map_drawer,
-        calendar_maker=calendar_maker,
-        maker=maker,
-        tools_to_include=('draw_map_for_plan',
-                          'create_ics_file_for_plan',
-                          'get_computed_journey',
-                          'get_computed_journey_plan'),
+    agent_handle_output_artefacts = build_agent(
+        engine_class=engine_class,
+        client=client,
+        name='agent to generate output artifacts',
+        api_key_env_var='ANTHROPIC_API_KEY',
+        system_prompt_template='output_artefacts.j2',
+        model_name='claude-3-5-sonnet-20241022',
+#        model_name='claude-3-haiku-20240307',
+        max_tokens=1000,
+        temperature=0.1,
+        prompt_cache=SUBTASK_PROMPT_CACHE,
+        tools=OutputArtefactsToolSet(
+            drawer=drawer,
+            calendar_maker=calendar_maker,
+            maker=maker,
+            map_file_path=map_file_path,
+            tools_to_include=('draw_map_for_plan',
+                              'create_ics_file_for_plan',
+                              'get_computed_journey',
+                              'get_computed_journey_plan'),
+        )
     )
-)
-
 
-#
-# Instantiate the agent that will route requests to the appropriate sub-task agent as well as
-# speak with the principal.
-date_now_in_london = datetime.now(pytz.timezone('Europe/London'))
-date_str = date_now_in_london.strftime('%Y-%m-%d')
-agent_router = build_agent(
-    name='agent to route requests and speak with the principal',
-    api_key_env_var='ANTHROPIC_API_KEY',
-    system_prompt_template='router.j2',
-    system_prompt_kwargs={
-        'year_today': '2024',
-        'date_today': date_str,
-        'user_name': user_0.get('name', None),
-        'user_shorthands': user_0.get('user location short-hands', None),
-    },
-    model_name='claude-3-5-sonnet-20241022',
-    max_tokens=1000,
-    temperature=0.5,
-    tools=SubTaskAgentToolSet(
-        subtask_agents={
-            'preferences_and_settings': agent_handle_preferences_and_settings,
-            'journey_planner': agent_handle_journey_plans,
-            'output_artefacts': agent_handle_output_artefacts,
+    #
+    # Instantiate the agent that will route requests to the appropriate sub-task agent as well as
+    # speak with the principal.
+    date_now_in_london = datetime.now(pytz.timezone('Europe/London'))
+    date_str = date_now_in_london.strftime('%Y-%m-%d')
+    return build_agent(
+        engine_class=engine_class,
+        client=client,
+        name='agent to route requests and speak with the principal',
+        api_key_env_var='ANTHROPIC_API_KEY',
+        system_prompt_template='router.j2',
+        system_prompt_kwargs={
+            'year_today': '2024',
+            'date_today': date_str,
+            'user_name': user_0.get('name', None),
+            'user_shorthands': user_0.get('user location short-hands', None),
         },
-        tools_to_include=('preferences_and_settings',
-                          'journey_planner',
-                          'output_artefacts'),
-    ),
-)
+        model_name='claude-3-5-sonnet-20241022',
+        max_tokens=1000,
+        temperature=0.5,
+        prompt_cache=PromptCacheParams(),
+        tools=SubTaskAgentToolSet(
+            subtask_agents={
+                'preferences_and_settings': agent_handle_preferences_and_settings,
+                'journey_planner': agent_handle_journey_plans,
+                'output_artefacts': agent_handle_output_artefacts,
+            },
+            tools_to_include=('preferences_and_settings',
+                              'journey_planner',
+                              'output_artefacts'),
+        ),
+    )
+
+
+agent_router = build_router(maker, map_drawer, calendar_maker)
+
+
+def build_async_router(client: Optional[AsyncAnthropic] = None,
+                       conversation_id: Optional[str] = None,
+                       ) -> AsyncEngine:
+    """Build an asynchronous router agent for one conversation, with sub-task agents, a journey maker, a map
+    drawer and a calendar event maker of its own, such that many conversations can be served on one event
+    loop. The map and calendar files of the conversation are written to the folder of this module, named by
+    the identifier of the conversation. The conversations share the planner, and so its client of the TfL API
+    and its pool of connections, and optionally the client of the Anthropic API.
+
+    Args:
+        client: Optional asynchronous client of the Anthropic API to share between conversations
+        conversation_id: Optional identifier of the conversation; a random one by default
+
+    """
+    if conversation_id is None:
+        conversation_id = uuid.uuid4().hex
+    output_folder = os.path.dirname(__file__)
+    return build_router(
+        maker=JourneyMaker(
+            planner=planner,
+            default_params=maker.default_params.model_copy(),
+        ),
+        drawer=MapDrawer(),
+        calendar_maker=CalendarEventMakerForPlan(
+            file_path=os.path.join(output_folder, f'calendar_event_{conversation_id}.ics'),
+            default_event_name=calendar_maker.event_name,
+        ),
+        map_file_path=os.path.join(output_folder, f'map_{conversation_id}.html'),
+        engine_class=AsyncEngine,
+        client=client,
+    )
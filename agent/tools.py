@@ -2,10 +2,12 @@
 
 """
 import os
-from typing import Optional, Sequence, Dict, Any
+import asyncio
+import threading
+from typing import Optional, Sequence, Dict, Any, Union, Awaitable
 
 from base import ToolSet
-from semantics import Engine
+from semantics import Engine, AsyncEngine
 
 TOOL_SPEC_FILE = os.path.join(os.path.dirname(__file__), 'tools.json')
 
@@ -13,12 +15,23 @@ TOOL_SPEC_FILE = os.path.join(os.path.dirname(__file__), 'tools.json')
 class SubTaskAgentToolSet(ToolSet):
     """Sub-task agent tool set
 
+    The sub-task agents of different tools can run at the same time, but calls to the same agent are run one
+    at a time, since an agent holds the state of its conversation. The preferences and settings are not
+    changed, nor journeys planned, while other tools run, since the other tools read the preferences and the
+    journeys of the journey maker.
+
+    The sub-task agents can be asynchronous engines, in which case the tools return awaitables of their
+    outputs, which `ToolSet.acall` awaits, such that an asynchronous router awaits its sub-task agents on the
+    same event loop.
+
     Args:
         subtask_agents: The sub-task agents to use as tools
         tools_to_include: The tools to include in the tool set
         tool_spec_file: The file with the tool specifications
 
     """
+    non_parallel_tools = ('preferences_and_settings', 'journey_planner')
+
     def __init__(self,
                  subtask_agents: Dict[str, Engine],
                  tools_to_include=Optional[Sequence[str]],
@@ -26,6 +39,8 @@ class SubTaskAgentToolSet(ToolSet):
                  ):
         super().__init__(tool_spec_file, tools_to_include)
         self.subtask_agents = subtask_agents
+        self._agent_locks = {agent_key: threading.Lock() for agent_key in subtask_agents}
+        self._agent_async_locks = {agent_key: asyncio.Lock() for agent_key in subtask_agents}
 
         # The sub-task agents are only going to create (with LLM) and execute a call to the underlying tool
         # function, not create any conversational output or recall previous outputs.
@@ -35,8 +50,15 @@ class SubTaskAgentToolSet(ToolSet):
             'with_memory': False,
         }
 
-    def _invoke_engine(self, agent_key: str, **kwargs) -> str:
-        return self.subtask_agents[agent_key].process(**kwargs)
+    def _invoke_engine(self, agent_key: str, **kwargs) -> Union[str, Awaitable[str]]:
+        if isinstance(self.subtask_agents[agent_key], AsyncEngine):
+            return self._ainvoke_engine(agent_key, **kwargs)
+        with self._agent_locks[agent_key]:
+            return self.subtask_agents[agent_key].process(**kwargs)
+
+    async def _ainvoke_engine(self, agent_key: str, **kwargs) -> str:
+        async with self._agent_async_locks[agent_key]:
+            return await self.subtask_agents[agent_key].process(**kwargs)
 
     def preferences_and_settings(self,
                                  input_prompt: str,
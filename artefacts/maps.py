@@ -2,23 +2,31 @@
 
 """
 import os
+from typing import Optional
 import itertools
 import folium
 import seaborn as sns
-import ast
 import webbrowser
 
 from navigator import Plan
+from navigator.geometry import simplify_douglas_peucker
 
 
 
 class MapDrawer:
     """Bla bla
 
+    Args:
+        color_palette: The palette of the colors of the legs
+        simplify_tolerance: Optional tolerance in metres to simplify the paths of the legs to before they are
+            drawn, which shrinks the map file
+
     """
     def __init__(self,
                  color_palette: str = 'tab10',
+                 simplify_tolerance: Optional[float] = None,
                  ):
+        self.simplify_tolerance = simplify_tolerance
         self._color_cycle = itertools.cycle(sns.color_palette(color_palette))
         self.m = folium.Map()
 
@@ -27,16 +35,15 @@ class MapDrawer:
 
     def make_map_for_plan(self, plan: Plan):
         for leg in plan.legs:
-            if not leg.path:
+            if leg.path is None or len(leg.path) == 0:
                 raise ValueError('No path data available for leg')
 
-            try:
-                path = ast.literal_eval(leg.path)
-            except ValueError:
-                break
+            path = leg.path
+            if self.simplify_tolerance is not None:
+                path = simplify_douglas_peucker(path, self.simplify_tolerance)
 
             folium.PolyLine(
-                path,
+                path.tolist(),
                 color=self.get_color(),
                 weight=3,
             ).add_to(self.m)
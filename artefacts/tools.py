@@ -18,16 +18,32 @@ class OutputArtefactsToolSet(ToolSet):
 
     The journey data is available from the `JourneyMaker` object and requires two indices to access.
 
+    The drawer and calendar maker hold the map and event being made, and write them to fixed files, so these
+    tools are not run at the same time as other tools. Tool sets used at the same time, as by concurrent
+    conversations, need drawers, calendar makers and file paths of their own.
+
+    Args:
+        maker: The journey maker
+        drawer: Optional drawer of the maps of plans
+        calendar_maker: Optional maker of the calendar events of plans
+        tools_to_include: Optional names of the tools to include
+        tool_spec_file: The file of the tool specifications
+        map_file_path: The file the map is saved to
+
     """
+    non_parallel_tools = ('draw_map_for_plan', 'create_ics_file_for_plan')
+
     def __init__(self,
                  maker: JourneyMaker,
                  drawer: Optional[MapDrawer] = None,
                  calendar_maker: Optional[CalendarEventMakerForPlan] = None,
                  tools_to_include: Sequence[str] = None,
                  tool_spec_file: str = TOOL_SPEC_FILE,
+                 map_file_path: str = 'temp.html',
                  ):
         super().__init__(tools_to_include=tools_to_include, tool_spec_file=tool_spec_file)
         self.drawer = drawer
+        self.map_file_path = map_file_path
         self.calendar_maker = calendar_maker
         self.journey_maker = maker
 
@@ -36,10 +52,10 @@ class OutputArtefactsToolSet(ToolSet):
             raise ValueError('Map drawer not set, cannot draw map.')
 
         self.drawer.make_map_for_plan(self.journey_maker[journey_index][plan_index])
-        self.drawer.save_map('temp.html')
-        ret_message = 'Map created and saved to temp.html.'
+        self.drawer.save_map(self.map_file_path)
+        ret_message = f'Map created and saved to {self.map_file_path}.'
         if browser_display:
-            self.drawer.display_map('temp.html')
+            self.drawer.display_map(self.map_file_path)
             ret_message += ' Browser opened with map.'
 
         return ret_message
@@ -59,7 +75,7 @@ class OutputArtefactsToolSet(ToolSet):
         return f'ICS file created, see {self.calendar_maker.file_path}'
 
     def get_computed_journey(self, journey_index: int) -> str:
-        return self.journey_maker[journey_index].to_json(indent=4)
+        return self.journey_maker.views.journey_json(journey_index)
 
     def get_computed_journey_plan(self, journey_index: int, plan_index: int) -> str:
-        return self.journey_maker[journey_index][plan_index].to_json(indent=4)
+        return self.journey_maker.views.plan_json(journey_index, plan_index)
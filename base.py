@@ -3,9 +3,19 @@
 """
 from typing import Sequence, Dict, Optional, Any, List
 import json
+import asyncio
+import inspect
 
 
 class ToolSet:
+    """Set of tools, the methods of which are called by name with the input the LLM model generates.
+
+    The tools of a response can run concurrently. Tools that must not run at the same time as other tools,
+    such as tools that change state other tools read, are named in `non_parallel_tools`.
+
+    """
+    non_parallel_tools: Sequence[str] = ()
+
     def __init__(self,
                  tool_spec_file: Optional[str] = None,
                  tools_to_include: Optional[Sequence[str]] = None,
@@ -25,6 +35,26 @@ class ToolSet:
             raise ValueError(f'Unknown tool name {tool_name}')
         return _tool_exec(**kwargs)
 
+    async def acall(self, tool_name: str, **kwargs) -> str:
+        """Call the tool from an event loop. Tools that are coroutines are awaited, and other tools run in a
+        thread; if such a tool returns an awaitable, it is awaited in turn.
+
+        """
+        try:
+            _tool_exec = getattr(self, tool_name)
+        except AttributeError:
+            raise ValueError(f'Unknown tool name {tool_name}')
+        if inspect.iscoroutinefunction(_tool_exec):
+            return await _tool_exec(**kwargs)
+        output = await asyncio.to_thread(_tool_exec, **kwargs)
+        if inspect.isawaitable(output):
+            output = await output
+        return output
+
+    def is_parallel(self, tool_name: str) -> bool:
+        """Whether the tool can run at the same time as other tools."""
+        return tool_name not in self.non_parallel_tools
+
     @property
     def tools_spec(self) -> List[Dict[str, Any]]:
         return self._tools
@@ -0,0 +1,119 @@
+"""Synthetic payloads that mimic the structure of the TfL Journey/JourneyResults responses.
+
+"""
+import random
+from datetime import datetime, timedelta
+
+_MODES = ('walking', 'bus', 'tube', 'cycle', 'elizabeth-line')
+
+
+def _line_string(rng, n_points, lat, lon):
+    points = []
+    for _ in range(n_points):
+        lat += rng.uniform(-0.0005, 0.0005)
+        lon += rng.uniform(-0.0005, 0.0005)
+        points.append(f'[{lat:.5f},{lon:.5f}]')
+    return '[' + ','.join(points) + ']', lat, lon
+
+
+def make_journey_payload(n_journeys: int = 5,
+                         n_legs: int = 4,
+                         n_steps: int = 8,
+                         n_path_points: int = 200,
+                         seed: int = 0,
+                         ):
+    """Make a payload with status 200 of the Journey/JourneyResults endpoint, including some of the fields
+    that the payload processor does not retrieve, such as fares and route options.
+
+    """
+    rng = random.Random(seed)
+    t0 = datetime(2024, 11, 11, 8, 0)
+    journeys = []
+    for j in range(n_journeys):
+        lat, lon = 51.5237, -0.1585
+        t = t0 + timedelta(minutes=j * 3)
+        legs = []
+        for l in range(n_legs):
+            duration = rng.randint(2, 20)
+            line_string, lat, lon = _line_string(rng, n_path_points, lat, lon)
+            mode = _MODES[rng.randrange(len(_MODES))]
+            legs.append({
+                '$type': 'Tfl.Api.Presentation.Entities.JourneyPlanner.Leg, Tfl.Api.Presentation.Entities',
+                'duration': duration,
+                'departureTime': t.strftime('%Y-%m-%dT%H:%M:%S'),
+                'arrivalTime': (t + timedelta(minutes=duration)).strftime('%Y-%m-%dT%H:%M:%S'),
+                'instruction': {
+                    'summary': f'Leg {l} summary',
+                    'detailed': f'Take the {mode} towards stop {l + 1}',
+                    'steps': [
+                        {
+                            'description': f'Street {s} for {rng.randint(10, 400)} metres',
+                            'turnDirection': 'STRAIGHT',
+                            'streetName': f'Street {s}',
+                            'distance': rng.randint(10, 400),
+                            'cumulativeDistance': s * 100,
+                            'skyDirection': rng.randint(0, 359),
+                            'skyDirectionDescription': 'north',
+                            'cumulativeTravelTime': s * 60,
+                            'latitude': lat,
+                            'longitude': lon,
+                            'pathAttribute': {},
+                            'descriptionHeading': 'Continue along ',
+                            'trackType': 'None',
+                        } for s in range(n_steps)
+                    ],
+                },
+                'departurePoint': {'commonName': f'Stop {l}', 'lat': lat, 'lon': lon, 'placeType': 'StopPoint'},
+                'arrivalPoint': {'commonName': f'Stop {l + 1}', 'lat': lat, 'lon': lon, 'placeType': 'StopPoint'},
+                'path': {'lineString': line_string, 'stopPoints': [], 'elevation': []},
+                'routeOptions': [{'name': f'Route {l}', 'directions': ['Somewhere'], 'lineIdentifier': {}}],
+                'mode': {'id': mode, 'name': mode, 'type': 'Mode', 'routeType': 'Unknown', 'status': 'Unknown'},
+                'disruptions': [],
+                'plannedWorks': [],
+                'isDisrupted': False,
+                'hasFixedLocations': True,
+            })
+            t += timedelta(minutes=duration)
+        journeys.append({
+            'startDateTime': legs[0]['departureTime'],
+            'duration': sum(leg['duration'] for leg in legs),
+            'arrivalDateTime': legs[-1]['arrivalTime'],
+            'legs': legs,
+            'fare': {'totalCost': 280, 'fares': [{'lowZone': 1, 'highZone': 2, 'cost': 280}] * 3, 'caveats': []},
+        })
+    return {
+        '$type': 'Tfl.Api.Presentation.Entities.JourneyPlanner.ItineraryResult, Tfl.Api.Presentation.Entities',
+        'journeys': journeys,
+        'lines': [],
+        'journeyVector': {'from': '1000', 'to': '1001', 'via': '', 'uri': '/journey/journeyresults/1000/to/1001'},
+        'searchCriteria': {'dateTime': '2024-11-11T08:00:00', 'dateTimeType': 'Departing'},
+        'recommendedMaxAgeMinutes': 5,
+    }
+
+
+def make_disambiguation_payload(n_from_options: int = 3, n_to_options: int = 0, seed: int = 0):
+    """Make a payload with status 300 of the Journey/JourneyResults endpoint for ambiguous locations."""
+    rng = random.Random(seed)
+
+    def _disambiguation(n_options):
+        if n_options == 0:
+            return {'matchStatus': 'identified'}
+        return {
+            'matchStatus': 'list',
+            'disambiguationOptions': [
+                {
+                    'parameterValue': f'{1000 + k}',
+                    'uri': f'/journey/journeyresults/{1000 + k}',
+                    'place': {'icsCode': f'{1000 + k}', 'commonName': f'Place {k}',
+                              'lat': 51.5 + rng.uniform(-0.05, 0.05), 'lon': -0.1 + rng.uniform(-0.05, 0.05)},
+                    'matchQuality': 1000 - 10 * k,
+                } for k in range(n_options)
+            ],
+        }
+
+    return {
+        'toLocationDisambiguation': _disambiguation(n_to_options),
+        'fromLocationDisambiguation': _disambiguation(n_from_options),
+        'viaLocationDisambiguation': {'matchStatus': 'empty'},
+        'recommendedMaxAgeMinutes': 1440,
+    }
@@ -0,0 +1,64 @@
+"""Micro-benchmark of the decoding of leg paths, with `decode_line_string` against `ast.literal_eval` and
+`json.loads`, in time per path and memory held per decoded path.
+
+    python -m benchmarks.bench_path_decoding --n-points 200
+
+"""
+import ast
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from tfl_api.linestring import decode_line_string, encode_line_string
+from benchmarks._payloads import _line_string
+
+
+def _time_per_call(fn, line_string, repeat):
+    t_start = time.perf_counter()
+    for _ in range(repeat):
+        fn(line_string)
+    return (time.perf_counter() - t_start) / repeat
+
+
+def _memory_held(fn, line_string):
+    tracemalloc.start()
+    value = fn(line_string)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-points', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    line_string, _, _ = _line_string(random.Random(0), args.n_points, 51.5, -0.1)
+    decoders = {
+        'ast.literal_eval': ast.literal_eval,
+        'json.loads': json.loads,
+        'decode float64': decode_line_string,
+        'decode float32': lambda s: decode_line_string(s, dtype=np.float32),
+    }
+    assert np.array_equal(decode_line_string(line_string), np.array(ast.literal_eval(line_string)))
+    assert np.array_equal(decode_line_string(encode_line_string(decode_line_string(line_string))),
+                          decode_line_string(line_string))
+
+    t_baseline = _time_per_call(ast.literal_eval, line_string, args.repeat)
+    print(f'path of {args.n_points} points, {len(line_string)} characters')
+    for name, fn in decoders.items():
+        t = _time_per_call(fn, line_string, args.repeat)
+        print(f'  {name:17s} {t * 1e6:9.1f} us  {t_baseline / t:6.1f}x  {_memory_held(fn, line_string):8d} bytes held')
+
+    t = _time_per_call(encode_line_string, decode_line_string(line_string), args.repeat)
+    print(f'  {"encode":17s} {t * 1e6:9.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Micro-benchmark of the extraction of journeys from large multi-journey payloads, with the compiled
+accessor plan of `JourneyPlannerSearchPayloadProcessor` against the previous look-up per leg and field.
+
+    python -m benchmarks.bench_payload_processor --n-journeys 20 --n-legs 6
+
+"""
+import time
+import argparse
+
+from tfl_api import JourneyPlannerSearchPayloadProcessor
+from tfl_api.journey_planner import JOURNEY_MAIN_DATA, JOURNEY_LEG_DATA, JOURNEY_STEP_DATA
+from benchmarks._payloads import make_journey_payload
+
+
+def _get_nested_value(d, path):
+    return _get_nested_value(d.get(path[0], {}), path[1:]) if path else d
+
+
+def _legacy_journeys(payload, leg_data_to_retrieve, step_data_to_retrieve):
+    """The extraction before the accessor plan was compiled, kept for comparison."""
+    for journey in payload['journeys']:
+        j_data = {
+            field.target_field: _get_nested_value(journey, field.source_path.split('.'))
+            for field in JOURNEY_MAIN_DATA
+        }
+        legs = []
+        for leg in journey['legs']:
+            leg_data = {}
+            for leg_data_key in leg_data_to_retrieve:
+                source_path = next(m.source_path for m in JOURNEY_LEG_DATA if m.target_field == leg_data_key)
+                leg_data_value = _get_nested_value(leg, source_path.split('.'))
+                if leg_data_key == 'instruction_steps':
+                    steps = []
+                    for step in leg_data_value:
+                        step_data = {}
+                        for step_data_key in step_data_to_retrieve:
+                            step_path = next(m.source_path for m in JOURNEY_STEP_DATA if m.target_field == step_data_key)
+                            step_data[step_data_key] = _get_nested_value(step, step_path.split('.'))
+                        steps.append(step_data)
+                    leg_data_value = steps
+                leg_data[leg_data_key] = leg_data_value
+            legs.append(leg_data)
+        j_data['legs'] = legs
+        yield j_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-journeys', type=int, default=20)
+    parser.add_argument('--n-legs', type=int, default=6)
+    parser.add_argument('--n-steps', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    payload = make_journey_payload(args.n_journeys, args.n_legs, args.n_steps, n_path_points=10)
+    leg_data = ('start_date_time', 'end_date_time', 'duration', 'mode_transport', 'departure_point',
+                'arrival_point', 'instruction', 'instruction_steps', 'path')
+    step_data = ('description', 'description_heading', 'distance', 'direction')
+    processor = JourneyPlannerSearchPayloadProcessor(leg_data_to_retrieve=leg_data, step_data_to_retrieve=step_data)
+    assert list(processor.journeys(payload)) == list(_legacy_journeys(payload, leg_data, step_data))
+
+    t_start = time.perf_counter()
+    for _ in range(args.repeat):
+        list(_legacy_journeys(payload, leg_data, step_data))
+    t_legacy = (time.perf_counter() - t_start) / args.repeat
+
+    t_start = time.perf_counter()
+    for _ in range(args.repeat):
+        list(processor.journeys(payload))
+    t_compiled = (time.perf_counter() - t_start) / args.repeat
+
+    print(f'{args.n_journeys} journeys x {args.n_legs} legs x {args.n_steps} steps')
+    print(f'  look-up per field: {t_legacy * 1000:8.3f} ms')
+    print(f'  compiled plan:     {t_compiled * 1000:8.3f} ms')
+    print(f'  speedup:           {t_legacy / t_compiled:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
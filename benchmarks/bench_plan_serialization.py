@@ -0,0 +1,137 @@
+"""Benchmark of the memory per stored plan and of the serialization throughput of the slotted data model and
+its single-pass serializer, against the previous model of plain dataclasses serialized with `asdict`, a
+recursive filter of None values and `json.dumps`.
+
+    python -m benchmarks.bench_plan_serialization --n-plans 500
+
+"""
+import json
+import time
+import argparse
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Optional, Sequence
+
+import numpy as np
+
+from tfl_api import JourneyPlannerSearchPayloadProcessor
+from tfl_api.linestring import encode_line_string
+from navigator.planner import Plan, _decode_path
+from benchmarks._payloads import make_journey_payload
+
+
+@dataclass
+class _LegacyStep:
+    description_heading: Optional[str] = None
+    description: Optional[str] = None
+    distance: Optional[str] = None
+    direction: Optional[str] = None
+
+
+@dataclass
+class _LegacyLeg:
+    start_date_time: str
+    end_date_time: str
+    departure_point: str
+    arrival_point: str
+    mode_transport: str
+    path: Optional[np.ndarray] = None
+    duration: Optional[int] = None
+    instruction: Optional[str] = None
+    instruction_steps: Sequence[_LegacyStep] = None
+
+
+@dataclass
+class _LegacyPlan:
+    start_date_time: str
+    end_date_time: str
+    legs: Sequence[_LegacyLeg]
+    duration: Optional[int] = None
+
+
+def _filter_none(value):
+    if isinstance(value, np.ndarray):
+        return encode_line_string(value)
+    if isinstance(value, list):
+        return [_filter_none(v) for v in value]
+    elif isinstance(value, dict):
+        return {k: _filter_none(v) for k, v in value.items() if v is not None}
+    return value
+
+
+def _legacy_plan(journey):
+    return _LegacyPlan(
+        start_date_time=journey.get('start_date_time'),
+        end_date_time=journey.get('end_date_time'),
+        duration=journey.get('duration'),
+        legs=[
+            _LegacyLeg(
+                start_date_time=leg.get('start_date_time'),
+                end_date_time=leg.get('end_date_time'),
+                duration=leg.get('duration'),
+                instruction=leg.get('instruction'),
+                departure_point=leg.get('departure_point'),
+                arrival_point=leg.get('arrival_point'),
+                mode_transport=leg.get('mode_transport'),
+                path=_decode_path(leg.get('path')),
+                instruction_steps=[_LegacyStep(**step) for step in leg.get('instruction_steps', [])],
+            ) for leg in journey['legs']
+        ]
+    )
+
+
+def _memory_per_plan(make, journeys):
+    tracemalloc.start()
+    plans = [make(journey) for journey in journeys]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(plans), plans
+
+
+def _throughput(serialize, plans, repeat):
+    t_start = time.perf_counter()
+    for _ in range(repeat):
+        for plan in plans:
+            serialize(plan)
+    return repeat * len(plans) / (time.perf_counter() - t_start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-plans', type=int, default=500)
+    parser.add_argument('--n-legs', type=int, default=4)
+    parser.add_argument('--n-steps', type=int, default=8)
+    parser.add_argument('--n-path-points', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payload = make_journey_payload(args.n_plans, args.n_legs, args.n_steps, n_path_points=args.n_path_points)
+    processor = JourneyPlannerSearchPayloadProcessor(
+        leg_data_to_retrieve=('start_date_time', 'end_date_time', 'duration', 'mode_transport', 'departure_point',
+                              'arrival_point', 'instruction', 'instruction_steps', 'path'),
+    )
+    journeys = list(processor.journeys(payload))
+
+    legacy_memory, legacy_plans = _memory_per_plan(_legacy_plan, journeys)
+    memory, plans = _memory_per_plan(Plan.create_from_payload, journeys)
+
+    def _legacy_to_json(plan):
+        return json.dumps(_filter_none(asdict(plan)), indent=4)
+
+    def _to_json(plan):
+        return plan.to_json(indent=4)
+
+    assert all(_legacy_to_json(a) == _to_json(b) for a, b in zip(legacy_plans, plans))
+    legacy_rate = _throughput(_legacy_to_json, legacy_plans, args.repeat)
+    rate = _throughput(_to_json, plans, args.repeat)
+
+    print(f'{args.n_plans} plans x {args.n_legs} legs x {args.n_steps} steps, {args.n_path_points} path points')
+    print(f'  memory per plan, dataclasses:   {legacy_memory:10.0f} bytes')
+    print(f'  memory per plan, slotted:       {memory:10.0f} bytes')
+    print(f'  to_json, asdict + json.dumps:   {legacy_rate:10.0f} plans/s')
+    print(f'  to_json, single-pass:           {rate:10.0f} plans/s')
+    print(f'  speedup:                        {rate / legacy_rate:10.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Offline benchmark of journey planning, with responses from the TfL API replayed from recorded cassettes.
+
+Cassettes are recorded by running the planner with a `RecordingTFLClient`, for example:
+
+    store = CassetteStore('cassettes')
+    client = RecordingTFLClient(TFLClient(env_var_app_key='TFL_API_KEY'), store)
+    Planner(planner=JourneyPlannerSearch(client), payload_processor=...).make_plan(...)
+
+The benchmark then replays every recorded journey search through a local stand-in server, with optional
+injected latency and errors:
+
+    python -m benchmarks.bench_replay_planner cassettes --latency 0.05 --repeat 5
+
+"""
+import os
+import time
+import argparse
+import statistics
+from urllib.parse import parse_qsl
+
+from tfl_api import (
+    TFLClient,
+    JourneyPlannerSearchParams,
+    JourneyPlannerSearch,
+    JourneyPlannerSearchPayloadProcessor,
+)
+from tfl_api.cassette import CassetteStore, ReplayServer
+from navigator import Planner
+
+_JOURNEY_ENDPOINT = 'Journey/JourneyResults/'
+
+
+def _journey_requests(store: CassetteStore):
+    """Parse the recorded journey searches into the locations and parameters of the search."""
+    for key in store.keys():
+        if not key.startswith(_JOURNEY_ENDPOINT):
+            continue
+        path, _, query = key.partition('?')
+        from_loc, _, to_loc = path[len(_JOURNEY_ENDPOINT):].partition('/to/')
+        params = {k: v.split(',') if k == 'Mode' else v for k, v in parse_qsl(query)}
+        yield from_loc, to_loc, JourneyPlannerSearchParams(**params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('cassette_dir')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    store = CassetteStore(args.cassette_dir)
+    requests_to_replay = list(_journey_requests(store))
+    os.environ.setdefault('TFL_API_KEY', 'replay')
+
+    with ReplayServer(store,
+                      latency=args.latency,
+                      latency_jitter=args.latency_jitter,
+                      error_rate=args.error_rate,
+                      seed=args.seed) as server:
+        client = TFLClient(env_var_app_key='TFL_API_KEY', base_url=server.base_url)
+        planner = Planner(
+            planner=JourneyPlannerSearch(client),
+            payload_processor=JourneyPlannerSearchPayloadProcessor(
+                leg_data_to_retrieve=('start_date_time', 'end_date_time', 'mode_transport', 'instruction', 'path'),
+            ),
+        )
+
+        timings, n_errors = [], 0
+        for _ in range(args.repeat):
+            for from_loc, to_loc, params in requests_to_replay:
+                t_start = time.perf_counter()
+                try:
+                    planner.make_plan(from_loc, to_loc, params)
+                except Exception:
+                    n_errors += 1
+                timings.append(time.perf_counter() - t_start)
+
+    print(f'Replayed {len(requests_to_replay)} journey searches {args.repeat} times')
+    if timings:
+        timings.sort()
+        print(f'  mean: {statistics.mean(timings) * 1000:.2f} ms')
+        print(f'  p50:  {timings[len(timings) // 2] * 1000:.2f} ms')
+        print(f'  p95:  {timings[int(len(timings) * 0.95)] * 1000:.2f} ms')
+    print(f'  errors: {n_errors}')
+    print(f'  pool: {client.pool_stats}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark of the streaming, projection-driven extraction of journey payloads against parsing the full
+JSON document, in terms of parse time and peak memory.
+
+    python -m benchmarks.bench_streaming_extraction --n-journeys 10 --n-path-points 500
+
+"""
+import io
+import json
+import time
+import argparse
+import tracemalloc
+
+from tfl_api import JourneyPlannerSearchPayloadProcessor
+from tfl_api.projection import extract_projected
+from benchmarks._payloads import make_journey_payload
+
+
+def _full(raw: bytes, processor):
+    return list(processor.journeys(json.loads(raw)))
+
+
+def _streamed(raw: bytes, processor):
+    return list(processor.journeys(extract_projected(io.BytesIO(raw), processor.projection)))
+
+
+def _measure(fn, raw, processor, repeat):
+    tracemalloc.start()
+    fn(raw, processor)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    t_start = time.perf_counter()
+    for _ in range(repeat):
+        fn(raw, processor)
+    return (time.perf_counter() - t_start) / repeat, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-journeys', type=int, default=5)
+    parser.add_argument('--n-legs', type=int, default=4)
+    parser.add_argument('--n-steps', type=int, default=10)
+    parser.add_argument('--n-path-points', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    raw = json.dumps(make_journey_payload(args.n_journeys, args.n_legs, args.n_steps, args.n_path_points)).encode()
+    processor = JourneyPlannerSearchPayloadProcessor(
+        leg_data_to_retrieve=('start_date_time', 'end_date_time', 'mode_transport', 'departure_point',
+                              'arrival_point', 'instruction', 'instruction_steps', 'path'),
+        step_data_to_retrieve=('description', 'description_heading'),
+    )
+    assert _full(raw, processor) == _streamed(raw, processor)
+
+    print(f'Payload size: {len(raw) / 1024:.1f} KB')
+    for name, fn in (('full json.loads', _full), ('streamed projection', _streamed)):
+        t, peak = _measure(fn, raw, processor, args.repeat)
+        print(f'  {name:20s} time: {t * 1000:8.2f} ms   peak memory: {peak / 1024:8.1f} KB')
+
+
+if __name__ == '__main__':
+    main()
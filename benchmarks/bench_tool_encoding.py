@@ -0,0 +1,48 @@
+"""Benchmark of the approximate tokens of the tool results of journeys and plans in the compact encoding,
+against the indented JSON the tools returned before. Tokens are estimated at four characters per token.
+
+    python -m benchmarks.bench_tool_encoding --n-plans 5
+
+"""
+import argparse
+
+from tfl_api import JourneyPlannerSearchPayloadProcessor
+from navigator.planner import Plan, Journey
+from navigator.encoding import CompactEncoding, token_savings
+from benchmarks._payloads import make_journey_payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-plans', type=int, default=5)
+    parser.add_argument('--n-legs', type=int, default=4)
+    parser.add_argument('--n-steps', type=int, default=8)
+    parser.add_argument('--n-path-points', type=int, default=200)
+    parser.add_argument('--token-budget', type=int, default=1000)
+    args = parser.parse_args()
+
+    payload = make_journey_payload(args.n_plans, args.n_legs, args.n_steps, n_path_points=args.n_path_points)
+    processor = JourneyPlannerSearchPayloadProcessor(
+        leg_data_to_retrieve=('start_date_time', 'end_date_time', 'duration', 'mode_transport', 'departure_point',
+                              'arrival_point', 'instruction', 'instruction_steps', 'path'),
+    )
+    journey = Journey(plans=[Plan.create_from_payload(journey) for journey in processor.journeys(payload)])
+    verbose = [journey.to_json(indent=4)]
+
+    encodings = {
+        'compact, no paths': CompactEncoding(),
+        'compact, simplified paths': CompactEncoding(path='simplified'),
+        'compact, full paths': CompactEncoding(path='full'),
+        'compact, max 2 steps': CompactEncoding(max_steps=2),
+        f'compact, budget {args.token_budget}': CompactEncoding(token_budget=args.token_budget),
+    }
+    print(f'journey of {args.n_plans} plans x {args.n_legs} legs x {args.n_steps} steps, '
+          f'{args.n_path_points} path points')
+    print(f'  {"indented JSON":30s} {token_savings(verbose, verbose)["verbose_tokens"]:8d} tokens')
+    for name, encoding in encodings.items():
+        savings = token_savings(verbose, [encoding.journey_json(journey)])
+        print(f'  {name:30s} {savings["compact_tokens"]:8d} tokens, {100 * savings["saved_fraction"]:5.1f}% saved')
+
+
+if __name__ == '__main__':
+    main()
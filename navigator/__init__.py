@@ -3,6 +3,23 @@ from .planner import (
     Plan,
     Journey,
     JourneyMaker,
+    JourneyRequest,
+    BulkResult,
+    TaggedPlan,
+)
+from .views import JourneyViews
+from .encoding import CompactEncoding, estimate_tokens
+from .store import JourneyStore, EvictedJourneyError
+from .profile import (
+    DepartureProfileSearch,
+    DepartureProfile,
+    DepartureOption,
+)
+from .matrix import (
+    TravelTimeMatrix,
+    TravelTimeMatrixBuilder,
+    coordinate_grid,
+    isochrones,
 )
 from .tools import (
     JourneyMakerToolSet,
@@ -0,0 +1,235 @@
+"""Compact encoding of journeys and plans for the tool results sent to the language model.
+
+The tool results are part of the prompt of every later turn of the conversation, so their size adds to the
+latency and cost of each turn. The compact encoding writes JSON without whitespace, leaves out or simplifies
+the paths of legs, gives the times of legs in minutes from the start of the plan, and can be restricted to
+some fields and to a page of the legs and instruction steps. Given a token budget, the encoding is trimmed
+step by step until it fits, down to the number of plans or legs alone.
+
+"""
+import json
+import math
+from datetime import datetime
+from dataclasses import dataclass, replace
+from typing import Optional, Sequence, Dict, Any, List, Tuple
+
+import numpy as np
+
+from .planner import Plan, Journey, JourneyLeg
+from .geometry import simplify
+
+# The approximate number of characters per token of JSON text
+CHARS_PER_TOKEN = 4
+
+PATH_MODES = ('omit', 'simplified', 'full')
+
+# The smallest token budget, which the number of plans or legs alone always fits
+MIN_TOKEN_BUDGET = 32
+
+
+def estimate_tokens(text: str) -> int:
+    """The approximate number of tokens of the text, at four characters per token."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def dumps_compact(value: Any) -> str:
+    """JSON text without whitespace."""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def _minutes_between(start: Optional[str], end: Optional[str]) -> Optional[int]:
+    try:
+        return round((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() / 60)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class CompactEncoding:
+    """Options of the compact encoding of journeys and plans.
+
+    Args:
+        path: How to encode the paths of legs: 'omit', 'simplified' or 'full'
+        path_tolerance: The tolerance in metres of the simplification of paths
+        path_decimals: The number of decimals of the coordinates of paths
+        relative_times: Whether to give the times of legs in minutes from the start of the plan, rather than
+            as date-times
+        leg_fields: Optional fields of the legs to include; all fields by default. The times of legs are
+            always included
+        include_steps: Whether to include the instruction steps of legs
+        max_steps: Optional maximum number of instruction steps per leg
+        token_budget: Optional approximate number of tokens the encoding is trimmed to fit, at least
+            `MIN_TOKEN_BUDGET`
+
+    """
+    path: str = 'omit'
+    path_tolerance: float = 25.0
+    path_decimals: int = 5
+    relative_times: bool = True
+    leg_fields: Optional[Tuple[str, ...]] = None
+    include_steps: bool = True
+    max_steps: Optional[int] = None
+    token_budget: Optional[int] = None
+
+    def __post_init__(self):
+        if self.path not in PATH_MODES:
+            raise ValueError(f'Unknown path mode: {self.path}; one of {PATH_MODES}')
+        if self.token_budget is not None and self.token_budget < MIN_TOKEN_BUDGET:
+            raise ValueError(f'token_budget must be at least {MIN_TOKEN_BUDGET}')
+        if self.leg_fields is not None and not isinstance(self.leg_fields, tuple):
+            object.__setattr__(self, 'leg_fields', tuple(self.leg_fields))
+
+    def _encode_path(self, path: Optional[np.ndarray]) -> Optional[List]:
+        if self.path == 'omit' or path is None or len(path) == 0:
+            return None
+        if self.path == 'simplified':
+            path = simplify(path, self.path_tolerance)
+        return np.round(path, self.path_decimals).tolist()
+
+    def encode_leg(self, leg: JourneyLeg, plan_start: str) -> Dict:
+        ret = {}
+        if self.relative_times:
+            ret['start_minute'] = _minutes_between(plan_start, leg.start_date_time)
+            ret['end_minute'] = _minutes_between(plan_start, leg.end_date_time)
+            if ret['start_minute'] is None or ret['end_minute'] is None:
+                ret = {'start_date_time': leg.start_date_time, 'end_date_time': leg.end_date_time}
+        else:
+            ret['start_date_time'] = leg.start_date_time
+            ret['end_date_time'] = leg.end_date_time
+
+        def _include(name):
+            return self.leg_fields is None or name in self.leg_fields
+
+        for name in ('mode_transport', 'departure_point', 'arrival_point', 'duration', 'instruction'):
+            value = getattr(leg, name)
+            if value is not None and _include(name):
+                ret[name] = value
+        if _include('path'):
+            path = self._encode_path(leg.path)
+            if path is not None:
+                ret['path'] = path
+        if self.include_steps and _include('instruction_steps') and leg.instruction_steps:
+            steps = leg.instruction_steps
+            if self.max_steps is not None and len(steps) > self.max_steps:
+                ret['n_instruction_steps'] = len(steps)
+                steps = steps[:self.max_steps]
+            ret['instruction_steps'] = [
+                {k: v for k, v in (('description_heading', step.description_heading),
+                                   ('description', step.description),
+                                   ('distance', step.distance),
+                                   ('direction', step.direction)) if v is not None}
+                for step in steps
+            ]
+        return ret
+
+    def encode_plan(self,
+                    plan: Plan,
+                    leg_offset: int = 0,
+                    max_legs: Optional[int] = None,
+                    ) -> Dict:
+        """Encode the plan as a dictionary of compact JSON values, with a page of its legs."""
+        legs = plan.legs[leg_offset:]
+        if max_legs is not None:
+            legs = legs[:max_legs]
+        ret = {
+            'start_date_time': plan.start_date_time,
+            'end_date_time': plan.end_date_time,
+            'duration': plan.duration,
+            'n_legs': plan.n_legs,
+        }
+        if len(legs) < plan.n_legs:
+            ret['leg_offset'] = leg_offset
+        ret['legs'] = [self.encode_leg(leg, plan.start_date_time) for leg in legs]
+        return {k: v for k, v in ret.items() if v is not None}
+
+    def encode_journey(self,
+                       journey: Journey,
+                       plan_offset: int = 0,
+                       max_plans: Optional[int] = None,
+                       ) -> Dict:
+        """Encode the journey as a dictionary of compact JSON values, with a page of its plans."""
+        plans = journey.plans[plan_offset:]
+        if max_plans is not None:
+            plans = plans[:max_plans]
+        ret = {
+            'starting_point': journey.starting_point_name,
+            'destination': journey.destination_name,
+            'n_plans': journey.n_plans,
+        }
+        if len(plans) < journey.n_plans:
+            ret['plan_offset'] = plan_offset
+        ret['plans'] = [self.encode_plan(plan) for plan in plans]
+        return ret
+
+    def _trimmed(self) -> List['CompactEncoding']:
+        """Successively more compact encodings, to try in turn until one fits the token budget."""
+        steps = [self]
+        if self.path != 'omit':
+            steps.append(replace(steps[-1], path='omit'))
+        if self.include_steps:
+            for max_steps in (5, 2):
+                if self.max_steps is None or self.max_steps > max_steps:
+                    steps.append(replace(steps[-1], max_steps=max_steps))
+            steps.append(replace(steps[-1], include_steps=False))
+        return steps
+
+    def _fit(self, encode, n_items: int, items_key: str) -> str:
+        """Encode with the most detailed options that fit the token budget. If even the most compact
+        encoding does not fit, the number of plans or legs included is halved until it does, down to none.
+        If the summary without plans or legs does not fit either, the number of plans or legs alone does.
+
+        """
+        if self.token_budget is None:
+            return dumps_compact(encode(self, None))
+        for encoding in self._trimmed():
+            text = dumps_compact(encode(encoding, None))
+            if estimate_tokens(text) <= self.token_budget:
+                return text
+        n = n_items
+        while True:
+            n = n // 2
+            value = encode(encoding, n)
+            value['truncated'] = (f'{items_key} beyond the first {n} left out to fit the token budget' if n > 0
+                                  else f'{items_key} left out to fit the token budget')
+            text = dumps_compact(value)
+            if estimate_tokens(text) <= self.token_budget:
+                return text
+            if n == 0:
+                break
+        return dumps_compact({
+            f'n_{items_key}': value[f'n_{items_key}'],
+            'truncated': f'all but the number of {items_key} left out to fit the token budget',
+        })
+
+    def plan_json(self, plan: Plan, leg_offset: int = 0, max_legs: Optional[int] = None) -> str:
+        """The compact JSON text of the plan, trimmed to the token budget if any."""
+        n_legs = len(plan.legs[leg_offset:])
+        if max_legs is not None:
+            n_legs = min(n_legs, max_legs)
+        return self._fit(
+            lambda encoding, n: encoding.encode_plan(plan, leg_offset, max_legs if n is None else n),
+            n_legs,
+            'legs',
+        )
+
+    def journey_json(self, journey: Journey, plan_offset: int = 0, max_plans: Optional[int] = None) -> str:
+        """The compact JSON text of the journey, trimmed to the token budget if any."""
+        n_plans = len(journey.plans[plan_offset:])
+        if max_plans is not None:
+            n_plans = min(n_plans, max_plans)
+        return self._fit(
+            lambda encoding, n: encoding.encode_journey(journey, plan_offset, max_plans if n is None else n),
+            n_plans,
+            'plans',
+        )
+
+
+def token_savings(verbose: Sequence[str], compact: Sequence[str]) -> Dict[str, float]:
+    """The approximate tokens of verbose and compact encodings of the same values, and the fraction saved."""
+    n_verbose = sum(estimate_tokens(text) for text in verbose)
+    n_compact = sum(estimate_tokens(text) for text in compact)
+    return {
+        'verbose_tokens': n_verbose,
+        'compact_tokens': n_compact,
+        'saved_fraction': 1.0 - n_compact / n_verbose if n_verbose > 0 else 0.0,
+    }
@@ -0,0 +1,233 @@
+"""Geometry of the paths of journey legs, vectorised with NumPy.
+
+Paths are arrays of shape (n, 2) of latitude and longitude, as on `JourneyLeg.path`. Distances are in metres.
+Simplification and distances to paths use a local equirectangular projection around the path, which is
+accurate to well within a metre over the extent of a journey in a city.
+
+"""
+import heapq
+from typing import Sequence, List, Tuple, Dict, Optional
+
+import numpy as np
+
+from .planner import Plan
+
+EARTH_RADIUS = 6371008.8
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """The great-circle distance in metres between points, broadcast over arrays of coordinates."""
+    lat1, lon1, lat2, lon2 = (np.radians(x) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def _as_path(path) -> np.ndarray:
+    path = np.asarray(path, dtype=np.float64)
+    if path.ndim != 2 or path.shape[1] != 2:
+        raise ValueError('A path must be an array of shape (n, 2) of latitude and longitude')
+    return path
+
+
+def _project(points: np.ndarray, ref_lat: float) -> np.ndarray:
+    """Project coordinates to metres on a plane tangent at the reference latitude."""
+    xy = np.radians(points[..., ::-1]) * EARTH_RADIUS
+    xy[..., 0] *= np.cos(np.radians(ref_lat))
+    return xy
+
+
+def _segment_distances(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """The distances of the projected points to the segments from a to b, broadcast over both."""
+    ab = b - a
+    ab_sq = np.sum(ab * ab, axis=-1)
+    t = np.sum((points - a) * ab, axis=-1) / np.where(ab_sq > 0, ab_sq, 1.0)
+    t = np.clip(t, 0.0, 1.0)
+    closest = a + t[..., None] * ab
+    return np.linalg.norm(points - closest, axis=-1)
+
+
+def segment_lengths(path) -> np.ndarray:
+    """The lengths of the segments between consecutive points of the path."""
+    path = _as_path(path)
+    return haversine(path[:-1, 0], path[:-1, 1], path[1:, 0], path[1:, 1])
+
+
+def path_length(path) -> float:
+    """The length of the path."""
+    return float(segment_lengths(path).sum())
+
+
+def cumulative_distance(path) -> np.ndarray:
+    """The distance along the path to each of its points, starting at zero."""
+    return np.concatenate([[0.0], np.cumsum(segment_lengths(path))])
+
+
+def bounding_box(path) -> Tuple[float, float, float, float]:
+    """The bounding box of the path as minimum latitude, minimum longitude, maximum latitude and maximum longitude."""
+    path = _as_path(path)
+    if len(path) == 0:
+        raise ValueError('The bounding box of an empty path is undefined')
+    (min_lat, min_lon), (max_lat, max_lon) = path.min(axis=0), path.max(axis=0)
+    return float(min_lat), float(min_lon), float(max_lat), float(max_lon)
+
+
+def nearest_distance(points, path) -> np.ndarray:
+    """The distance from each point to the nearest point on the path, between its points included.
+
+    Args:
+        points: A point of latitude and longitude, or an array of shape (m, 2) of points
+        path: The path
+
+    Returns:
+        The distance for a single point, or an array of shape (m,) of distances
+
+    """
+    path = _as_path(path)
+    points = np.asarray(points, dtype=np.float64)
+    single = points.ndim == 1
+    points = np.atleast_2d(points)
+    if len(path) == 0:
+        raise ValueError('The distance to an empty path is undefined')
+    if len(path) == 1:
+        distance = haversine(points[:, 0], points[:, 1], path[0, 0], path[0, 1])
+    else:
+        ref_lat = float(path[:, 0].mean())
+        xy, points_xy = _project(path, ref_lat), _project(points, ref_lat)
+        distance = _segment_distances(points_xy[:, None, :], xy[None, :-1, :], xy[None, 1:, :]).min(axis=1)
+    return float(distance[0]) if single else distance
+
+
+def simplify_douglas_peucker(path, tolerance: float) -> np.ndarray:
+    """Simplify the path with the Douglas-Peucker algorithm, such that no point removed is further than the
+    tolerance in metres from the simplified path.
+
+    """
+    path = _as_path(path)
+    n = len(path)
+    if n < 3:
+        return path.copy()
+    xy = _project(path, float(path[:, 0].mean()))
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        distance = _segment_distances(xy[i + 1:j], xy[i], xy[j])
+        k = int(np.argmax(distance))
+        if distance[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            stack.append((i, k))
+            stack.append((k, j))
+    return path[keep]
+
+
+def _triangle_areas(xy: np.ndarray, prev: np.ndarray, curr: np.ndarray, next_: np.ndarray) -> np.ndarray:
+    a, b, c = xy[prev], xy[curr], xy[next_]
+    return 0.5 * np.abs((b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1]) - (c[..., 0] - a[..., 0]) * (b[..., 1] - a[..., 1]))
+
+
+def simplify_visvalingam(path, tolerance: float) -> np.ndarray:
+    """Simplify the path with the Visvalingam-Whyatt algorithm, which removes the points of the smallest
+    effective area until all remaining points have an area of at least the tolerance in square metres.
+
+    """
+    path = _as_path(path)
+    n = len(path)
+    if n < 3:
+        return path.copy()
+    xy = _project(path, float(path[:, 0].mean()))
+    prev = np.arange(-1, n - 1)
+    next_ = np.arange(1, n + 1)
+    areas = np.full(n, np.inf)
+    areas[1:-1] = _triangle_areas(xy, prev[1:-1], np.arange(1, n - 1), next_[1:-1])
+    heap = [(area, k) for k, area in enumerate(areas[1:-1].tolist(), start=1)]
+    heapq.heapify(heap)
+    removed = np.zeros(n, dtype=bool)
+
+    while heap:
+        area, k = heapq.heappop(heap)
+        if removed[k] or area != areas[k]:
+            continue
+        if area >= tolerance:
+            break
+        removed[k] = True
+        p, q = prev[k], next_[k]
+        next_[p], prev[q] = q, p
+        for m in (p, q):
+            if 0 < m < n - 1:
+                # The effective area never decreases, so points are removed in order of significance
+                areas[m] = max(float(_triangle_areas(xy, prev[m], m, next_[m])), area)
+                heapq.heappush(heap, (areas[m], m))
+    return path[~removed]
+
+
+def simplify(path, tolerance: float, method: str = 'douglas-peucker') -> np.ndarray:
+    """Simplify the path with the given method, either 'douglas-peucker' with the tolerance in metres or
+    'visvalingam' with the tolerance in square metres.
+
+    """
+    if method == 'douglas-peucker':
+        return simplify_douglas_peucker(path, tolerance)
+    elif method == 'visvalingam':
+        return simplify_visvalingam(path, tolerance)
+    raise ValueError(f'Unknown simplification method: {method}')
+
+
+def _concatenate(paths: Sequence[Optional[np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate the paths, with missing paths as empty, and the offsets of the paths into the result."""
+    paths = [np.empty((0, 2)) if path is None else _as_path(path) for path in paths]
+    offsets = np.concatenate([[0], np.cumsum([len(path) for path in paths])]).astype(np.int64)
+    flat = np.concatenate(paths) if len(paths) > 0 else np.empty((0, 2))
+    return flat, offsets
+
+
+def batch_path_lengths(paths: Sequence[Optional[np.ndarray]]) -> np.ndarray:
+    """The lengths of many paths at once, with a single vectorised pass over all their points.
+
+    Missing paths have length NaN.
+
+    """
+    flat, offsets = _concatenate(paths)
+    along = np.concatenate([[0.0], np.cumsum(segment_lengths(flat))]) if len(flat) > 0 else np.zeros(1)
+    starts, ends = offsets[:-1], offsets[1:]
+    lengths = along[np.maximum(ends - 1, 0)] - along[np.minimum(starts, len(along) - 1)]
+    lengths[ends == starts] = np.nan
+    return lengths
+
+
+def batch_bounding_boxes(paths: Sequence[Optional[np.ndarray]]) -> np.ndarray:
+    """The bounding boxes of many paths at once, as an array of shape (n_paths, 4), see `bounding_box`.
+
+    Missing paths have a bounding box of NaN.
+
+    """
+    flat, offsets = _concatenate(paths)
+    boxes = np.full((len(offsets) - 1, 4), np.nan)
+    non_empty = offsets[1:] > offsets[:-1]
+    if non_empty.any():
+        starts = offsets[:-1][non_empty]
+        boxes[non_empty, :2] = np.minimum.reduceat(flat, starts, axis=0)
+        boxes[non_empty, 2:] = np.maximum.reduceat(flat, starts, axis=0)
+    return boxes
+
+
+def plan_leg_lengths(plans: Sequence[Plan]) -> List[np.ndarray]:
+    """The lengths of the legs of each plan, computed for all legs of all plans at once."""
+    lengths = batch_path_lengths([leg.path for plan in plans for leg in plan.legs])
+    offsets = np.cumsum([0] + [len(plan.legs) for plan in plans])
+    return [lengths[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def distance_by_mode(plans: Sequence[Plan]) -> List[Dict[str, float]]:
+    """The distance travelled by each mode of transport in each plan, such as the walking or cycling distance."""
+    ret = []
+    for plan, lengths in zip(plans, plan_leg_lengths(plans)):
+        distances = {}
+        for leg, length in zip(plan.legs, lengths.tolist()):
+            if not np.isnan(length):
+                distances[leg.mode_transport] = distances.get(leg.mode_transport, 0.0) + length
+        ret.append(distances)
+    return ret
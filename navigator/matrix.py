@@ -0,0 +1,259 @@
+"""Travel-time matrices between sets of coordinates, and isochrones from them.
+
+"""
+import os
+import json
+import threading
+from typing import Optional, Sequence, Tuple, Dict, List
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from tfl_api import JourneyPlannerSearchParams, Priority
+from .planner import Planner, Plan, JourneyRequest
+
+
+def _to_coordinates(points) -> np.ndarray:
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError('Coordinates must be an array of shape (n, 2) of latitude and longitude')
+    return points
+
+
+def _leg_minutes(leg) -> Optional[float]:
+    if leg.duration is not None:
+        return float(leg.duration)
+    if leg.start_date_time is not None and leg.end_date_time is not None:
+        start = datetime.fromisoformat(leg.start_date_time)
+        end = datetime.fromisoformat(leg.end_date_time)
+        return (end - start).total_seconds() / 60
+    return None
+
+
+def _cell_values(plans) -> Tuple[float, float, float]:
+    """The duration, number of legs and walking minutes of the fastest of the plans"""
+    if len(plans) > 0 and isinstance(plans[0], list):
+        plans = [plan for _plans in plans for plan in _plans]
+    plans = [plan for plan in plans if plan.duration is not None]
+    if len(plans) == 0:
+        return np.nan, np.nan, np.nan
+    fastest: Plan = min(plans, key=lambda plan: plan.duration)
+    walking = [_leg_minutes(leg) for leg in fastest.legs if leg.mode_transport == 'walking']
+    walking = np.nan if any(minutes is None for minutes in walking) else float(sum(walking))
+    return float(fastest.duration), float(fastest.n_legs), walking
+
+
+@dataclass
+class TravelTimeMatrix:
+    """Travel times between origins and destinations, as dense arrays of shape (n_origins, n_destinations)
+
+    Cells without a journey are NaN. The walking minutes and number of legs are those of the fastest plan.
+    The parameters of the searches are kept as canonical JSON text, such that a checkpoint of the matrix is
+    only resumed for the same searches.
+
+    """
+    origins: np.ndarray
+    destinations: np.ndarray
+    duration: np.ndarray
+    n_legs: np.ndarray
+    walking: np.ndarray
+    done: np.ndarray
+    params: str = ''
+
+    @classmethod
+    def empty(cls, origins: np.ndarray, destinations: np.ndarray, params: str = '') -> 'TravelTimeMatrix':
+        shape = (len(origins), len(destinations))
+        return cls(
+            origins=origins,
+            destinations=destinations,
+            duration=np.full(shape, np.nan),
+            n_legs=np.full(shape, np.nan),
+            walking=np.full(shape, np.nan),
+            done=np.zeros(shape, dtype=bool),
+            params=params,
+        )
+
+    @property
+    def is_complete(self):
+        return bool(self.done.all())
+
+    def save(self, file_path: str):
+        """Save the matrix to a NumPy archive, replacing the file atomically."""
+        tmp_path = f'{file_path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, origins=self.origins, destinations=self.destinations, duration=self.duration,
+                     n_legs=self.n_legs, walking=self.walking, done=self.done, params=np.array(self.params))
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'TravelTimeMatrix':
+        with np.load(file_path) as data:
+            values = {key: data[key] for key in data.files}
+        values['params'] = str(values['params']) if 'params' in values else None
+        return cls(**values)
+
+
+class TravelTimeMatrixBuilder:
+    """Compute travel-time matrices between coordinates with the journey planner.
+
+    The searches for the cells run concurrently on a bounded pool through `Planner.make_plans_bulk`. The cell
+    values are cached by the coordinates and parameters, so repeated cells, within a matrix or across
+    matrices, are searched for once. Large matrices can be checkpointed to file, and a computation resumed
+    from its checkpoint computes only the cells not yet done. Cells whose search failed are left NaN and not
+    done, so a resumed computation retries them.
+
+    Args:
+        planner: The planner of journeys
+        max_workers: The maximum number of searches in flight at once
+        priority: The priority of the searches, which matters if the TfL client is rate limited
+        coordinate_precision: The number of decimals of the coordinates in the searches and cache keys
+
+    """
+    def __init__(self,
+                 planner: Planner,
+                 max_workers: int = 8,
+                 priority: Priority = Priority.BATCH,
+                 coordinate_precision: int = 6,
+                 ):
+        self.planner = planner
+        self.max_workers = max_workers
+        self.priority = priority
+        self.coordinate_precision = coordinate_precision
+        self._cache: Dict[Tuple, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _point(self, point) -> Tuple[float, float]:
+        return round(float(point[0]), self.coordinate_precision), round(float(point[1]), self.coordinate_precision)
+
+    def compute(self,
+                origins: Sequence[Tuple[float, float]],
+                destinations: Sequence[Tuple[float, float]],
+                params: Optional[JourneyPlannerSearchParams] = None,
+                checkpoint_path: Optional[str] = None,
+                checkpoint_every: int = 100,
+                ) -> TravelTimeMatrix:
+        """Compute the travel-time matrix from every origin to every destination.
+
+        Args:
+            origins: The latitude and longitude of the origins
+            destinations: The latitude and longitude of the destinations
+            params: The parameters of the searches
+            checkpoint_path: Optional path of the checkpoint file. If it holds a checkpoint of the same origins,
+                destinations and parameters, the computation resumes from it; a checkpoint of other searches
+                raises ValueError
+            checkpoint_every: The number of computed cells between saves of the checkpoint
+
+        """
+        origins = _to_coordinates(origins)
+        destinations = _to_coordinates(destinations)
+        if params is None:
+            params = JourneyPlannerSearchParams()
+        params_key = json.dumps(params.model_dump(mode='json', exclude_none=True), sort_keys=True)
+
+        matrix = None
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            matrix = TravelTimeMatrix.load(checkpoint_path)
+            if not (np.array_equal(matrix.origins, origins) and np.array_equal(matrix.destinations, destinations)):
+                raise ValueError(f'Checkpoint {checkpoint_path} is of other origins or destinations')
+            if matrix.params != params_key:
+                raise ValueError(f'Checkpoint {checkpoint_path} is of other search parameters, or of unknown ones')
+        if matrix is None:
+            matrix = TravelTimeMatrix.empty(origins, destinations, params_key)
+
+        # Cells of the same coordinates share a search, and cells already cached need none
+        pending: Dict[Tuple, List[Tuple[int, int]]] = {}
+        for i, j in zip(*np.nonzero(~matrix.done)):
+            from_loc, to_loc = self._point(origins[i]), self._point(destinations[j])
+            key = (from_loc, to_loc, params_key)
+            with self._lock:
+                values = self._cache.get(key)
+            if from_loc == to_loc:
+                values = (0.0, 0.0, 0.0)
+            if values is not None:
+                self._set(matrix, [(i, j)], values)
+            else:
+                pending.setdefault(key, []).append((int(i), int(j)))
+
+        keys = list(pending)
+        requests = [JourneyRequest(from_loc=key[0], to_loc=key[1], params=params) for key in keys]
+        n_since_checkpoint = 0
+        for result in self.planner.make_plans_bulk(requests, max_workers=self.max_workers, priority=self.priority):
+            if not result.ok:
+                continue
+            key = keys[result.index]
+            values = _cell_values(result.value)
+            with self._lock:
+                self._cache[key] = values
+            self._set(matrix, pending[key], values)
+            n_since_checkpoint += 1
+            if checkpoint_path is not None and n_since_checkpoint >= checkpoint_every:
+                matrix.save(checkpoint_path)
+                n_since_checkpoint = 0
+
+        if checkpoint_path is not None:
+            matrix.save(checkpoint_path)
+        return matrix
+
+    @staticmethod
+    def _set(matrix: TravelTimeMatrix, cells: Sequence[Tuple[int, int]], values: Tuple[float, float, float]):
+        for i, j in cells:
+            matrix.duration[i, j], matrix.n_legs[i, j], matrix.walking[i, j] = values
+            matrix.done[i, j] = True
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def coordinate_grid(center: Tuple[float, float],
+                    half_width: float,
+                    n: int,
+                    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """A square grid of coordinates around a center, for isochrones.
+
+    Args:
+        center: The latitude and longitude of the center
+        half_width: The distance in degrees latitude from the center to the edge of the grid; the longitude
+            extent is scaled such that the grid is square on the ground
+        n: The number of grid points along each side
+
+    Returns:
+        The latitudes and longitudes of the grid lines, and the grid points as an array of shape (n * n, 2) in
+        row-major order of latitude by longitude
+
+    """
+    lat, lon = center
+    lats = np.linspace(lat - half_width, lat + half_width, n)
+    lon_half_width = half_width / np.cos(np.radians(lat))
+    lons = np.linspace(lon - lon_half_width, lon + lon_half_width, n)
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing='ij')
+    return lats, lons, np.column_stack([lat_grid.ravel(), lon_grid.ravel()])
+
+
+def isochrones(lats: np.ndarray,
+               lons: np.ndarray,
+               duration: np.ndarray,
+               levels: Sequence[float],
+               ) -> Dict[float, List[np.ndarray]]:
+    """The contour lines of equal travel time over a grid of travel times.
+
+    Args:
+        lats: The latitudes of the grid rows
+        lons: The longitudes of the grid columns
+        duration: The travel times of shape (len(lats), len(lons)), or of shape (len(lats) * len(lons),) as a
+            row of a matrix to the points of `coordinate_grid`; NaN cells are masked
+        levels: The travel times in minutes to draw contours for
+
+    Returns:
+        For each level, the contour lines as arrays of shape (k, 2) of latitude and longitude
+
+    """
+    # contourpy is only required for isochrones, so it is imported on use
+    import contourpy
+
+    duration = np.asarray(duration, dtype=np.float64).reshape(len(lats), len(lons))
+    generator = contourpy.contour_generator(
+        x=lons, y=lats, z=np.ma.masked_invalid(duration), line_type=contourpy.LineType.Separate,
+    )
+    return {level: [line[:, ::-1] for line in generator.lines(level)] for level in levels}
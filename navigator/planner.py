@@ -1,28 +1,38 @@
 """Bla bla
 
 """
-from typing import Sequence, Dict, Optional, Union, List
-from dataclasses import dataclass, asdict
+from typing import Sequence, Dict, Optional, Union, List, Tuple, Any, Iterable, Generator, Callable
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import itertools
 import json
+import numpy as np
 
 from tfl_api import (
+    Priority,
     JourneyPlannerSearchParams,
     JourneyPlannerSearch,
     JourneyPlannerSearchPayloadProcessor,
+    LocationResolverCache,
     get_description_for_field_
 )
+from tfl_api.linestring import decode_line_string
+from . import serialize
+from .views import JourneyViews
+from .store import JourneyStore, request_key, is_reusable
 
 
-def _filter_none(value):
-    if isinstance(value, list):
-        return [_filter_none(v) for v in value]
-    elif isinstance(value, dict):
-        return {k: _filter_none(v) for k, v in value.items() if v is not None}
-    return value
+def _decode_path(path):
+    """Decode the path of a leg from the string of the payload, which the payload processor leaves as is."""
+    if isinstance(path, str):
+        return decode_line_string(path)
+    if isinstance(path, np.ndarray) or path is None:
+        return path
+    # Paths missing from the payload are retrieved as empty
+    return None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class JourneyLegStep:
     """A step of a journey leg
 
@@ -33,32 +43,47 @@ class JourneyLegStep:
     direction: Optional[str] = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class JourneyLeg:
     """A leg of a journey
 
+    The path is a read-only array of shape (n, 2) of latitude and longitude. It is not compared in equality,
+    since arrays do not compare to a single truth value.
+
     """
     start_date_time: str
     end_date_time: str
     departure_point: str
     arrival_point: str
     mode_transport: str
-    path: Optional[List[List[float]]] = None
+    path: Optional[np.ndarray] = field(default=None, compare=False)
     duration: Optional[int] = None
     instruction: Optional[str] = None
     instruction_steps: Sequence[JourneyLegStep] = None
 
+    def __post_init__(self):
+        if isinstance(self.path, np.ndarray):
+            self.path.flags.writeable = False
+        if self.instruction_steps is not None and not isinstance(self.instruction_steps, tuple):
+            object.__setattr__(self, 'instruction_steps', tuple(self.instruction_steps))
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Plan:
     """A journey plan
 
+    Plans are immutable, such that their serialized views can be cached, see `JourneyViews`.
+
     """
     start_date_time: str
     end_date_time: str
     legs: Sequence[JourneyLeg]
     duration: Optional[int] = None
 
+    def __post_init__(self):
+        if not isinstance(self.legs, tuple):
+            object.__setattr__(self, 'legs', tuple(self.legs))
+
     @property
     def n_legs(self):
         return len(self.legs)
@@ -68,9 +93,11 @@ class Plan:
         return list(set([leg.mode_transport for leg in self.legs]))
 
     def to_dict(self):
-        return _filter_none(asdict(self))
+        return serialize.to_dict(self)
 
     def to_json(self, **kwargs):
+        if set(kwargs) <= {'indent'}:
+            return serialize.to_json(self, **kwargs)
         return json.dumps(self.to_dict(), **kwargs)
 
     @property
@@ -107,7 +134,7 @@ class Plan:
                     departure_point=leg.get('departure_point'),
                     arrival_point=leg.get('arrival_point'),
                     mode_transport=leg.get('mode_transport'),
-                    path=leg.get('path'),
+                    path=_decode_path(leg.get('path')),
                     instruction_steps=[
                         JourneyLegStep(
                             description_heading=step.get('description_heading'),
@@ -122,57 +149,356 @@ class Plan:
 
 
 
+@dataclass
+class JourneyRequest:
+    """A request for journey plans between two locations, as part of a bulk computation
+
+    """
+    from_loc: Union[str, Tuple[float, float]]
+    to_loc: Union[str, Tuple[float, float]]
+    params: Optional[JourneyPlannerSearchParams] = None
+
+
+@dataclass
+class BulkResult:
+    """The result of one request of a bulk computation, with the index of the request in the input
+
+    """
+    index: int
+    request: JourneyRequest
+    value: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _flatten(plans: List) -> List[Plan]:
+    """The plans of a pair of locations, with the plans of nested disambiguations flattened."""
+    if len(plans) > 0 and isinstance(plans[0], list):
+        return [plan for _plans in plans for plan in _plans]
+    return plans
+
+
+def _to_journey_request(request) -> JourneyRequest:
+    if isinstance(request, JourneyRequest):
+        return request
+    return JourneyRequest(*request)
+
+
+@dataclass(frozen=True, slots=True)
+class TaggedPlan:
+    """A plan along with the pair of disambiguated locations it was planned for, see `Planner.iter_plans`
+
+    """
+    variant: int
+    from_loc: Union[str, Tuple[float, float]]
+    to_loc: Union[str, Tuple[float, float]]
+    plan: Plan
+
+
 class Planner:
     """The planner of journeys
 
+    If the TfL API returns several disambiguation options for the locations, a journey is planned for every
+    combination of options. These searches can run concurrently, be limited to the options of the best match
+    quality, and be stopped early once enough plans have been found.
+
+    Args:
+        planner: The search of the TfL Journey API
+        payload_processor: The processor of the payloads of the searches
+        leg_data_to_retrieve: Not used
+        resolver: Optional cache of how free-text locations were disambiguated. Locations in the cache are
+            searched for with their resolved locations directly, which skips the round trip to the TfL API
+            that returns the disambiguation options
+        max_parallel_disambiguation: The maximum number of searches for disambiguated locations in flight at once
+        disambiguation_top_k: Optional maximum number of disambiguation options to search for per location,
+            selected by match quality
+        enough_plans: Optional number of plans after which the remaining searches for disambiguated locations
+            are cancelled; the plans of cancelled searches are left out
+
     """
     def __init__(self,
                  planner: JourneyPlannerSearch,
                  payload_processor: JourneyPlannerSearchPayloadProcessor,
-                 leg_data_to_retrieve: Sequence[Sequence[str]] = None
+                 leg_data_to_retrieve: Sequence[Sequence[str]] = None,
+                 resolver: Optional[LocationResolverCache] = None,
+                 max_parallel_disambiguation: int = 1,
+                 disambiguation_top_k: Optional[int] = None,
+                 enough_plans: Optional[int] = None,
                  ):
         self.journey_planner = planner
         self.payload_processor = payload_processor
         self.leg_data_to_retrieve = leg_data_to_retrieve
+        self.resolver = resolver
+        self.max_parallel_disambiguation = max_parallel_disambiguation
+        self.disambiguation_top_k = disambiguation_top_k
+        self.enough_plans = enough_plans
 
     def make_plan(self,
                   from_loc: str,
                   to_loc: str,
                   params: JourneyPlannerSearchParams,
-                  _recursive_depth: int = 0) -> Union[Plan, List[Plan]]:
+                  priority: Optional[Priority] = None,
+                  _recursive_depth: int = 0,
+                  _use_resolver: bool = True) -> Union[Plan, List[Plan]]:
         """Plan a journey between two locations, given a set of preferences and times.
 
-        """
-        payload = self.journey_planner(from_loc, to_loc, params)
+        The method keeps no state between calls, so it can be called from several threads at once.
 
-        if self.journey_planner.status_code == 200:
+        """
+        if self.resolver is not None and _use_resolver and _recursive_depth == 0:
+            _from_loc = self.resolver.get_with_quality(from_loc)
+            _to_loc = self.resolver.get_with_quality(to_loc)
+            if _from_loc is not None or _to_loc is not None:
+                return self._make_plan_resolved(
+                    self._top_k(_from_loc) if _from_loc is not None else [from_loc],
+                    self._top_k(_to_loc) if _to_loc is not None else [to_loc],
+                    params,
+                    priority,
+                )
+
+        status_code, payload = self.journey_planner.search(from_loc, to_loc, params, priority=priority)
+
+        if status_code == 200:
             return [Plan.create_from_payload(journey) for journey in self.payload_processor.journeys(payload=payload)]
 
-        elif self.journey_planner.status_code == 300:
+        elif status_code == 300:
             if _recursive_depth == 1:
                 raise RuntimeError(f'Failed to disambiguate locations: {from_loc}, {to_loc}')
             _recursive_depth += 1
 
-            self.payload_processor.disambiguate(payload)
-            _from_loc = self.payload_processor.transform_loc('from', from_loc)
-            _to_loc = self.payload_processor.transform_loc('to', to_loc)
+            return self._fan_out(
+                self._disambiguation_variants(from_loc, to_loc, payload),
+                params=params,
+                priority=priority,
+                _recursive_depth=_recursive_depth,
+            )
+        else:
+            raise RuntimeError(f'Unexpected status code {status_code}')
+
+    def _disambiguation_variants(self, from_loc, to_loc, payload) -> List[Tuple]:
+        """The pairs of disambiguated locations to search for, given the payload of status 300, and the
+        resolutions added to the resolver cache.
 
-            return [
-                self.make_plan(
-                    from_loc=locs[0],
-                    to_loc=locs[1],
+        """
+        _from_loc, _to_loc = self.payload_processor.disambiguated_locs(payload, from_loc, to_loc)
+        _from_options = self.payload_processor.resolved_options('from', payload)
+        _to_options = self.payload_processor.resolved_options('to', payload)
+        if self.resolver is not None:
+            self.resolver.put(from_loc, _from_options)
+            self.resolver.put(to_loc, _to_options)
+        if _from_options:
+            _from_loc = self._top_k(_from_options)
+        if _to_options:
+            _to_loc = self._top_k(_to_options)
+        return list(itertools.product(_from_loc, _to_loc))
+
+    def _make_plan_resolved(self, from_locs, to_locs, params, priority) -> List[List[Plan]]:
+        """Plan journeys for the product of locations resolved from the cache. The other location may still
+        require disambiguation, in which case the nested plans are flattened, such that the shape and order
+        of the plans are the same as if the TfL API had disambiguated both locations.
+
+        """
+        plans = []
+        for _plans in self._fan_out(itertools.product(from_locs, to_locs),
+                                    params=params,
+                                    priority=priority,
+                                    _use_resolver=False):
+            if len(_plans) > 0 and isinstance(_plans[0], list):
+                plans.extend(_plans)
+            else:
+                plans.append(_plans)
+        return plans
+
+    def _top_k(self, options: Sequence[Tuple[Any, float]]) -> List:
+        """Select the disambiguated locations of the best match quality, in their original order."""
+        if self.disambiguation_top_k is None or len(options) <= self.disambiguation_top_k:
+            return [loc for loc, _ in options]
+        best = sorted(range(len(options)), key=lambda k: -options[k][1])[:self.disambiguation_top_k]
+        return [options[k][0] for k in sorted(best)]
+
+    def _fan_out(self, loc_pairs: Iterable[Tuple], **kwargs) -> List:
+        """Plan journeys for each pair of locations, concurrently if so configured, and return the plans in
+        the order of the pairs. If enough plans are found, the remaining searches are cancelled.
+
+        """
+        loc_pairs = list(loc_pairs)
+
+        def _n_plans(_plans):
+            return sum(len(_flatten(p)) for p in _plans)
+
+        if self.max_parallel_disambiguation <= 1 or len(loc_pairs) <= 1:
+            ret = []
+            for from_loc, to_loc in loc_pairs:
+                ret.append(self.make_plan(from_loc=from_loc, to_loc=to_loc, **kwargs))
+                if self.enough_plans is not None and _n_plans(ret) >= self.enough_plans:
+                    break
+            return ret
+
+        results = [None] * len(loc_pairs)
+        executor = ThreadPoolExecutor(max_workers=min(self.max_parallel_disambiguation, len(loc_pairs)))
+        try:
+            futures = {
+                executor.submit(self.make_plan, from_loc=from_loc, to_loc=to_loc, **kwargs): k
+                for k, (from_loc, to_loc) in enumerate(loc_pairs)
+            }
+            n_plans = 0
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                n_plans += _n_plans([results[futures[future]]])
+                if self.enough_plans is not None and n_plans >= self.enough_plans:
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return [_plans for _plans in results if _plans is not None]
+
+    def iter_plans(self,
+                   from_loc: Union[str, Tuple[float, float]],
+                   to_loc: Union[str, Tuple[float, float]],
+                   params: JourneyPlannerSearchParams,
+                   priority: Optional[Priority] = None,
+                   ) -> Generator[TaggedPlan, None, None]:
+        """Plan journeys between two locations, and yield the plans as soon as the search of each pair of
+        disambiguated locations completes, rather than once all searches have completed as `make_plan`.
+
+        The plans are tagged with the index of the pair of disambiguated locations they are for, in the order
+        of the pairs. The plans of a pair come in the order of the TfL API, but the pairs come in the order
+        their searches complete, concurrently if so configured. If the consumer stops early, the searches not
+        yet started are cancelled.
+
+        """
+        for variant, _from_loc, _to_loc, plans in self.iter_results(from_loc, to_loc, params, priority):
+            for plan in _flatten(plans):
+                yield TaggedPlan(variant=0 if variant is None else variant, from_loc=_from_loc, to_loc=_to_loc, plan=plan)
+
+    def iter_results(self,
+                     from_loc: Union[str, Tuple[float, float]],
+                     to_loc: Union[str, Tuple[float, float]],
+                     params: JourneyPlannerSearchParams,
+                     priority: Optional[Priority] = None,
+                     ) -> Generator[Tuple[Optional[int], Any, Any, List], None, None]:
+        """Plan journeys between two locations, and yield the plans of each pair of disambiguated locations as
+        soon as its search completes, as `iter_plans` does, but untagged and not flattened.
+
+        Each item is a tuple of the index of the pair, the pair, and the plans of the pair as `make_plan`
+        returns them, such that the consumer can assemble the plans in the shape `make_plan` returns. For
+        locations that need no disambiguation, the index is None and the plans come one at a time.
+
+        """
+        if self.resolver is not None:
+            _from_loc = self.resolver.get_with_quality(from_loc)
+            _to_loc = self.resolver.get_with_quality(to_loc)
+            if _from_loc is not None or _to_loc is not None:
+                yield from self._iter_variants(
+                    list(itertools.product(
+                        self._top_k(_from_loc) if _from_loc is not None else [from_loc],
+                        self._top_k(_to_loc) if _to_loc is not None else [to_loc],
+                    )),
                     params=params,
-                    _recursive_depth=_recursive_depth,
-                ) for locs in itertools.product(_from_loc, _to_loc)
-            ]
+                    priority=priority,
+                    _use_resolver=False,
+                )
+                return
+
+        status_code, payload = self.journey_planner.search(from_loc, to_loc, params, priority=priority)
+        if status_code == 200:
+            for journey in self.payload_processor.journeys(payload=payload):
+                yield None, from_loc, to_loc, [Plan.create_from_payload(journey)]
+        elif status_code == 300:
+            yield from self._iter_variants(
+                self._disambiguation_variants(from_loc, to_loc, payload),
+                params=params,
+                priority=priority,
+                _recursive_depth=1,
+            )
         else:
-            raise RuntimeError(f'Unexpected status code {self.journey_planner.status_code}')
+            raise RuntimeError(f'Unexpected status code {status_code}')
+
+    def _iter_variants(self, loc_pairs: List[Tuple], **kwargs) -> Generator[Tuple[int, Any, Any, List], None, None]:
+        """Plan journeys for each pair of locations, and yield the plans of each pair as it completes."""
+        n_plans = 0
+        if self.max_parallel_disambiguation <= 1 or len(loc_pairs) <= 1:
+            for variant, (from_loc, to_loc) in enumerate(loc_pairs):
+                plans = self.make_plan(from_loc=from_loc, to_loc=to_loc, **kwargs)
+                yield variant, from_loc, to_loc, plans
+                n_plans += len(_flatten(plans))
+                if self.enough_plans is not None and n_plans >= self.enough_plans:
+                    return
+            return
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_parallel_disambiguation, len(loc_pairs)))
+        try:
+            futures = {
+                executor.submit(self.make_plan, from_loc=from_loc, to_loc=to_loc, **kwargs): variant
+                for variant, (from_loc, to_loc) in enumerate(loc_pairs)
+            }
+            for future in as_completed(futures):
+                variant = futures[future]
+                plans = future.result()
+                yield variant, loc_pairs[variant][0], loc_pairs[variant][1], plans
+                n_plans += len(_flatten(plans))
+                if self.enough_plans is not None and n_plans >= self.enough_plans:
+                    return
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def make_plans_bulk(self,
+                        requests: Iterable[Union[JourneyRequest, Tuple]],
+                        default_params: Optional[JourneyPlannerSearchParams] = None,
+                        max_workers: int = 8,
+                        priority: Priority = Priority.BATCH,
+                        ) -> Generator[BulkResult, None, None]:
+        """Plan journeys for many pairs of locations concurrently on a bounded pool of worker threads.
+
+        The results are yielded as they complete, so in completion order rather than input order, with the
+        index of the request in the input attached. A failed request does not affect the other requests;
+        its error is set on its result instead of raised.
+
+        Args:
+            requests: The requests, either as `JourneyRequest` or as tuples of starting location, destination
+                and optional parameters
+            default_params: The parameters of requests without parameters
+            max_workers: The maximum number of requests in flight at once
+            priority: The priority of the requests, which matters if the TfL client is rate limited
 
-
-@dataclass
+        """
+        if default_params is None:
+            default_params = JourneyPlannerSearchParams()
+        requests = [_to_journey_request(request) for request in requests]
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {
+                executor.submit(
+                    self.make_plan,
+                    from_loc=request.from_loc,
+                    to_loc=request.to_loc,
+                    params=request.params if request.params is not None else default_params,
+                    priority=priority,
+                ): index for index, request in enumerate(requests)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    yield BulkResult(index=index, request=requests[index], value=future.result())
+                except Exception as e:
+                    yield BulkResult(index=index, request=requests[index], error=e)
+        finally:
+            # If the consumer stops early, requests not yet started are cancelled
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass(frozen=True, slots=True)
 class Journey:
     plans: Sequence[Plan]
 
+    def __post_init__(self):
+        if not isinstance(self.plans, tuple):
+            object.__setattr__(self, 'plans', tuple(self.plans))
+
     @property
     def starting_point_name(self):
         return self.plans[0].legs[0].departure_point
@@ -192,9 +518,11 @@ class Journey:
         return iter(self.plans)
 
     def to_dict(self):
-        return _filter_none(asdict(self))
+        return serialize.to_dict(self)
 
     def to_json(self, **kwargs):
+        if set(kwargs) <= {'indent'}:
+            return serialize.to_json(self, **kwargs)
         return json.dumps(self.to_dict(), **kwargs)
 
 
@@ -202,10 +530,20 @@ class JourneyMaker:
     """Constructs the journeys that fits two given locations. Multiple journeys
     are possible since the TfL API can disambiguate locations.
 
+    The journeys are held in a store, which reuses the journeys of identical requests and can be bounded, in
+    which case the journeys of the least recently used requests are evicted. The indices of the journeys are
+    stable. The serialized views of the journeys are cached in `views`, which all tool sets of the maker share.
+
+    Args:
+        planner: The planner of journeys
+        default_params: The parameters of the searches, which the keyword arguments of a request update
+        store: Optional store of the journeys; by default an unbounded store
+
     """
     def __init__(self,
                  planner: Planner,
-                 default_params: Optional[JourneyPlannerSearchParams] = None
+                 default_params: Optional[JourneyPlannerSearchParams] = None,
+                 store: Optional[JourneyStore] = None,
                  ):
         self.planner = planner
         if default_params is None:
@@ -213,7 +551,9 @@ class JourneyMaker:
         self.default_params = default_params
 
         self.is_multiple_journeys = False
-        self._journey = []
+        self.views = JourneyViews(self)
+        self.store = store if store is not None else JourneyStore()
+        self.store.on_evict = self.views.invalidate
 
     @property
     def default_params(self):
@@ -226,10 +566,17 @@ class JourneyMaker:
         self._default_params = value
 
     def __getitem__(self, item):
-        return self._journey[item]
+        return self.store[item]
 
     def __len__(self):
-        return len(self._journey)
+        return len(self.store)
+
+    def items(self):
+        """The indices and journeys held, in order of index."""
+        return self.store.items()
+
+    def __iter__(self):
+        return (journey for _, journey in self.store.items())
 
     @property
     def payload_description(self):
@@ -238,17 +585,129 @@ class JourneyMaker:
     def make_journey(self,
                      starting_point: str,
                      destination: str,
-                     **kwargs):
-        """Make a journey between two locations
+                     **kwargs) -> List[int]:
+        """Make a journey between two locations, and return the indices of the journeys it added, or of the
+        journeys of an identical earlier request with a pinned date or time.
 
         """
         _params = self.default_params.model_copy(update=kwargs)
+        key = self._store_key(starting_point, destination, _params)
+        indices = self.store.get_indices(key)
+        if indices is not None:
+            self.is_multiple_journeys = len(indices) > 1
+            return indices
 
         plans = self.planner.make_plan(
             from_loc=starting_point,
             to_loc=destination,
             params=_params,
         )
+        return self._add_journeys(plans, key)
+
+    def make_journeys_bulk(self,
+                           requests: Iterable[Union[JourneyRequest, Tuple]],
+                           max_workers: int = 8,
+                           ) -> Generator[BulkResult, None, None]:
+        """Make journeys for many pairs of locations concurrently, see `Planner.make_plans_bulk`.
+
+        The journeys are added to the maker as the requests complete. The value of each result is the list
+        of indices of the journeys the request added, since a request can add several journeys if the TfL
+        API disambiguates its locations. Identical requests within the batch are planned once and get the
+        same indices. Requests identical to earlier ones with a pinned date or time reuse their journeys, and
+        their results are yielded first.
+
+        """
+        requests = [_to_journey_request(request) for request in requests]
+        groups: Dict[str, List[int]] = {}
+        store_keys: Dict[str, Optional[str]] = {}
+        for index, request in enumerate(requests):
+            params = request.params if request.params is not None else self.default_params
+            key = request_key(request.from_loc, request.to_loc, params)
+            groups.setdefault(key, []).append(index)
+            store_keys[key] = key if is_reusable(params) else None
+
+        to_plan = []
+        for key, members in groups.items():
+            indices = self.store.get_indices(store_keys[key])
+            if indices is not None:
+                for index in members:
+                    yield BulkResult(index=index, request=requests[index], value=list(indices))
+            else:
+                to_plan.append(key)
+
+        for result in self.planner.make_plans_bulk([requests[groups[key][0]] for key in to_plan],
+                                                   default_params=self.default_params,
+                                                   max_workers=max_workers):
+            key = to_plan[result.index]
+            indices = None
+            if result.ok:
+                indices = self._add_journeys(result.value, store_keys[key])
+            for index in groups[key]:
+                yield BulkResult(
+                    index=index,
+                    request=requests[index],
+                    value=list(indices) if indices is not None else None,
+                    error=result.error,
+                )
+
+    def make_journey_streaming(self,
+                               starting_point: str,
+                               destination: str,
+                               on_plan: Optional[Callable[[TaggedPlan], None]] = None,
+                               **kwargs) -> List[int]:
+        """Make a journey between two locations as `make_journey`, but pass each plan to `on_plan` as soon as
+        it is planned, see `Planner.iter_results`. The journeys are added once all plans are in, and are the same
+        as `make_journey` adds, as are the indices returned and the state of the maker, such that the two
+        methods can be swapped for one another.
+
+        Args:
+            starting_point: The starting point of the journey
+            destination: The destination of the journey
+            on_plan: Optional function called with each tagged plan as it arrives; for a request identical to
+                an earlier one, it is called with the plans of the reused journeys
+            **kwargs: Parameters of the search, which update the default parameters
+
+        """
+        _params = self.default_params.model_copy(update=kwargs)
+        key = self._store_key(starting_point, destination, _params)
+        indices = self.store.get_indices(key)
+        if indices is not None:
+            self.is_multiple_journeys = len(indices) > 1
+            if on_plan is not None:
+                for variant, index in enumerate(indices):
+                    for plan in self.store[index]:
+                        on_plan(TaggedPlan(variant=variant, from_loc=starting_point, to_loc=destination, plan=plan))
+            return indices
+
+        direct_plans, plans_by_variant = [], {}
+        for variant, from_loc, to_loc, plans in self.planner.iter_results(starting_point, destination, _params):
+            if variant is None:
+                direct_plans.extend(plans)
+            else:
+                plans_by_variant[variant] = plans
+            if on_plan is not None:
+                for plan in _flatten(plans):
+                    on_plan(TaggedPlan(variant=0 if variant is None else variant,
+                                       from_loc=from_loc, to_loc=to_loc, plan=plan))
+
+        # The plans in the shape `Planner.make_plan` returns, such that the journeys are as `make_journey` adds
+        plans = direct_plans
+        if len(plans_by_variant) > 0:
+            plans = []
+            for variant in sorted(plans_by_variant):
+                if len(plans_by_variant[variant]) > 0 and isinstance(plans_by_variant[variant][0], list):
+                    plans.extend(plans_by_variant[variant])
+                else:
+                    plans.append(plans_by_variant[variant])
+        return self._add_journeys(plans, key)
+
+    def _store_key(self, from_loc, to_loc, params: JourneyPlannerSearchParams) -> Optional[str]:
+        """The key the journeys of the request are stored under for reuse, or None if they are not reusable."""
+        return request_key(from_loc, to_loc, params) if is_reusable(params) else None
+
+    def _add_journeys(self, plans: List, key: Optional[str] = None) -> List[int]:
+        if len(plans) == 0:
+            return self.store.add([], key)
         if isinstance(plans, list):
             if isinstance(plans[0], list):
                 self.is_multiple_journeys = True
@@ -256,4 +715,4 @@ class JourneyMaker:
                 self.is_multiple_journeys = False
                 plans = [plans]
 
-        self._journey.extend([Journey(plans=_plans) for _plans in plans])
+        return self.store.add([Journey(plans=_plans) for _plans in plans], key)
@@ -0,0 +1,198 @@
+"""Departure-time profile search: the journeys between two locations over a window of departure times.
+
+"""
+from typing import Optional, Union, Tuple, List, Dict, Any
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta
+import json
+
+from tfl_api import JourneyPlannerSearchParams
+from tfl_api.journey_planner import TimeIs
+from .planner import Planner, Plan, JourneyRequest
+
+
+@dataclass
+class DepartureOption:
+    """A distinct plan in a departure-time profile, and the earliest requested departure time it was found for
+
+    """
+    requested_time: str
+    start_date_time: str
+    end_date_time: str
+    duration: Optional[int]
+    n_legs: int
+    modes_of_transport: List[str]
+
+
+@dataclass
+class DepartureProfile:
+    """The distinct plans between two locations over a window of departure times, ordered by departure, and
+    the departure times whose searches failed along with the reasons they failed
+
+    """
+    from_loc: Union[str, Tuple[float, float]]
+    to_loc: Union[str, Tuple[float, float]]
+    date: Optional[str]
+    requested_times: List[str]
+    options: List[DepartureOption] = field(default_factory=list)
+    failed_times: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def fastest(self) -> Optional[DepartureOption]:
+        if len(self.options) == 0:
+            return None
+        return min(self.options, key=lambda option: (option.duration is None, option.duration))
+
+    def to_table(self) -> List[Dict[str, Any]]:
+        """The profile as a compact table of departure, arrival and duration"""
+        return [
+            {
+                'departure': option.start_date_time,
+                'arrival': option.end_date_time,
+                'duration': option.duration,
+                'legs': option.n_legs,
+                'modes': option.modes_of_transport,
+            } for option in self.options
+        ]
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+def _plan_key(plan: Plan) -> Tuple:
+    """The identity of a plan, such that the same plan returned for neighbouring departure times is merged"""
+    return (
+        plan.start_date_time,
+        plan.end_date_time,
+        tuple((leg.mode_transport, leg.departure_point, leg.arrival_point, leg.start_date_time) for leg in plan.legs),
+    )
+
+
+def _flatten_plans(plans) -> List[Plan]:
+    if len(plans) > 0 and isinstance(plans[0], list):
+        return [plan for _plans in plans for plan in _plans]
+    return list(plans)
+
+
+def _is_dominated(option: DepartureOption, other: DepartureOption) -> bool:
+    """Whether the other option departs no earlier and arrives no later, and is not the same option"""
+    return (
+        other.start_date_time >= option.start_date_time
+        and other.end_date_time <= option.end_date_time
+        and (other.start_date_time, other.end_date_time) != (option.start_date_time, option.end_date_time)
+    )
+
+
+class DepartureProfileSearch:
+    """Search the journeys between two locations for departure times at a fixed step over a window.
+
+    The searches for the departure times run concurrently through `Planner.make_plans_bulk`. Neighbouring
+    departure times often return the same plans, which are merged in the profile. Every departure time is a
+    request to the TfL API, so the number of departure times of a profile is bounded.
+
+    Args:
+        planner: The planner of journeys
+        max_workers: The maximum number of searches in flight at once
+        max_times: The maximum number of departure times of a profile
+
+    """
+    def __init__(self,
+                 planner: Planner,
+                 max_workers: int = 8,
+                 max_times: int = 24,
+                 ):
+        self.planner = planner
+        self.max_workers = max_workers
+        self.max_times = max_times
+
+    def search(self,
+               from_loc: Union[str, Tuple[float, float]],
+               to_loc: Union[str, Tuple[float, float]],
+               earliest_departure: str,
+               latest_departure: str,
+               step_minutes: int = 15,
+               params: Optional[JourneyPlannerSearchParams] = None,
+               drop_dominated: bool = True,
+               ) -> DepartureProfile:
+        """Compute the departure-time profile between two locations.
+
+        Args:
+            from_loc: The starting location of the journey
+            to_loc: The destination of the journey
+            earliest_departure: The earliest departure time in the format HHMM
+            latest_departure: The latest departure time in the format HHMM, inclusive
+            step_minutes: The minutes between the departure times searched for
+            params: The parameters of the searches, of which the time is set for each departure time
+            drop_dominated: Whether to drop plans that depart earlier and arrive no earlier than another plan
+
+        Raises:
+            ValueError: If the departure times are malformed, or more than `max_times`
+
+        """
+        if step_minutes <= 0:
+            raise ValueError('step_minutes must be positive')
+        start = datetime.strptime(earliest_departure, '%H%M')
+        end = datetime.strptime(latest_departure, '%H%M')
+        if end < start:
+            raise ValueError('latest_departure must not be before earliest_departure')
+        n_times = int((end - start).total_seconds() // 60) // step_minutes + 1
+        if n_times > self.max_times:
+            raise ValueError(f'The window and step give {n_times} departure times, more than the maximum of '
+                             f'{self.max_times}; use a larger step or a shorter window')
+
+        if params is None:
+            params = JourneyPlannerSearchParams()
+        times = []
+        t = start
+        while t <= end:
+            times.append(t.strftime('%H%M'))
+            t += timedelta(minutes=step_minutes)
+
+        # The parameters are validated again, since those of the caller may have been updated without validation
+        _params = params.model_dump(exclude_none=True)
+        requests = [
+            JourneyRequest(
+                from_loc=from_loc,
+                to_loc=to_loc,
+                params=JourneyPlannerSearchParams.model_validate(
+                    {**_params, 'time': time, 'time_is': TimeIs.DEPARTING}
+                ),
+            ) for time in times
+        ]
+        plans_by_time: List[Optional[List[Plan]]] = [None] * len(times)
+        errors: Dict[int, str] = {}
+        for result in self.planner.make_plans_bulk(requests, max_workers=self.max_workers):
+            if result.ok:
+                plans_by_time[result.index] = _flatten_plans(result.value)
+            else:
+                errors[result.index] = f'{type(result.error).__name__}: {result.error}'
+
+        profile = DepartureProfile(from_loc=from_loc, to_loc=to_loc, date=params.date, requested_times=times)
+        seen = {}
+        for k, (time, plans) in enumerate(zip(times, plans_by_time)):
+            if plans is None:
+                profile.failed_times.append(time)
+                profile.errors[time] = errors[k]
+                continue
+            for plan in plans:
+                key = _plan_key(plan)
+                if key in seen:
+                    continue
+                seen[key] = DepartureOption(
+                    requested_time=time,
+                    start_date_time=plan.start_date_time,
+                    end_date_time=plan.end_date_time,
+                    duration=plan.duration,
+                    n_legs=plan.n_legs,
+                    modes_of_transport=sorted(plan.modes_of_transport),
+                )
+
+        options = sorted(seen.values(), key=lambda option: (option.start_date_time, option.end_date_time))
+        if drop_dominated:
+            options = [option for option in options if not any(_is_dominated(option, other) for other in options)]
+        profile.options = options
+        return profile
@@ -0,0 +1,126 @@
+"""Serialization of the journey data model to dictionaries and JSON in a single pass.
+
+The fields that are None are left out, and the paths of legs are encoded to the string format of the TfL API.
+The JSON text is the same as that of `json.dumps` of the dictionary, but it is written directly from the
+objects, without the intermediate copy of the tree.
+
+"""
+import math
+import dataclasses
+from json.encoder import encode_basestring_ascii
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from tfl_api.linestring import encode_line_string
+
+_FIELD_NAMES: Dict[type, Tuple[str, ...]] = {}
+
+
+def _field_names(cls) -> Tuple[str, ...]:
+    names = _FIELD_NAMES.get(cls)
+    if names is None:
+        names = _FIELD_NAMES[cls] = tuple(field.name for field in dataclasses.fields(cls))
+    return names
+
+
+def to_dict(value: Any) -> Any:
+    """Convert the data model to dictionaries and lists, without the fields that are None."""
+    if isinstance(value, (str, int, float)) or value is None:
+        return value
+    if isinstance(value, np.ndarray):
+        return encode_line_string(value)
+    if dataclasses.is_dataclass(value):
+        ret = {}
+        for name in _field_names(type(value)):
+            field_value = getattr(value, name)
+            if field_value is not None:
+                ret[name] = to_dict(field_value)
+        return ret
+    if isinstance(value, dict):
+        return {k: to_dict(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [to_dict(v) for v in value]
+    return value
+
+
+def _float(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    return float.__repr__(value)
+
+
+def _items(value):
+    """The keys and values of an object of the data model, without the values that are None."""
+    if isinstance(value, dict):
+        return [(k, v) for k, v in value.items() if v is not None]
+    return [(name, v) for name in _field_names(type(value)) if (v := getattr(value, name)) is not None]
+
+
+def _write(value: Any, parts: list, indent: Optional[str], level: int):
+    if isinstance(value, str):
+        parts.append(encode_basestring_ascii(value))
+    elif value is None:
+        parts.append('null')
+    elif value is True:
+        parts.append('true')
+    elif value is False:
+        parts.append('false')
+    elif isinstance(value, int):
+        parts.append(int.__repr__(value))
+    elif isinstance(value, float):
+        parts.append(_float(value))
+    elif isinstance(value, np.ndarray):
+        parts.append(encode_basestring_ascii(encode_line_string(value)))
+    elif isinstance(value, np.generic):
+        _write(value.item(), parts, indent, level)
+    elif isinstance(value, (list, tuple)):
+        if len(value) == 0:
+            parts.append('[]')
+            return
+        parts.append('[')
+        separator = ', ' if indent is None else ',\n' + indent * (level + 1)
+        if indent is not None:
+            parts.append('\n' + indent * (level + 1))
+        for k, item in enumerate(value):
+            if k > 0:
+                parts.append(separator)
+            _write(item, parts, indent, level + 1)
+        if indent is not None:
+            parts.append('\n' + indent * level)
+        parts.append(']')
+    elif isinstance(value, dict) or dataclasses.is_dataclass(value):
+        items = _items(value)
+        if len(items) == 0:
+            parts.append('{}')
+            return
+        parts.append('{')
+        separator = ', ' if indent is None else ',\n' + indent * (level + 1)
+        if indent is not None:
+            parts.append('\n' + indent * (level + 1))
+        for k, (key, item) in enumerate(items):
+            if k > 0:
+                parts.append(separator)
+            parts.append(encode_basestring_ascii(str(key)))
+            parts.append(': ')
+            _write(item, parts, indent, level + 1)
+        if indent is not None:
+            parts.append('\n' + indent * level)
+        parts.append('}')
+    else:
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def to_json(value: Any, indent: Optional[int] = None) -> str:
+    """Write the data model as JSON text, without the fields that are None.
+
+    Args:
+        value: The object of the data model, such as a `Plan` or a `Journey`
+        indent: Optional number of spaces to indent nested objects and arrays with, as for `json.dumps`
+
+    """
+    parts = []
+    _write(value, parts, None if indent is None else ' ' * indent, 0)
+    return ''.join(parts)
@@ -0,0 +1,212 @@
+"""Bounded store of computed journeys, keyed by the requests that computed them.
+
+"""
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Callable, Iterator, Tuple, Union
+
+import numpy as np
+
+from tfl_api import JourneyPlannerSearchParams
+
+# The approximate size in bytes of an object of the data model apart from its strings and arrays
+_OBJECT_OVERHEAD = 64
+
+
+class EvictedJourneyError(LookupError):
+    """Raised when a journey is accessed by an index whose journey has been evicted from the store."""
+
+
+def request_key(from_loc: Union[str, Tuple[float, float]],
+                to_loc: Union[str, Tuple[float, float]],
+                params: JourneyPlannerSearchParams,
+                ) -> str:
+    """The content-based key of a request for journeys, such that identical requests have the same key."""
+    def _loc(loc):
+        if isinstance(loc, (tuple, list)):
+            return f'{loc[0]},{loc[1]}'
+        return ' '.join(str(loc).lower().split())
+
+    return json.dumps(
+        [_loc(from_loc), _loc(to_loc), params.model_dump(mode='json', exclude_none=True)],
+        sort_keys=True,
+    )
+
+
+def is_reusable(params: JourneyPlannerSearchParams) -> bool:
+    """Whether the journeys of a request with the parameters can be reused by a later identical request.
+
+    A request that pins neither the date nor the time is for journeys from now, which are stale for a later
+    request with the same key, so its journeys are not reused.
+
+    """
+    return params.date is not None or params.time is not None
+
+
+def estimate_nbytes(value: Any) -> int:
+    """The approximate memory in bytes held by an object of the data model, such as a journey."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, (list, tuple)):
+        return _OBJECT_OVERHEAD + sum(estimate_nbytes(v) for v in value)
+    if hasattr(value, '__slots__'):
+        return _OBJECT_OVERHEAD + sum(estimate_nbytes(getattr(value, name)) for name in value.__slots__)
+    return _OBJECT_OVERHEAD
+
+
+class _Entry:
+    __slots__ = ('indices', 'nbytes', 'created')
+
+    def __init__(self, indices: List[int], nbytes: int):
+        self.indices = indices
+        self.nbytes = nbytes
+        self.created = time.time()
+
+
+class JourneyStore:
+    """Store of journeys with stable indices, keyed by the requests that computed them.
+
+    A request adds one or more journeys, which get the next free indices. A later identical request reuses
+    the journeys of the earlier one, provided they have not expired or been evicted. If the number of
+    journeys or their approximate size exceeds the budget, the journeys of the least recently used requests
+    are evicted. The indices of evicted journeys are not reused; accessing them raises `EvictedJourneyError`.
+
+    The store can be used from several threads at once.
+
+    Args:
+        max_journeys: Optional maximum number of journeys held
+        max_bytes: Optional maximum approximate size in bytes of the journeys held
+        max_age: Optional time in seconds after which the journeys of a request are not reused; they are
+            still held until evicted
+        on_evict: Optional function called with the indices of evicted journeys
+
+    """
+    def __init__(self,
+                 max_journeys: Optional[int] = None,
+                 max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None,
+                 on_evict: Optional[Callable[[List[int]], None]] = None,
+                 ):
+        self.max_journeys = max_journeys
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.on_evict = on_evict
+        self._journeys: List[Any] = []
+        self._index_key: List[Optional[str]] = []
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._n_live = 0
+        self._nbytes = 0
+        self._n_reused = 0
+        self._n_evicted = 0
+        self._lock = threading.RLock()
+
+    def get_indices(self, key: Optional[str]) -> Optional[List[int]]:
+        """The indices of the journeys of the request with the key, or None if there are none to reuse."""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.max_age is not None and time.time() - entry.created > self.max_age:
+                return None
+            self._entries.move_to_end(key)
+            self._n_reused += 1
+            return list(entry.indices)
+
+    def add(self, journeys: List[Any], key: Optional[str] = None) -> List[int]:
+        """Add the journeys of a request, and return their indices.
+
+        Args:
+            journeys: The journeys
+            key: Optional key of the request, such that later identical requests can reuse the journeys
+
+        """
+        evicted = []
+        with self._lock:
+            indices = list(range(len(self._journeys), len(self._journeys) + len(journeys)))
+            self._journeys.extend(journeys)
+            self._n_live += len(journeys)
+
+            if key is None:
+                # Journeys without a request key are kept under a key of their own, such that they can be evicted
+                key = f'#{indices[0]}' if indices else None
+            if key is not None:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    evicted.extend(self._tombstone(previous))
+                entry = _Entry(indices, sum(estimate_nbytes(journey) for journey in journeys))
+                self._entries[key] = entry
+                self._nbytes += entry.nbytes
+                for _ in indices:
+                    self._index_key.append(key)
+
+            while len(self._entries) > 1 and self._is_over_budget():
+                _, oldest = self._entries.popitem(last=False)
+                evicted.extend(self._tombstone(oldest))
+
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+        return indices
+
+    def _is_over_budget(self) -> bool:
+        return (
+            (self.max_journeys is not None and self._n_live > self.max_journeys)
+            or (self.max_bytes is not None and self._nbytes > self.max_bytes)
+        )
+
+    def _tombstone(self, entry: _Entry) -> List[int]:
+        for index in entry.indices:
+            self._journeys[index] = None
+            self._index_key[index] = None
+        self._n_live -= len(entry.indices)
+        self._nbytes -= entry.nbytes
+        self._n_evicted += len(entry.indices)
+        return entry.indices
+
+    def __getitem__(self, index: int) -> Any:
+        with self._lock:
+            if index < 0:
+                raise IndexError('Journey indices are non-negative')
+            journey = self._journeys[index]
+            if journey is None:
+                raise EvictedJourneyError(f'Journey {index} has been evicted; compute it again')
+            self._entries.move_to_end(self._index_key[index])
+            return journey
+
+    def items(self) -> Iterator[Tuple[int, Any]]:
+        """The indices and journeys held, in order of index."""
+        with self._lock:
+            items = [(index, journey) for index, journey in enumerate(self._journeys) if journey is not None]
+        return iter(items)
+
+    def __contains__(self, index: int) -> bool:
+        with self._lock:
+            return 0 <= index < len(self._journeys) and self._journeys[index] is not None
+
+    def __len__(self):
+        return self._n_live
+
+    @property
+    def n_indices(self) -> int:
+        """The number of indices given out, those of evicted journeys included."""
+        return len(self._journeys)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'journeys': self._n_live,
+                'requests': len(self._entries),
+                'bytes': self._nbytes,
+                'reused': self._n_reused,
+                'evicted': self._n_evicted,
+            }
@@ -4,10 +4,13 @@
 import os
 from typing import Sequence, Optional
 import json
+from dataclasses import replace
 
 from base import ToolSet
-from tfl_api import JourneyPlannerSearchParams
+from tfl_api import JourneyPlannerSearchParams, get_description_for_field_
 from .planner import JourneyMaker
+from .profile import DepartureProfileSearch
+from .encoding import CompactEncoding, MIN_TOKEN_BUDGET, dumps_compact
 
 TOOL_SPEC_FILE = os.path.join(os.path.dirname(__file__), 'tools.json')
 
@@ -15,14 +18,44 @@ TOOL_SPEC_FILE = os.path.join(os.path.dirname(__file__), 'tools.json')
 class JourneyMakerToolSet(ToolSet):
     """Toolset for journey maker, means to invoke the TfL API.
 
+    The journeys and plans are returned as indented JSON, or in the compact encoding if the tool is called
+    with `compact` or if the tool set is given a compact encoding, see `CompactEncoding`. The tools that
+    change the journeys or default parameters of the maker are not run at the same time as other tools.
+
+    Args:
+        maker: The journey maker
+        tools_to_include: Optional names of the tools to include
+        tool_spec_file: The file of the tool specifications
+        encoding: Optional compact encoding of the tool results; if given, the results are compact unless the
+            tool is called with `compact` false
+
     """
+    non_parallel_tools = ('set_default_journey_parameters', 'compute_journey_plans')
+
     def __init__(self,
                  maker: JourneyMaker,
                  tools_to_include: Optional[Sequence[str]] = None,
                  tool_spec_file: str = TOOL_SPEC_FILE,
+                 encoding: Optional[CompactEncoding] = None,
              ):
         super().__init__(tool_spec_file, tools_to_include)
         self.maker = maker
+        self.encoding = encoding
+
+    def _encoding(self, compact: Optional[bool], **kwargs) -> Optional[CompactEncoding]:
+        """The compact encoding to use for a tool call, updated with the options of the call that are set,
+        or None if the result is not to be compact.
+
+        """
+        if compact is None:
+            compact = self.encoding is not None
+        if not compact:
+            return None
+        encoding = self.encoding if self.encoding is not None else CompactEncoding()
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        if 'token_budget' in kwargs:
+            kwargs['token_budget'] = max(kwargs['token_budget'], MIN_TOKEN_BUDGET)
+        return replace(encoding, **kwargs) if kwargs else encoding
 
     def set_default_journey_parameters(self, **kwargs) -> str:
         self.maker.default_params = JourneyPlannerSearchParams(**kwargs)
@@ -34,13 +67,14 @@ class JourneyMakerToolSet(ToolSet):
     def compute_journey_plans(self,
                               starting_point: str,
                               destination: str,
+                              compact: Optional[bool] = None,
                               **kwargs) -> str:
         self.maker.make_journey(
             starting_point=starting_point,
             destination=destination,
             **kwargs,
         )
-        return json.dumps({
+        summary = {
             'total number of planned journeys available': len(self.maker),
             'journey meta data': [
                 {
@@ -55,17 +89,87 @@ class JourneyMakerToolSet(ToolSet):
                             'modes of transport in plan': plan.modes_of_transport,
                          } for l, plan in enumerate(journey)
                     ]
-                } for k, journey in enumerate(self.maker)
+                } for k, journey in self.maker.items()
             ]
+        }
+        if self._encoding(compact) is not None:
+            return dumps_compact(summary)
+        return json.dumps(summary, indent=4)
+
+    def compute_departure_profile(self,
+                                  starting_point: str,
+                                  destination: str,
+                                  earliest_departure: str,
+                                  latest_departure: str,
+                                  step_minutes: int = 15,
+                                  date: Optional[str] = None,
+                                  ) -> str:
+        _params = self.maker.default_params
+        if date is not None:
+            _params = _params.model_copy(update={'date': date})
+        # Malformed or too many departure times are returned as an error, such that the model can correct them
+        try:
+            profile = DepartureProfileSearch(self.maker.planner).search(
+                from_loc=starting_point,
+                to_loc=destination,
+                earliest_departure=earliest_departure,
+                latest_departure=latest_departure,
+                step_minutes=step_minutes,
+                params=_params,
+            )
+        except ValueError as e:
+            return json.dumps({'error': str(e)}, indent=4)
+        return json.dumps({
+            'starting point': starting_point,
+            'destination': destination,
+            'departure options': profile.to_table(),
+            'departure times without plans': profile.errors,
         },
             indent=4,
         )
 
-    def get_computed_journey(self, journey_index: int) -> str:
-        return self.maker[journey_index].to_json(indent=4)
+    def get_computed_journey(self,
+                             journey_index: int,
+                             compact: Optional[bool] = None,
+                             token_budget: Optional[int] = None,
+                             plan_offset: int = 0,
+                             max_plans: Optional[int] = None,
+                             ) -> str:
+        encoding = self._encoding(compact, token_budget=token_budget)
+        if encoding is None:
+            return self.maker.views.journey_json(journey_index)
+        return self.maker.views.compact_journey_json(journey_index, encoding, plan_offset, max_plans)
 
-    def get_computed_journey_plan(self, journey_index: int, plan_index: int) -> str:
-        return self.maker[journey_index][plan_index].to_json(indent=4)
+    def get_computed_journey_plan(self,
+                                  journey_index: int,
+                                  plan_index: int,
+                                  compact: Optional[bool] = None,
+                                  token_budget: Optional[int] = None,
+                                  leg_fields: Optional[Sequence[str]] = None,
+                                  path: Optional[str] = None,
+                                  leg_offset: int = 0,
+                                  max_legs: Optional[int] = None,
+                                  max_steps: Optional[int] = None,
+                                  ) -> str:
+        encoding = self._encoding(
+            compact,
+            token_budget=token_budget,
+            leg_fields=tuple(leg_fields) if leg_fields is not None else None,
+            path=path,
+            max_steps=max_steps,
+        )
+        if encoding is None:
+            return self.maker.views.plan_json(journey_index, plan_index)
+        return self.maker.views.compact_plan_json(journey_index, plan_index, encoding, leg_offset, max_legs)
 
     def get_plan_field_description(self):
-        return self.maker[0][0].field_description
+        for journey_index, journey in self.maker.items():
+            if journey.n_plans > 0:
+                return self.maker.views.field_description(journey_index, 0)
+
+        # Without a plan to describe, describe the fields the payload processor retrieves
+        processor = self.maker.planner.payload_processor
+        fields = ['start_date_time', 'end_date_time', 'duration', 'legs', *processor.leg_data_to_retrieve]
+        if 'instruction_steps' in processor.leg_data_to_retrieve:
+            fields.extend(processor.step_data_to_retrieve)
+        return {field: get_description_for_field_(field) for field in fields}
@@ -0,0 +1,104 @@
+"""Memoised serialized views of the computed journeys of a journey maker.
+
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple, Any, Hashable, Sequence, Optional
+
+
+class JourneyViews:
+    """The serialized forms of the journeys and plans of a journey maker, computed once and cached.
+
+    The agent tools ask for the same journeys and plans repeatedly within a conversation. Since journeys and
+    plans are immutable, their JSON text, dictionary and field descriptions are cached. A cached view is
+    reused only as long as the maker holds the same journey object at the index, so a journey replaced at an
+    index is serialized anew. The views are held by the maker, such that all tool sets of the maker share them.
+
+    The dictionaries returned are shared between callers and must not be modified. The cache holds at most
+    `max_entries` views, and drops the least recently used ones beyond that, along with the journeys and plans
+    they keep alive, such that a long conversation with an unbounded store does not grow the cache without
+    bound. Views of journeys evicted from the store are dropped at once.
+
+    Args:
+        maker: The journey maker, or any object that gives journeys by index
+        max_entries: The maximum number of views held
+
+    """
+    def __init__(self, maker, max_entries: int = 256):
+        self.maker = maker
+        self.max_entries = max_entries
+        self._cache: 'OrderedDict[Hashable, Tuple[Any, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._n_hits = 0
+        self._n_misses = 0
+
+    def _get(self, key: Hashable, obj: Any, make):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] is obj:
+                self._cache.move_to_end(key)
+                self._n_hits += 1
+                return entry[1]
+            self._n_misses += 1
+        value = make(obj)
+        with self._lock:
+            self._cache[key] = (obj, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    def journey_json(self, journey_index: int, indent: int = 4) -> str:
+        """The JSON text of the journey."""
+        return self._get(('journey_json', journey_index, indent), self.maker[journey_index],
+                         lambda journey: journey.to_json(indent=indent))
+
+    def journey_dict(self, journey_index: int) -> Dict:
+        """The dictionary of the journey."""
+        return self._get(('journey_dict', journey_index), self.maker[journey_index],
+                         lambda journey: journey.to_dict())
+
+    def plan_json(self, journey_index: int, plan_index: int, indent: int = 4) -> str:
+        """The JSON text of a plan of the journey."""
+        return self._get(('plan_json', journey_index, plan_index, indent), self.maker[journey_index][plan_index],
+                         lambda plan: plan.to_json(indent=indent))
+
+    def plan_dict(self, journey_index: int, plan_index: int) -> Dict:
+        """The dictionary of a plan of the journey."""
+        return self._get(('plan_dict', journey_index, plan_index), self.maker[journey_index][plan_index],
+                         lambda plan: plan.to_dict())
+
+    def compact_journey_json(self, journey_index: int, encoding, plan_offset: int = 0,
+                             max_plans: Optional[int] = None) -> str:
+        """The compact JSON text of the journey, see `CompactEncoding`."""
+        return self._get(('compact_journey_json', journey_index, encoding, plan_offset, max_plans),
+                         self.maker[journey_index],
+                         lambda journey: encoding.journey_json(journey, plan_offset, max_plans))
+
+    def compact_plan_json(self, journey_index: int, plan_index: int, encoding, leg_offset: int = 0,
+                          max_legs: Optional[int] = None) -> str:
+        """The compact JSON text of a plan of the journey, see `CompactEncoding`."""
+        return self._get(('compact_plan_json', journey_index, plan_index, encoding, leg_offset, max_legs),
+                         self.maker[journey_index][plan_index],
+                         lambda plan: encoding.plan_json(plan, leg_offset, max_legs))
+
+    def field_description(self, journey_index: int = 0, plan_index: int = 0) -> Dict[str, str]:
+        """The descriptions of the fields of a plan of the journey."""
+        return self._get(('field_description', journey_index, plan_index), self.maker[journey_index][plan_index],
+                         lambda plan: plan.field_description)
+
+    def invalidate(self, journey_indices: Sequence[int]):
+        """Drop the cached views of the journeys, such as when they are evicted."""
+        journey_indices = set(journey_indices)
+        with self._lock:
+            for key in [key for key in self._cache if key[1] in journey_indices]:
+                del self._cache[key]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._cache), 'hits': self._n_hits, 'misses': self._n_misses}
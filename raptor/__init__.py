@@ -0,0 +1,3 @@
+from .timetable import Timetable, load_gtfs
+from .router import RaptorRouter, RaptorLeg
+from .search import LocalJourneyPlannerSearch, FallbackJourneyPlannerSearch, UnsupportedQueryError
@@ -0,0 +1,215 @@
+"""The RAPTOR algorithm for earliest-arrival journeys in a timetable.
+
+RAPTOR works in rounds: round `k` finds the earliest arrival at every stop with `k` vehicle trips, by scanning
+each route pattern that serves a stop improved in the previous round once, followed by the walking transfers
+from the stops improved in the round. The journeys that improve the arrival at the destination in a round are
+Pareto-optimal in arrival time and number of trips. See Delling, Pajor and Werneck, "Round-Based Public
+Transit Routing", 2012.
+
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .timetable import Timetable
+
+_INF = 2 ** 62
+
+
+@dataclass
+class RaptorLeg:
+    """A leg of a journey found by the router, either a vehicle trip or a walk.
+
+    The stops of a walk that starts at the origin or ends at the destination of the journey are None.
+
+    """
+    mode: str
+    departure: int
+    arrival: int
+    stops: List[Optional[int]] = field(default_factory=list)
+    route: Optional[int] = None
+    trip: Optional[int] = None
+
+    @property
+    def is_walking(self):
+        return self.mode == 'walking'
+
+
+class RaptorRouter:
+    """Router of earliest-arrival journeys in a timetable with RAPTOR.
+
+    The trips of a route pattern are assumed not to overtake each other, such that the earliest trip to
+    board at a stop is found by binary search over the departures at the stop.
+
+    Args:
+        timetable: The timetable
+        max_rounds: The maximum number of vehicle trips of a journey
+        transfer_slack: The time in seconds to change vehicles at the same stop
+
+    """
+    def __init__(self,
+                 timetable: Timetable,
+                 max_rounds: int = 5,
+                 transfer_slack: int = 60,
+                 ):
+        self.timetable = timetable
+        self.max_rounds = max_rounds
+        self.transfer_slack = transfer_slack
+
+    def route(self,
+              departure_time: int,
+              access: Dict[int, int],
+              egress: Dict[int, int],
+              active_services: np.ndarray,
+              walking_speed: float = 1.33,
+              allowed_routes: Optional[np.ndarray] = None,
+              ) -> List[List[RaptorLeg]]:
+        """Find the journeys of earliest arrival for each number of vehicle trips, fewest trips first.
+
+        Args:
+            departure_time: The departure time from the origin in seconds after midnight
+            access: The walking time in seconds from the origin to the stops it is near
+            egress: The walking time in seconds from the stops near the destination to the destination
+            active_services: The mask of the services that run on the day, see `Timetable.active_services`
+            walking_speed: The walking speed in metres per second of the transfers between stops
+            allowed_routes: Optional mask of the route patterns that may be used
+
+        """
+        tt = self.timetable
+        best: Dict[int, int] = {}
+        labels: List[Dict[int, int]] = [{}]
+        parents: List[Dict[int, tuple]] = [{}]
+        marked = set()
+        for stop, walk in access.items():
+            t = departure_time + walk
+            if t < best.get(stop, _INF):
+                best[stop] = t
+                labels[0][stop] = t
+                parents[0][stop] = ('access', departure_time, t)
+                marked.add(stop)
+        # The stops reached on foot from the origin are also reached on foot via the transfers from them
+        marked |= self._relax_transfers(marked, labels[0], parents[0], best, _INF, walking_speed)
+
+        journeys = []
+        best_target = _INF
+        for k in range(1, self.max_rounds + 1):
+            previous = labels[k - 1]
+            current: Dict[int, int] = {}
+            parent: Dict[int, tuple] = {}
+            labels.append(current)
+            parents.append(parent)
+            slack = 0 if k == 1 else self.transfer_slack
+
+            # The routes to scan, each from the earliest of its stops improved in the previous round
+            queue: Dict[int, int] = {}
+            for stop in marked:
+                for j in range(tt.stop_routes_start[stop], tt.stop_routes_start[stop + 1]):
+                    route, pos = int(tt.stop_routes[j]), int(tt.stop_routes_pos[j])
+                    if allowed_routes is not None and not allowed_routes[route]:
+                        continue
+                    if pos < queue.get(route, _INF):
+                        queue[route] = pos
+            marked = set()
+
+            for route, first_pos in queue.items():
+                stops = tt.route_stops[tt.route_stops_start[route]:tt.route_stops_start[route + 1]].tolist()
+                arrivals, departures = tt.route_times(route)
+                services = tt.trip_service[tt.route_trips_start[route]:tt.route_trips_start[route + 1]]
+                trip, board_pos = None, None
+                for pos in range(first_pos, len(stops)):
+                    stop = stops[pos]
+                    if trip is not None:
+                        t = int(arrivals[trip, pos])
+                        if t < min(best.get(stop, _INF), best_target):
+                            current[stop] = t
+                            best[stop] = t
+                            parent[stop] = ('trip', route, trip, board_pos, pos)
+                            marked.add(stop)
+                    t_prev = previous.get(stop)
+                    if t_prev is not None and (trip is None or t_prev + slack <= departures[trip, pos]):
+                        earlier = self._earliest_trip(departures[:, pos], services, active_services, t_prev + slack)
+                        if earlier is not None and (trip is None or earlier < trip):
+                            trip, board_pos = earlier, pos
+
+            # Walking transfers from the stops reached by a trip in this round
+            marked |= self._relax_transfers(marked, current, parent, best, best_target, walking_speed)
+
+            improved = None
+            for stop, walk in egress.items():
+                t = current.get(stop)
+                if t is not None and t + walk < best_target:
+                    best_target = t + walk
+                    improved = stop
+            if improved is not None:
+                journeys.append(self._reconstruct(labels, parents, k, improved, egress[improved]))
+
+            if not marked:
+                break
+
+        return journeys
+
+    def _relax_transfers(self, stops, labels, parents, best, best_target, walking_speed) -> set:
+        """Walk the transfers from the stops, and return the stops whose arrival improved."""
+        tt = self.timetable
+        improved = set()
+        for stop, t_stop in [(stop, labels[stop]) for stop in stops]:
+            for j in range(tt.transfers_start[stop], tt.transfers_start[stop + 1]):
+                to_stop = int(tt.transfers_to[j])
+                t = t_stop + int(round(float(tt.transfers_distance[j]) / walking_speed))
+                if t < min(best.get(to_stop, _INF), best_target):
+                    labels[to_stop] = t
+                    best[to_stop] = t
+                    parents[to_stop] = ('walk', stop, t_stop, t)
+                    improved.add(to_stop)
+        return improved
+
+    @staticmethod
+    def _earliest_trip(departures: np.ndarray, services: np.ndarray, active_services: np.ndarray, t: int) -> Optional[int]:
+        """The earliest trip that runs on the day and departs the stop at or after the time."""
+        trip = int(np.searchsorted(departures, t, side='left'))
+        while trip < len(departures) and not active_services[services[trip]]:
+            trip += 1
+        return trip if trip < len(departures) else None
+
+    def _reconstruct(self, labels, parents, k: int, stop: int, egress_walk: int) -> List[RaptorLeg]:
+        """Trace the journey back from the stop the destination is walked to, merging consecutive walks."""
+        tt = self.timetable
+        t_stop = labels[k][stop]
+        legs = [RaptorLeg(mode='walking', departure=t_stop, arrival=t_stop + egress_walk, stops=[stop, None])]
+
+        def _add(leg):
+            if leg.is_walking and legs[-1].is_walking:
+                legs[-1] = RaptorLeg(mode='walking', departure=leg.departure, arrival=legs[-1].arrival,
+                                     stops=leg.stops[:-1] + legs[-1].stops)
+            else:
+                legs.append(leg)
+
+        while True:
+            label = parents[k][stop]
+            if label[0] == 'access':
+                _add(RaptorLeg(mode='walking', departure=label[1], arrival=label[2], stops=[None, stop]))
+                break
+            elif label[0] == 'walk':
+                _, from_stop, departure, arrival = label
+                _add(RaptorLeg(mode='walking', departure=departure, arrival=arrival, stops=[from_stop, stop]))
+                stop = from_stop
+            else:
+                _, route, trip, board_pos, alight_pos = label
+                arrivals, departures = tt.route_times(route)
+                stops = tt.route_stops[tt.route_stops_start[route]:tt.route_stops_start[route + 1]]
+                _add(RaptorLeg(
+                    mode=str(tt.route_modes[route]),
+                    departure=int(departures[trip, board_pos]),
+                    arrival=int(arrivals[trip, alight_pos]),
+                    stops=stops[board_pos:alight_pos + 1].tolist(),
+                    route=route,
+                    trip=int(tt.route_trips_start[route]) + trip,
+                ))
+                stop = int(stops[board_pos])
+                k -= 1
+
+        legs.reverse()
+        # Walks of no length, such as from the origin when it is at a stop, are dropped
+        return [leg for leg in legs if not (leg.is_walking and leg.arrival == leg.departure and None in leg.stops)]
+
@@ -0,0 +1,271 @@
+"""Journey searches in a local timetable, with the call contract of `JourneyPlannerSearch`.
+
+The searches return payloads in the shape of the TfL Journey API, limited to the fields that
+`JourneyPlannerSearchPayloadProcessor` reads, so the local searches can stand in for the TfL API in the planner.
+
+"""
+import json
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple, Union, List
+
+import numpy as np
+
+from tfl_api import Priority, JourneyPlannerSearch, JourneyPlannerSearchParams
+from tfl_api.journey_planner import TimeIs, WalkingSpeed
+from .timetable import Timetable
+from .transfers import haversine, nearby_stops
+from .router import RaptorRouter, RaptorLeg
+
+Location = Union[str, Tuple[float, float]]
+
+# Walking speeds in metres per second
+_WALKING_SPEEDS = {
+    WalkingSpeed.SLOW: 1.0,
+    WalkingSpeed.AVERAGE: 1.33,
+    WalkingSpeed.FAST: 1.67,
+}
+
+# Search parameters the local router cannot honour; a search that sets any of them raises
+_UNSUPPORTED_PARAMS = (
+    'national_search', 'accessibility_preference', 'cycle_preference', 'bike_proficiency',
+    'alternative_cycle', 'taxi_only_trip', 'adjustment',
+)
+
+
+class UnsupportedQueryError(ValueError):
+    """Raised when a search cannot be answered from the local timetable, such as a search for free-text
+    locations or for the arrival time.
+
+    """
+
+
+class LocalJourneyPlannerSearch:
+    """Search for journeys between two locations in a local timetable, without a round trip to the TfL API.
+
+    The locations must be WGS84 coordinates, as a tuple or as "lat,long", or the stop ids of the timetable.
+    Free-text locations and postcodes, searches for the arrival time and parameters the router does not
+    model raise `UnsupportedQueryError`; combine the search with `FallbackJourneyPlannerSearch` to answer
+    these with the TfL API. So do searches for modes of transport other than walking that are not in the
+    timetable, such as cycling. If no journey is found, the status code is 404.
+
+    The parameters `journey_preference`, `max_transfer_minutes`, `alternative_walking` and
+    `walking_optimization` are ignored: the router returns the fastest journey for each number of vehicle
+    trips, which covers the preferences for few interchanges and for short journeys, and it does not limit
+    the time of transfers or offer walking alternatives.
+
+    Args:
+        timetable: The timetable, see `load_gtfs`
+        max_walking_distance: The maximum distance in metres to walk to the first stop and from the last stop
+        max_rounds: The maximum number of vehicle trips of a journey
+        transfer_slack: The time in seconds to change vehicles at the same stop
+
+    """
+    def __init__(self,
+                 timetable: Timetable,
+                 max_walking_distance: float = 1000.0,
+                 max_rounds: int = 5,
+                 transfer_slack: int = 60,
+                 ):
+        self.timetable = timetable
+        self.max_walking_distance = max_walking_distance
+        self.router = RaptorRouter(timetable, max_rounds=max_rounds, transfer_slack=transfer_slack)
+        self._stop_index = {stop_id: k for k, stop_id in enumerate(timetable.stop_ids.tolist())}
+        self.status_code = None
+        self._lock = threading.Lock()
+
+    def __call__(self,
+                 from_loc: Location,
+                 to_loc: Location,
+                 params: JourneyPlannerSearchParams,
+                 ):
+        """Plan a journey between two locations, given a set of preferences and times. The status code is
+        set on the search; from several threads, use `search`, which returns it.
+
+        """
+        status_code, payload = self.search(from_loc, to_loc, params)
+        with self._lock:
+            self.status_code = status_code
+        return payload
+
+    def search(self,
+               from_loc: Location,
+               to_loc: Location,
+               params: JourneyPlannerSearchParams,
+               priority: Optional[Priority] = None,
+               ) -> Tuple[int, Dict]:
+        """Plan a journey between two locations and return the status code along with the payload.
+
+        The priority is accepted for compatibility with `JourneyPlannerSearch` and not used.
+
+        """
+        for name in _UNSUPPORTED_PARAMS:
+            if getattr(params, name, None):
+                raise UnsupportedQueryError(f'Parameter {name} is not supported by the local router')
+        if params.time_is is not None and TimeIs(params.time_is) == TimeIs.ARRIVING:
+            raise UnsupportedQueryError('Searches for the arrival time are not supported by the local router')
+
+        from_lat, from_lon, from_name = self._locate(from_loc, params.from_name)
+        to_lat, to_lon, to_name = self._locate(to_loc, params.to_name)
+
+        now = datetime.now()
+        date = params.date if params.date is not None else now.strftime('%Y%m%d')
+        time = params.time if params.time is not None else now.strftime('%H%M')
+        departure_time = int(time[:2]) * 3600 + int(time[2:]) * 60
+
+        walking_speed = _WALKING_SPEEDS[WalkingSpeed(params.walking_speed or WalkingSpeed.AVERAGE)]
+        max_walking_distance = self.max_walking_distance
+        if params.max_walking_minutes is not None:
+            max_walking_distance = min(max_walking_distance, params.max_walking_minutes * 60 * walking_speed)
+
+        allowed_routes = None
+        if params.mode:
+            modes = set(str(getattr(mode, 'value', mode)) for mode in params.mode) - {'walking'}
+            missing = modes - set(self.timetable.route_modes.tolist())
+            if missing:
+                raise UnsupportedQueryError(f'Modes {sorted(missing)} are not in the local timetable')
+            allowed_routes = np.isin(self.timetable.route_modes, list(modes))
+
+        access = self._walks(from_lat, from_lon, max_walking_distance, walking_speed)
+        egress = self._walks(to_lat, to_lon, max_walking_distance, walking_speed)
+        raptor_journeys = self.router.route(
+            departure_time=departure_time,
+            access=access,
+            egress=egress,
+            active_services=self.timetable.active_services(date),
+            walking_speed=walking_speed,
+            allowed_routes=allowed_routes,
+        )
+
+        ends = ((from_lat, from_lon, from_name), (to_lat, to_lon, to_name))
+        midnight = datetime.strptime(date, '%Y%m%d')
+        journeys = [self._journey_payload(legs, ends, midnight) for legs in raptor_journeys]
+
+        direct = float(haversine(from_lat, from_lon, to_lat, to_lon))
+        if direct <= max_walking_distance:
+            walk = RaptorLeg(mode='walking', departure=departure_time,
+                             arrival=departure_time + int(round(direct / walking_speed)), stops=[None, None])
+            journeys.append(self._journey_payload([walk], ends, midnight))
+
+        if len(journeys) == 0:
+            return 404, {'message': f'No journey found from {from_name} to {to_name}'}
+        return 200, {'journeys': journeys}
+
+    def _locate(self, loc: Location, name: Optional[str]) -> Tuple[float, float, str]:
+        """The coordinates and name of a location given as coordinates or as a stop id."""
+        if isinstance(loc, str) and loc in self._stop_index:
+            stop = self._stop_index[loc]
+            return (float(self.timetable.stop_lat[stop]), float(self.timetable.stop_lon[stop]),
+                    name or str(self.timetable.stop_names[stop]))
+        loc_str = JourneyPlannerSearch._normalize_loc(loc)
+        try:
+            lat, lon = (float(x) for x in loc_str.split(','))
+        except ValueError:
+            raise UnsupportedQueryError(f'Location {loc} is neither coordinates nor a stop of the timetable')
+        return lat, lon, name or loc_str
+
+    def _walks(self, lat: float, lon: float, max_distance: float, walking_speed: float) -> Dict[int, int]:
+        """The walking times in seconds between the coordinate and the stops near it."""
+        stops, distances = nearby_stops(self.timetable.stop_lat, self.timetable.stop_lon, lat, lon, max_distance)
+        return {int(stop): int(round(distance / walking_speed)) for stop, distance in zip(stops, distances)}
+
+    def _journey_payload(self, legs: List[RaptorLeg], ends, midnight: datetime) -> Dict:
+        """The journey in the shape of the TfL Journey API."""
+        def _time(seconds):
+            return (midnight + timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%S')
+
+        return {
+            'startDateTime': _time(legs[0].departure),
+            'arrivalDateTime': _time(legs[-1].arrival),
+            'duration': math.ceil((legs[-1].arrival - legs[0].departure) / 60),
+            'legs': [
+                self._leg_payload(leg, ends, _time) for leg in legs
+            ],
+        }
+
+    def _leg_payload(self, leg: RaptorLeg, ends, _time) -> Dict:
+        tt = self.timetable
+        (from_lat, from_lon, from_name), (to_lat, to_lon, to_name) = ends
+        points, names = [], []
+        for k, stop in enumerate(leg.stops):
+            if stop is None:
+                lat, lon, name = (from_lat, from_lon, from_name) if k == 0 else (to_lat, to_lon, to_name)
+            else:
+                lat, lon, name = float(tt.stop_lat[stop]), float(tt.stop_lon[stop]), str(tt.stop_names[stop])
+            points.append([round(lat, 6), round(lon, 6)])
+            names.append(name)
+
+        if leg.is_walking:
+            detailed = f'Walk to {names[-1]}'
+        else:
+            route = leg.route
+            last_stop = tt.route_stops[tt.route_stops_start[route + 1] - 1]
+            detailed = f'{tt.route_names[route]} {leg.mode} towards {tt.stop_names[last_stop]}'
+
+        return {
+            'departureTime': _time(leg.departure),
+            'arrivalTime': _time(leg.arrival),
+            'duration': math.ceil((leg.arrival - leg.departure) / 60),
+            'instruction': {'detailed': detailed, 'steps': []},
+            'departurePoint': {'commonName': names[0]},
+            'arrivalPoint': {'commonName': names[-1]},
+            'mode': {'id': leg.mode, 'name': leg.mode},
+            'path': {'lineString': json.dumps(points)},
+        }
+
+
+class FallbackJourneyPlannerSearch:
+    """Search for journeys in a local timetable, and fall back to the TfL API for the searches the local
+    router cannot answer or finds no journey for. The search can be used from several threads at once.
+
+    Args:
+        local: The search in the local timetable
+        remote: The search of the TfL Journey API
+
+    """
+    def __init__(self,
+                 local: LocalJourneyPlannerSearch,
+                 remote: JourneyPlannerSearch,
+                 ):
+        self.local = local
+        self.remote = remote
+        self.n_local = 0
+        self.n_fallback = 0
+        self.status_code = None
+        self._lock = threading.Lock()
+
+    def __call__(self,
+                 from_loc: Location,
+                 to_loc: Location,
+                 params: JourneyPlannerSearchParams,
+                 ):
+        """Plan a journey between two locations, given a set of preferences and times. The status code is
+        set on the search; from several threads, use `search`, which returns it.
+
+        """
+        status_code, payload = self.search(from_loc, to_loc, params)
+        with self._lock:
+            self.status_code = status_code
+        return payload
+
+    def search(self,
+               from_loc: Location,
+               to_loc: Location,
+               params: JourneyPlannerSearchParams,
+               priority: Optional[Priority] = None,
+               ) -> Tuple[int, Dict]:
+        """Plan a journey between two locations and return the status code along with the payload.
+
+        """
+        try:
+            status_code, payload = self.local.search(from_loc, to_loc, params, priority=priority)
+            if status_code == 200:
+                with self._lock:
+                    self.n_local += 1
+                return status_code, payload
+        except UnsupportedQueryError:
+            pass
+        with self._lock:
+            self.n_fallback += 1
+        return self.remote.search(from_loc, to_loc, params, priority=priority)
@@ -0,0 +1,343 @@
+"""Public-transport timetable in array-backed structures, loaded from a GTFS feed.
+
+The trips of the feed are grouped into route patterns, which are trips that visit the same sequence of
+stops. The stops, patterns, stop times and walking transfers are stored in flat NumPy arrays with offsets,
+the layout the RAPTOR algorithm scans, and which is compact to cache on disk.
+
+"""
+import os
+import csv
+import io
+import zipfile
+from dataclasses import dataclass, fields
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+
+from .transfers import walking_transfers
+
+# GTFS route types, including the extended route types, mapped to the modes of the TfL API
+_GTFS_ROUTE_TYPE_TO_MODE = {
+    0: 'tram',
+    1: 'tube',
+    2: 'national-rail',
+    3: 'bus',
+    4: 'river-bus',
+    5: 'tram',
+    6: 'cable-car',
+    7: 'tram',
+    11: 'bus',
+    12: 'national-rail',
+}
+
+# Modes of the TfL API that GTFS route types do not tell apart from the others, recognised by the names of
+# the routes and their agencies. The lines of the London Overground are named since 2024.
+_TFL_MODE_NAMES = (
+    ('elizabeth-line', ('elizabeth line', 'tfl rail')),
+    ('dlr', ('docklands light railway', 'dlr')),
+    ('overground', ('overground', 'liberty', 'lioness', 'mildmay', 'suffragette', 'weaver', 'windrush')),
+)
+
+
+def _route_mode(route_type: int, names) -> str:
+    """The TfL mode of a GTFS route, given its route type and the names of the route and its agency."""
+    words = set()
+    texts = []
+    for name in names:
+        if name:
+            texts.append(name.lower())
+            words.update(name.lower().replace('-', ' ').split())
+    for mode, mode_names in _TFL_MODE_NAMES:
+        for mode_name in mode_names:
+            if (' ' in mode_name and any(mode_name in text for text in texts)) or mode_name in words:
+                return mode
+    return _GTFS_ROUTE_TYPE_TO_MODE.get(route_type, _GTFS_ROUTE_TYPE_TO_MODE.get(route_type // 100, 'bus'))
+
+
+@dataclass
+class Timetable:
+    """The timetable of stops, route patterns, trips and walking transfers, as flat arrays with offsets.
+
+    For route pattern `r`, its stops are `route_stops[route_stops_start[r]:route_stops_start[r + 1]]`, its
+    trips are `route_trips_start[r]` to `route_trips_start[r + 1]` sorted by departure, and the arrival and
+    departure times in seconds after midnight of its trips at its stops are in `arrivals` and `departures`
+    from offset `route_times_start[r]`, trip by trip.
+
+    """
+    stop_ids: np.ndarray
+    stop_names: np.ndarray
+    stop_lat: np.ndarray
+    stop_lon: np.ndarray
+
+    route_names: np.ndarray
+    route_modes: np.ndarray
+    route_stops_start: np.ndarray
+    route_stops: np.ndarray
+    route_trips_start: np.ndarray
+    route_times_start: np.ndarray
+    arrivals: np.ndarray
+    departures: np.ndarray
+
+    trip_ids: np.ndarray
+    trip_service: np.ndarray
+
+    stop_routes_start: np.ndarray
+    stop_routes: np.ndarray
+    stop_routes_pos: np.ndarray
+
+    transfers_start: np.ndarray
+    transfers_to: np.ndarray
+    transfers_distance: np.ndarray
+
+    service_ids: np.ndarray
+    service_days: np.ndarray
+    service_start: np.ndarray
+    service_end: np.ndarray
+    exception_service: np.ndarray
+    exception_date: np.ndarray
+    exception_added: np.ndarray
+
+    max_transfer_distance: float = 300.0
+
+    @property
+    def n_stops(self):
+        return len(self.stop_ids)
+
+    @property
+    def n_routes(self):
+        return len(self.route_names)
+
+    def route_times(self, route: int):
+        """The arrival and departure times of the trips of the route pattern, as matrices of trips by stops."""
+        n_stops = self.route_stops_start[route + 1] - self.route_stops_start[route]
+        start, end = self.route_times_start[route], self.route_times_start[route + 1]
+        return (
+            self.arrivals[start:end].reshape(-1, n_stops),
+            self.departures[start:end].reshape(-1, n_stops),
+        )
+
+    def active_services(self, date: str) -> np.ndarray:
+        """The mask of the services that run on the date, given as YYYYMMDD."""
+        date_int = int(date)
+        weekday = datetime.strptime(date, '%Y%m%d').weekday()
+        active = (
+            self.service_days[:, weekday]
+            & (self.service_start <= date_int)
+            & (self.service_end >= date_int)
+        )
+        on_date = self.exception_date == date_int
+        active[self.exception_service[on_date & self.exception_added]] = True
+        active[self.exception_service[on_date & ~self.exception_added]] = False
+        return active
+
+    def save(self, file_path: str):
+        """Save the timetable to a compressed NumPy archive at the path, as given."""
+        with open(file_path, 'wb') as f:
+            np.savez_compressed(f, **{f.name: getattr(self, f.name) for f in fields(self)})
+
+    @classmethod
+    def load(cls, file_path: str) -> 'Timetable':
+        """Load a timetable saved with `save`."""
+        with np.load(file_path, allow_pickle=False) as data:
+            values = {f.name: data[f.name] for f in fields(cls)}
+        values['max_transfer_distance'] = float(values['max_transfer_distance'])
+        return cls(**values)
+
+
+def _gtfs_time(value: str) -> int:
+    hours, minutes, seconds = value.strip().split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _offsets(counts) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]).astype(np.int64)
+
+
+class _GTFSFeed:
+    """Read the text files of a GTFS feed from a directory or a zip archive."""
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+
+    def has(self, name: str) -> bool:
+        if self._zip is not None:
+            return name in self._zip.namelist()
+        return os.path.exists(os.path.join(self.path, name))
+
+    def rows(self, name: str):
+        if self._zip is not None:
+            f = io.TextIOWrapper(self._zip.open(name), encoding='utf-8-sig')
+        else:
+            f = open(os.path.join(self.path, name), 'r', encoding='utf-8-sig')
+        with f:
+            yield from csv.DictReader(f)
+
+
+def load_gtfs(path: str,
+              cache_path: Optional[str] = None,
+              max_transfer_distance: float = 300.0,
+              ) -> Timetable:
+    """Load the timetable of a GTFS feed, from a compact on-disk cache if one exists that is newer than the
+    feed and was built with the same maximum transfer distance.
+
+    Args:
+        path: The directory or zip archive of the GTFS feed
+        cache_path: Optional path of the NumPy archive to cache the timetable in
+        max_transfer_distance: The maximum distance in metres between stops to walk between them in a transfer,
+            in addition to the transfers in the feed
+
+    """
+    if cache_path is not None and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        try:
+            timetable = Timetable.load(cache_path)
+        except KeyError:
+            # A cache of an earlier layout of the timetable
+            timetable = None
+        if timetable is not None and timetable.max_transfer_distance == max_transfer_distance:
+            return timetable
+
+    timetable = _build_timetable(_GTFSFeed(path), max_transfer_distance)
+    if cache_path is not None:
+        timetable.save(cache_path)
+    return timetable
+
+
+def _build_timetable(feed: _GTFSFeed, max_transfer_distance: float) -> Timetable:
+    stop_index: Dict[str, int] = {}
+    stop_ids, stop_names, stop_lat, stop_lon = [], [], [], []
+    for row in feed.rows('stops.txt'):
+        stop_index[row['stop_id']] = len(stop_ids)
+        stop_ids.append(row['stop_id'])
+        stop_names.append(row.get('stop_name', row['stop_id']))
+        stop_lat.append(float(row['stop_lat']))
+        stop_lon.append(float(row['stop_lon']))
+
+    agency_names = {}
+    if feed.has('agency.txt'):
+        agency_names = {row.get('agency_id', ''): row.get('agency_name') for row in feed.rows('agency.txt')}
+
+    routes = {}
+    for row in feed.rows('routes.txt'):
+        route_type = int(row.get('route_type', 3))
+        routes[row['route_id']] = (
+            row.get('route_short_name') or row.get('route_long_name') or row['route_id'],
+            _route_mode(route_type, (row.get('route_short_name'), row.get('route_long_name'),
+                                     agency_names.get(row.get('agency_id', '')))),
+        )
+
+    service_index: Dict[str, int] = {}
+    service_days, service_start, service_end = [], [], []
+    if feed.has('calendar.txt'):
+        for row in feed.rows('calendar.txt'):
+            service_index[row['service_id']] = len(service_days)
+            service_days.append([row[day] == '1' for day in
+                                 ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')])
+            service_start.append(int(row['start_date']))
+            service_end.append(int(row['end_date']))
+
+    exception_service, exception_date, exception_added = [], [], []
+    if feed.has('calendar_dates.txt'):
+        for row in feed.rows('calendar_dates.txt'):
+            if row['service_id'] not in service_index:
+                service_index[row['service_id']] = len(service_days)
+                service_days.append([False] * 7)
+                service_start.append(0)
+                service_end.append(0)
+            exception_service.append(service_index[row['service_id']])
+            exception_date.append(int(row['date']))
+            exception_added.append(row['exception_type'] == '1')
+
+    trips = {}
+    for row in feed.rows('trips.txt'):
+        if row['service_id'] not in service_index:
+            # Services without a calendar are taken to run every day
+            service_index[row['service_id']] = len(service_days)
+            service_days.append([True] * 7)
+            service_start.append(0)
+            service_end.append(99991231)
+        trips[row['trip_id']] = (row['route_id'], service_index[row['service_id']])
+
+    stop_times = defaultdict(list)
+    for row in feed.rows('stop_times.txt'):
+        arrival = row.get('arrival_time') or row.get('departure_time')
+        departure = row.get('departure_time') or arrival
+        if not arrival:
+            continue
+        stop_times[row['trip_id']].append((
+            int(row['stop_sequence']), stop_index[row['stop_id']], _gtfs_time(arrival), _gtfs_time(departure),
+        ))
+
+    # Group the trips into patterns of the same route and sequence of stops
+    patterns = defaultdict(list)
+    for trip_id, times in stop_times.items():
+        if trip_id not in trips or len(times) < 2:
+            continue
+        times.sort()
+        route_id, service = trips[trip_id]
+        key = (route_id, tuple(stop for _, stop, _, _ in times))
+        patterns[key].append((times[0][3], trip_id, service, [a for _, _, a, _ in times], [d for _, _, _, d in times]))
+
+    route_names, route_modes, route_stops, route_n_stops, route_n_trips = [], [], [], [], []
+    trip_ids, trip_service, arrivals, departures = [], [], [], []
+    for (route_id, pattern_stops), pattern_trips in patterns.items():
+        pattern_trips.sort()
+        name, mode = routes.get(route_id, (route_id, 'bus'))
+        route_names.append(name)
+        route_modes.append(mode)
+        route_stops.extend(pattern_stops)
+        route_n_stops.append(len(pattern_stops))
+        route_n_trips.append(len(pattern_trips))
+        for _, trip_id, service, trip_arrivals, trip_departures in pattern_trips:
+            trip_ids.append(trip_id)
+            trip_service.append(service)
+            arrivals.extend(trip_arrivals)
+            departures.extend(trip_departures)
+
+    route_stops_start = _offsets(route_n_stops)
+    stop_routes = defaultdict(list)
+    for route in range(len(route_names)):
+        for pos, stop in enumerate(route_stops[route_stops_start[route]:route_stops_start[route + 1]]):
+            stop_routes[stop].append((route, pos))
+    stop_routes_flat = [stop_routes[stop] for stop in range(len(stop_ids))]
+
+    stop_lat = np.array(stop_lat, dtype=np.float64)
+    stop_lon = np.array(stop_lon, dtype=np.float64)
+    feed_transfers = []
+    if feed.has('transfers.txt'):
+        for row in feed.rows('transfers.txt'):
+            if row['from_stop_id'] in stop_index and row['to_stop_id'] in stop_index:
+                feed_transfers.append((stop_index[row['from_stop_id']], stop_index[row['to_stop_id']]))
+    transfers = walking_transfers(stop_lat, stop_lon, max_transfer_distance, feed_transfers)
+
+    return Timetable(
+        stop_ids=np.array(stop_ids, dtype=str),
+        stop_names=np.array(stop_names, dtype=str),
+        stop_lat=stop_lat,
+        stop_lon=stop_lon,
+        route_names=np.array(route_names, dtype=str),
+        route_modes=np.array(route_modes, dtype=str),
+        route_stops_start=route_stops_start,
+        route_stops=np.array(route_stops, dtype=np.int32),
+        route_trips_start=_offsets(route_n_trips),
+        route_times_start=_offsets([n_stops * n_trips for n_stops, n_trips in zip(route_n_stops, route_n_trips)]),
+        arrivals=np.array(arrivals, dtype=np.int32),
+        departures=np.array(departures, dtype=np.int32),
+        trip_ids=np.array(trip_ids, dtype=str),
+        trip_service=np.array(trip_service, dtype=np.int32),
+        stop_routes_start=_offsets([len(x) for x in stop_routes_flat]),
+        stop_routes=np.array([route for x in stop_routes_flat for route, _ in x], dtype=np.int32),
+        stop_routes_pos=np.array([pos for x in stop_routes_flat for _, pos in x], dtype=np.int32),
+        transfers_start=transfers[0],
+        transfers_to=transfers[1],
+        transfers_distance=transfers[2],
+        service_ids=np.array(sorted(service_index, key=service_index.get), dtype=str),
+        service_days=np.array(service_days, dtype=bool).reshape(-1, 7),
+        service_start=np.array(service_start, dtype=np.int32),
+        service_end=np.array(service_end, dtype=np.int32),
+        exception_service=np.array(exception_service, dtype=np.int32),
+        exception_date=np.array(exception_date, dtype=np.int32),
+        exception_added=np.array(exception_added, dtype=bool),
+        max_transfer_distance=float(max_transfer_distance),
+    )
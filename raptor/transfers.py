@@ -0,0 +1,83 @@
+"""Walking distances between stops, and between stops and arbitrary coordinates.
+
+"""
+from collections import defaultdict
+from typing import Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS = 6371008.8
+
+# The size in degrees of the grid cells the stops are bucketed into to find the stops near each other
+_GRID_CELL = 0.01
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """The great-circle distance in metres between points, broadcast over arrays of coordinates."""
+    lat1, lon1, lat2, lon2 = (np.radians(x) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def nearby_stops(stop_lat: np.ndarray,
+                 stop_lon: np.ndarray,
+                 lat: float,
+                 lon: float,
+                 max_distance: float,
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+    """The stops within the distance of the coordinate, and their distances in metres, nearest first."""
+    distance = haversine(stop_lat, stop_lon, lat, lon)
+    stops = np.flatnonzero(distance <= max_distance)
+    order = np.argsort(distance[stops])
+    return stops[order], distance[stops][order]
+
+
+def walking_transfers(stop_lat: np.ndarray,
+                      stop_lon: np.ndarray,
+                      max_distance: float,
+                      extra_transfers: Sequence[Tuple[int, int]] = (),
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The footpaths between stops within walking distance of each other, as offsets into the destination
+    stops and the distances in metres.
+
+    The stops are bucketed into a grid, so only stops in neighbouring cells are compared.
+
+    Args:
+        stop_lat: The latitudes of the stops
+        stop_lon: The longitudes of the stops
+        max_distance: The maximum distance in metres of a footpath
+        extra_transfers: Pairs of stops to add footpaths between regardless of their distance, such as
+            the transfers of a GTFS feed
+
+    """
+    cells = defaultdict(list)
+    cell_lat = np.floor(stop_lat / _GRID_CELL).astype(np.int64)
+    cell_lon = np.floor(stop_lon / _GRID_CELL).astype(np.int64)
+    for stop, key in enumerate(zip(cell_lat.tolist(), cell_lon.tolist())):
+        cells[key].append(stop)
+    cells = {key: np.array(stops, dtype=np.int64) for key, stops in cells.items()}
+
+    footpaths = defaultdict(dict)
+    for (i, j), stops in cells.items():
+        neighbours = [cells[(i + di, j + dj)] for di in (-1, 0, 1) for dj in (-1, 0, 1) if (i + di, j + dj) in cells]
+        neighbours = np.concatenate(neighbours)
+        distance = haversine(
+            stop_lat[stops][:, None], stop_lon[stops][:, None], stop_lat[neighbours][None, :], stop_lon[neighbours][None, :],
+        )
+        for row, col in zip(*np.nonzero(distance <= max_distance)):
+            from_stop, to_stop = int(stops[row]), int(neighbours[col])
+            if from_stop != to_stop:
+                footpaths[from_stop][to_stop] = float(distance[row, col])
+
+    for from_stop, to_stop in extra_transfers:
+        if from_stop != to_stop and to_stop not in footpaths[from_stop]:
+            footpaths[from_stop][to_stop] = float(haversine(
+                stop_lat[from_stop], stop_lon[from_stop], stop_lat[to_stop], stop_lon[to_stop],
+            ))
+
+    n_stops = len(stop_lat)
+    counts = [len(footpaths.get(stop, ())) for stop in range(n_stops)]
+    start = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]).astype(np.int64)
+    to = np.array([to_stop for stop in range(n_stops) for to_stop in footpaths.get(stop, {})], dtype=np.int32)
+    distance = np.array([d for stop in range(n_stops) for d in footpaths.get(stop, {}).values()], dtype=np.float32)
+    return start, to, distance
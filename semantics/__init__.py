@@ -1,4 +1,8 @@
 from .anthropic.engine import (
     Engine,
+    AsyncEngine,
     AnthropicMessageParams,
+    ToolCallTiming,
+    PromptCacheParams,
+    TokenUsage,
 )
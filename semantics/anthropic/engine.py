@@ -2,11 +2,15 @@
 
 """
 import os
-from typing import Optional, Dict, Any, List
+import time
+import asyncio
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Generator
 from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, Future
 import json
 
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 from anthropic.types import TextBlock, ToolUseBlock, MessageParam, ToolResultBlockParam
 
 from base import ToolSet
@@ -19,6 +23,43 @@ class AnthropicMessageParams:
     temperature: float = 0.7
 
 
+@dataclass
+class PromptCacheParams:
+    """Which parts of the requests to mark as cacheable with prompt caching. The tool definitions are cached
+    with a breakpoint at the last tool, and the conversation with a breakpoint at the last message, which
+    rolls forward with the conversation, such that each request reads the prefix the previous one wrote.
+
+    """
+    system_prompt: bool = True
+    tools: bool = True
+    messages: bool = True
+
+
+@dataclass
+class TokenUsage:
+    """The number of tokens of the requests, the cache reads and writes included"""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+
+    def add(self, usage):
+        for name in ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens'):
+            setattr(self, name, getattr(self, name) + (getattr(usage, name, None) or 0))
+
+
+_CACHE_CONTROL = {'type': 'ephemeral'}
+
+
+def _with_cache_control(block) -> Dict:
+    """A copy of the content block as a dictionary, marked as a cache breakpoint."""
+    if isinstance(block, str):
+        block = {'type': 'text', 'text': block}
+    elif hasattr(block, 'to_dict'):
+        block = block.to_dict()
+    return {**block, 'cache_control': _CACHE_CONTROL}
+
+
 @dataclass
 class MessageStack:
     messages: List[Dict] = field(default_factory=list)
@@ -56,23 +97,89 @@ class MessageStack:
         return MessageStack(self.messages[item])
 
 
+@dataclass
+class ToolCallTiming:
+    """The timing of a call to a tool"""
+    name: str
+    tool_use_id: str
+    start: float
+    seconds: float
+    ok: bool = True
+
+
+class _ToolCalls:
+    """The tool calls of a response, run on a bounded executor as they are submitted, with the results
+    returned in the order of submission. A tool that is not parallel waits for the tools submitted before it
+    to complete, and runs before the tools submitted after it start.
+
+    """
+    def __init__(self, engine: 'Engine', max_workers: int):
+        self.engine = engine
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+        self._calls: List[Tuple[str, Future]] = []
+
+    def submit(self, tool_use: ToolUseBlock):
+        if self._executor is not None and self.engine.tool_set.is_parallel(tool_use.name):
+            future = self._executor.submit(self.engine._run_tool, tool_use)
+        else:
+            for _, _future in self._calls:
+                _future.exception()
+            future = Future()
+            try:
+                future.set_result(self.engine._run_tool(tool_use))
+            except Exception as exc:
+                future.set_exception(exc)
+        self._calls.append((tool_use.id, future))
+
+    def results(self) -> List[Tuple[str, str]]:
+        """The ids of the tool uses and the outputs of the tools, in the order of submission."""
+        return [(tool_use_id, future.result()) for tool_use_id, future in self._calls]
+
+    def __len__(self):
+        return len(self._calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
 class Engine:
     """The main object to interact with the Anthropic API.
 
     The `process` method handles the interactions with input prompts.
 
+    The tools the LLM model calls in one response run concurrently, at most `max_parallel_tools` at once,
+    apart from the tools the tool set declares not parallel. The results are returned to the model in the
+    order of the calls. The timings of the tool calls are recorded in `tool_timings`.
+
+    With prompt caching, the system prompt, the tool definitions and the conversation so far are marked as
+    cacheable, see `PromptCacheParams`. The tokens of the requests, the cache reads and writes included, are
+    added up in `token_usage`, and those of the last request are in `last_token_usage`.
+
+    Engines can share a client, given as `client`, in which case the API key is not read.
+
     """
+    client_class = Anthropic
+
     def __init__(self,
                  api_key_env_var: str,
                  system_prompt: str,
                  message_params: AnthropicMessageParams,
                  name: Optional[str] = None,
                  tools: Optional[ToolSet] = None,
+                 max_parallel_tools: int = 4,
+                 prompt_cache: Optional[PromptCacheParams] = None,
+                 client: Optional[Any] = None,
                  ):
-        api_key = os.getenv(api_key_env_var)
-        if not api_key:
-            raise ValueError(f'Did not find an API key in environment variable {api_key_env_var}')
-        self.client = Anthropic(api_key=os.getenv(api_key_env_var))
+        if client is None:
+            api_key = os.getenv(api_key_env_var)
+            if not api_key:
+                raise ValueError(f'Did not find an API key in environment variable {api_key_env_var}')
+            client = self.client_class(api_key=api_key)
+        self.client = client
         self.system_prompt = system_prompt
         self.name = name
         self.message_params = message_params
@@ -82,6 +189,12 @@ class Engine:
         self.tool_spec = self.tool_set.tools_spec
         self.tool_choice = None
         self.interpret_tool_use_output = True
+        self.max_parallel_tools = max_parallel_tools
+        self.tool_timings: List[ToolCallTiming] = []
+        self._timings_lock = threading.Lock()
+        self.prompt_cache = prompt_cache
+        self.token_usage = TokenUsage()
+        self.last_token_usage = TokenUsage()
 
         self._message_stack = MessageStack()
 
@@ -92,9 +205,14 @@ class Engine:
                 tools_choice_name: Optional[str] = None,
                 interpret_tool_use_output: bool = True,
                 with_memory: bool = True,
+                stream: bool = False,
                 ):
         """Process the input prompt and return the output.
 
+        In the streaming mode, a generator of the text of the output is returned instead, which yields the text
+        of the LLM model as it is generated. The tools the model calls start as soon as their tool use blocks
+        are complete in the stream. The message stack is the same as without streaming.
+
         Args:
             input_prompt: The input prompt to the agent
             input_structured: The structured input data, which enable the caller to the agent to pass structured data
@@ -104,6 +222,28 @@ class Engine:
             interpret_tool_use_output: Whether to interpret the tool output; note that this leads to recursive calls to
                 the LLM model until it returns a message without tool use
             with_memory: Whether to keep the memory of the conversation between process calls
+            stream: Whether to stream the output
+
+        """
+        length_message_stack = self._push_input(input_prompt, input_structured, tool_choice_type, tools_choice_name,
+                                                interpret_tool_use_output, with_memory)
+
+        if stream:
+            return self._process_stream(length_message_stack)
+
+        if self.what_does_ai_say():
+            return self._output(length_message_stack)
+
+    def _push_input(self,
+                    input_prompt: str,
+                    input_structured: Optional[Dict[str, Any]],
+                    tool_choice_type: str,
+                    tools_choice_name: Optional[str],
+                    interpret_tool_use_output: bool,
+                    with_memory: bool,
+                    ) -> int:
+        """Set up the engine for the input prompt, add it to the message stack, and return the length of the
+        stack, after which the messages of the response are added.
 
         """
         if not with_memory:
@@ -127,40 +267,133 @@ class Engine:
                 type='text',
             )]
         ))
-        length_message_stack = len(self._message_stack)
-
-        if self.what_does_ai_say():
-            added_messages = self._message_stack[length_message_stack:]
-            if self.interpret_tool_use_output:
-                text_out = added_messages.pull_text_by_role('assistant')
-            else:
-                text_out = added_messages.pull_tool_result()
-            return '\n\n'.join([text for text in text_out])
-
-    def what_does_ai_say(self):
-        tool_outputs = []
-        response = self.client.messages.create(
-            messages=self._message_stack.content,
-            system=self.system_prompt,
+        return len(self._message_stack)
+
+    def _output(self, length_message_stack: int) -> str:
+        added_messages = self._message_stack[length_message_stack:]
+        if self.interpret_tool_use_output:
+            text_out = added_messages.pull_text_by_role('assistant')
+        else:
+            text_out = added_messages.pull_tool_result()
+        return '\n\n'.join([text for text in text_out])
+
+    def _process_stream(self, length_message_stack: int) -> Generator[str, None, None]:
+        """Stream the output of `process`. The text blocks are separated as in the output without streaming."""
+        if self.interpret_tool_use_output:
+            is_first_block = True
+            for is_new_block, text in self.what_does_ai_say_stream():
+                if is_new_block:
+                    if not is_first_block:
+                        yield '\n\n'
+                    is_first_block = False
+                elif text:
+                    yield text
+        else:
+            for _ in self.what_does_ai_say_stream():
+                pass
+            yield '\n\n'.join(self._message_stack[length_message_stack:].pull_tool_result())
+
+    def _create_kwargs(self) -> Dict[str, Any]:
+        """The arguments of the request to the Messages API, with the cache breakpoints if prompt caching."""
+        messages = self._message_stack.content
+        system = self.system_prompt
+        tools = self.tool_spec
+        if self.prompt_cache is not None:
+            if self.prompt_cache.system_prompt and system:
+                system = [_with_cache_control(system)]
+            if self.prompt_cache.tools and tools:
+                tools = list(tools[:-1]) + [{**tools[-1], 'cache_control': _CACHE_CONTROL}]
+            if self.prompt_cache.messages and messages:
+                last = messages[-1]
+                content = last['content']
+                if isinstance(content, str):
+                    content = [content]
+                if content:
+                    content = list(content[:-1]) + [_with_cache_control(content[-1])]
+                    messages = list(messages[:-1]) + [{**last, 'content': content}]
+        return dict(
+            messages=messages,
+            system=system,
             model=self.message_params.model,
             max_tokens=self.message_params.max_tokens,
             temperature=self.message_params.temperature,
-            tools=self.tool_spec,
+            tools=tools,
             tool_choice=self.tool_choice,
         )
+
+    def _record_usage(self, response):
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        self.last_token_usage = TokenUsage()
+        self.last_token_usage.add(usage)
+        self.token_usage.add(usage)
+        print(f'  tokens: {self.last_token_usage.input_tokens} in, {self.last_token_usage.output_tokens} out, '
+              f'{self.last_token_usage.cache_read_input_tokens} read from cache, '
+              f'{self.last_token_usage.cache_creation_input_tokens} written to cache')
+
+    def what_does_ai_say(self):
+        response = self.client.messages.create(**self._create_kwargs())
         self._message_stack.append(MessageParam(
             role=response.role,
             content=response.content,)
         )
         print(f'agent: {self.name}')
+        self._record_usage(response)
+
+        with _ToolCalls(self, self.max_parallel_tools) as tool_calls:
+            for message in response.content:
+                if isinstance(message, ToolUseBlock):
+                    print(f'  tool use: {message.name}')
+                    tool_calls.submit(message)
+            tool_outputs = tool_calls.results()
+        self._append_tool_outputs(tool_outputs)
 
-        for message in response.content:
-            if isinstance(message, ToolUseBlock):
-                print(f'  tool use: {message.name}')
-                tool_output = self.tool_set(message.name, **message.input)
-                tool_call_id = message.id
-                tool_outputs.append((tool_call_id, tool_output))
+        # If tool was used, the AI can optionally interpret the tool output by invoking itself recursively,
+        # but with the tool output as part of its input
+        if response.stop_reason == 'tool_use':
+            if self.interpret_tool_use_output:
+                return self.what_does_ai_say()
+            else:
+                return True
+        elif response.stop_reason == 'end_turn':
+            return True
 
+    def what_does_ai_say_stream(self) -> Generator[Tuple[bool, str], None, bool]:
+        """As `what_does_ai_say`, but stream the response. The generator yields a pair for the start of each
+        text block, with the first element true, and a pair for each text delta, with the first element false.
+        The tools start as soon as their tool use blocks stop, while the rest of the response streams.
+
+        """
+        with _ToolCalls(self, self.max_parallel_tools) as tool_calls:
+            with self.client.messages.stream(**self._create_kwargs()) as stream:
+                for event in stream:
+                    if event.type == 'content_block_start' and event.content_block.type == 'text':
+                        yield True, ''
+                    elif event.type == 'text':
+                        yield False, event.text
+                    elif event.type == 'content_block_stop' and event.content_block.type == 'tool_use':
+                        print(f'  tool use: {event.content_block.name}')
+                        tool_calls.submit(event.content_block)
+                response = stream.get_final_message()
+            self._message_stack.append(MessageParam(
+                role=response.role,
+                content=response.content,)
+            )
+            print(f'agent: {self.name}')
+            self._record_usage(response)
+            tool_outputs = tool_calls.results()
+        self._append_tool_outputs(tool_outputs)
+
+        if response.stop_reason == 'tool_use':
+            if self.interpret_tool_use_output:
+                return (yield from self.what_does_ai_say_stream())
+            else:
+                return True
+        elif response.stop_reason == 'end_turn':
+            return True
+
+    def _append_tool_outputs(self, tool_outputs: List[Tuple[str, str]]):
         if len(tool_outputs) > 0:
             self._message_stack.append(MessageParam(
                 role='user',
@@ -173,12 +406,110 @@ class Engine:
                 ]
             ))
 
-        # If tool was used, the AI can optionally interpret the tool output by invoking itself recursively,
-        # but with the tool output as part of its input
+    def _run_tool(self, tool_use: ToolUseBlock) -> str:
+        """Run the tool of the tool use block, and record its timing."""
+        start = time.time()
+        t_start = time.perf_counter()
+        ok = False
+        try:
+            output = self.tool_set(tool_use.name, **tool_use.input)
+            ok = True
+            return output
+        finally:
+            self._record_timing(tool_use, start, time.perf_counter() - t_start, ok)
+
+    def _record_timing(self, tool_use: ToolUseBlock, start: float, seconds: float, ok: bool):
+        with self._timings_lock:
+            self.tool_timings.append(ToolCallTiming(
+                name=tool_use.name,
+                tool_use_id=tool_use.id,
+                start=start,
+                seconds=seconds,
+                ok=ok,
+            ))
+
+
+class AsyncEngine(Engine):
+    """The engine on the asynchronous client of the Anthropic API, such that one event loop can serve many
+    conversations at once, see `Engine`.
+
+    The `process` method is a coroutine. The tools are called through `ToolSet.acall`, such that tools that
+    are coroutines, such as the sub-task agents of asynchronous engines, are awaited, and other tools run in
+    threads. The tools of a response run concurrently as with `Engine`. Streaming is not supported.
+
+    """
+    client_class = AsyncAnthropic
+
+    async def process(self,
+                      input_prompt: str,
+                      input_structured: Optional[Dict[str, Any]] = None,
+                      tool_choice_type: str = 'auto',
+                      tools_choice_name: Optional[str] = None,
+                      interpret_tool_use_output: bool = True,
+                      with_memory: bool = True,
+                      ):
+        """Process the input prompt and return the output, see `Engine.process`."""
+        length_message_stack = self._push_input(input_prompt, input_structured, tool_choice_type, tools_choice_name,
+                                                interpret_tool_use_output, with_memory)
+        if await self.what_does_ai_say():
+            return self._output(length_message_stack)
+
+    async def what_does_ai_say(self):
+        response = await self.client.messages.create(**self._create_kwargs())
+        self._message_stack.append(MessageParam(
+            role=response.role,
+            content=response.content,)
+        )
+        print(f'agent: {self.name}')
+        self._record_usage(response)
+
+        tool_uses = [message for message in response.content if isinstance(message, ToolUseBlock)]
+        for tool_use in tool_uses:
+            print(f'  tool use: {tool_use.name}')
+        self._append_tool_outputs(await self._run_tools(tool_uses))
+
         if response.stop_reason == 'tool_use':
             if self.interpret_tool_use_output:
-                return self.what_does_ai_say()
+                return await self.what_does_ai_say()
             else:
                 return True
         elif response.stop_reason == 'end_turn':
             return True
+
+    async def _run_tools(self, tool_uses: List[ToolUseBlock]) -> List[Tuple[str, str]]:
+        """Run the tools as tasks, at most `max_parallel_tools` at once, with the tools that are not parallel
+        run on their own, and return the outputs in the order of the tool uses.
+
+        """
+        semaphore = asyncio.Semaphore(max(1, self.max_parallel_tools))
+
+        async def _run(tool_use):
+            async with semaphore:
+                return await self._arun_tool(tool_use)
+
+        tasks = []
+        try:
+            for tool_use in tool_uses:
+                if self.tool_set.is_parallel(tool_use.name):
+                    tasks.append(asyncio.create_task(_run(tool_use)))
+                else:
+                    if tasks:
+                        await asyncio.wait(tasks)
+                    task = asyncio.create_task(self._arun_tool(tool_use))
+                    await asyncio.wait([task])
+                    tasks.append(task)
+            return [(tool_use.id, await task) for tool_use, task in zip(tool_uses, tasks)]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _arun_tool(self, tool_use: ToolUseBlock) -> str:
+        start = time.time()
+        t_start = time.perf_counter()
+        ok = False
+        try:
+            output = await self.tool_set.acall(tool_use.name, **tool_use.input)
+            ok = True
+            return output
+        finally:
+            self._record_timing(tool_use, start, time.perf_counter() - t_start, ok)
@@ -1,7 +1,13 @@
+from .rate_limit import TokenBucketRateLimiter, Priority
+from .coalesce import SingleFlight, AsyncSingleFlight
 from .client import TFLClient
+from .async_client import AsyncTFLClient
+from .cache import ResponseCache, CachedTFLClient, AsyncCachedTFLClient
+from .resolver import LocationResolverCache
 from .journey_planner import (
     JourneyPlannerSearchParams,
     JourneyPlannerSearch,
+    AsyncJourneyPlannerSearch,
     JourneyPlannerSearchPayloadProcessor,
     get_description_for_field_
 )
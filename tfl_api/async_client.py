@@ -0,0 +1,154 @@
+"""Asynchronous client to interact with the Transport for London Unified API.
+
+"""
+import os
+import asyncio
+import random
+from typing import Optional, Dict, Sequence
+import httpx
+
+from .client import _BASE_URL_TFL, _RETRY_STATUS_CODES, _prepare_params, canonical_request_key
+from .rate_limit import TokenBucketRateLimiter, Priority
+from .coalesce import AsyncSingleFlight
+from .projection import Projection, AsyncByteReader, extract_projected_async
+
+
+class AsyncTFLClient:
+    """Asynchronous client to interact with the TFL API.
+
+    The client is the non-blocking counterpart to `TFLClient` and returns the same status code and payload,
+    such that the payload processing is unchanged. Many requests can be in flight at once in a single event
+    loop; the number of concurrent requests to the TfL API is bounded by a semaphore.
+
+    Args:
+        env_var_app_key: The name of the environment variable that holds the app key for the TFL API
+        max_concurrency: The maximum number of requests in flight at any one time
+        pool_maxsize: The maximum number of connections kept alive in the pool
+        connect_timeout: The timeout in seconds to establish a connection
+        read_timeout: The timeout in seconds to wait for the server to send data
+        max_retries: The maximum number of retries for failed requests
+        backoff_factor: The base factor in seconds of the exponential backoff between retries
+        backoff_jitter: The maximum random jitter in seconds added to each backoff
+        retry_status_codes: The status codes of the responses that are retried
+        rate_limiter: Optional rate limiter that keeps the requests within the quota of the app key; the
+            limiter can be shared with other clients using the same app key
+        base_url: The base URL of the TfL API, which can be set to a stand-in server for testing
+        single_flight: Optional coalescing of identical requests in flight at the same time from several
+            tasks into a single request to the TfL API
+
+    """
+    def __init__(self,
+                 env_var_app_key,
+                 max_concurrency: int = 16,
+                 pool_maxsize: int = 16,
+                 connect_timeout: float = 3.05,
+                 read_timeout: float = 30.0,
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 backoff_jitter: float = 0.5,
+                 retry_status_codes: Sequence[int] = _RETRY_STATUS_CODES,
+                 rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                 base_url: str = _BASE_URL_TFL,
+                 single_flight: Optional[AsyncSingleFlight] = None,
+                 ):
+        self.app_key = os.getenv(env_var_app_key)
+        if self.app_key is None:
+            raise ValueError(f'Did not find an app key in environment variable {env_var_app_key}')
+
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.retry_status_codes = retry_status_codes
+        self.rate_limiter = rate_limiter
+        self.single_flight = single_flight
+
+        self.session = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize,
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def get(self,
+                  endpoint,
+                  params: Optional[Dict[str, str]] = None,
+                  priority: Priority = Priority.INTERACTIVE,
+                  projection: Optional[Projection] = None,
+                  ):
+        """Get data from the TFL API, using the given endpoint and parameters.
+
+        The priority only matters if the client has a rate limiter, in which case requests of higher
+        priority are let through first when the quota is exhausted. Every retry takes a token as well. If
+        the client coalesces requests, callers of an identical request that is already in flight share its
+        response. If a projection is given, a payload with status 200 is parsed incrementally and only the
+        fields in the projection are materialised, see `TFLClient.get`.
+
+        """
+        if self.single_flight is None:
+            return await self._get(endpoint, params, priority, projection)
+        return await self.single_flight.do(
+            canonical_request_key(endpoint, params, projection),
+            lambda: self._get(endpoint, params, priority, projection),
+        )
+
+    async def _get(self, endpoint, params, priority, projection):
+        params = _prepare_params(params, self.app_key)
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire_async(priority)
+                try:
+                    response = await self.session.send(
+                        self.session.build_request('GET', endpoint, params=params),
+                        stream=projection is not None,
+                    )
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+
+                if response.status_code == 429 and self.rate_limiter is not None:
+                    self.rate_limiter.record_throttled_response()
+                if response.status_code in self.retry_status_codes and attempt < self.max_retries:
+                    await response.aclose()
+                    await asyncio.sleep(self._backoff(attempt, response.headers.get('Retry-After')))
+                    continue
+                break
+
+            try:
+                if projection is not None and response.status_code == 200:
+                    payload = await extract_projected_async(AsyncByteReader(response.aiter_bytes()), projection)
+                    return response.status_code, payload
+                await response.aread()
+            finally:
+                await response.aclose()
+
+        # Unlike `requests`, `httpx` considers any non-2xx status an error, but the TfL API
+        # returns status 300 for ambiguous locations, which is a valid payload
+        if response.is_error:
+            response.raise_for_status()
+
+        return response.status_code, response.json()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after is not None:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return self.backoff_factor * (2 ** attempt) + random.uniform(0, self.backoff_jitter)
+
+    async def close(self):
+        """Close the pooled connections of the client."""
+        await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
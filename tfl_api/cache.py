@@ -0,0 +1,206 @@
+"""Cache of responses from the TfL API.
+
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, Sequence, Any
+
+from .client import TFLClient, canonical_request_key
+from .async_client import AsyncTFLClient
+from .rate_limit import Priority
+from .projection import Projection
+
+
+class ResponseCache:
+    """Cache of TfL API responses with a bounded in-memory LRU tier and an optional on-disk tier.
+
+    Entries expire after a time-to-live that can be set per endpoint, since for example journey results
+    go stale faster than station data. The on-disk tier is an SQLite database, which survives restarts of
+    the process. Note that cached payloads are shared between callers and should be treated as read-only.
+
+    Args:
+        max_entries: The maximum number of responses kept in memory; the least recently used is evicted
+        default_ttl: The time-to-live in seconds of responses from endpoints without a specific time-to-live
+        endpoint_ttls: Time-to-live in seconds for endpoints, matched on the longest endpoint prefix, for
+            example `{'Journey/JourneyResults': 300.0}`
+        disk_path: Optional path to the SQLite database of the on-disk tier
+        cacheable_status_codes: The status codes of the responses to cache; status 300 is the TfL API
+            response for ambiguous locations
+
+    """
+    def __init__(self,
+                 max_entries: int = 1024,
+                 default_ttl: float = 300.0,
+                 endpoint_ttls: Optional[Dict[str, float]] = None,
+                 disk_path: Optional[str] = None,
+                 cacheable_status_codes: Sequence[int] = (200, 300),
+                 ):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.endpoint_ttls = {k.strip('/'): v for k, v in (endpoint_ttls or {}).items()}
+        self.cacheable_status_codes = cacheable_status_codes
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+        self._disk = None
+        if disk_path is not None:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(key TEXT PRIMARY KEY, status_code INTEGER, payload TEXT, expires REAL)'
+            )
+            self._disk.commit()
+
+    def ttl(self, endpoint: str) -> float:
+        """The time-to-live in seconds of responses from the given endpoint."""
+        endpoint = endpoint.strip('/')
+        matches = [prefix for prefix in self.endpoint_ttls if endpoint.startswith(prefix)]
+        if not matches:
+            return self.default_ttl
+        return self.endpoint_ttls[max(matches, key=len)]
+
+    def get(self, key: str) -> Optional[Tuple[int, Any]]:
+        """Get the status code and payload for the key, or None if the response is not cached."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, status_code, payload = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return status_code, payload
+                del self._memory[key]
+                self._counters['expirations'] += 1
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    'SELECT status_code, payload, expires FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    status_code, payload_str, expires = row
+                    if expires > now:
+                        payload = json.loads(payload_str)
+                        self._put_memory(key, expires, status_code, payload)
+                        self._counters['disk_hits'] += 1
+                        return status_code, payload
+                    self._disk.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    self._disk.commit()
+                    self._counters['expirations'] += 1
+
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, key: str, endpoint: str, status_code: int, payload: Any):
+        """Put a response in the cache, if its status code is cacheable."""
+        if status_code not in self.cacheable_status_codes:
+            return
+        expires = time.time() + self.ttl(endpoint)
+        with self._lock:
+            self._put_memory(key, expires, status_code, payload)
+            if self._disk is not None:
+                self._disk.execute(
+                    'INSERT OR REPLACE INTO responses (key, status_code, payload, expires) VALUES (?, ?, ?, ?)',
+                    (key, status_code, json.dumps(payload), expires)
+                )
+                self._disk.commit()
+
+    def _put_memory(self, key, expires, status_code, payload):
+        self._memory[key] = (expires, status_code, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def clear(self):
+        """Remove all responses from the cache, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.execute('DELETE FROM responses')
+                self._disk.commit()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counters of cache hits, misses, evictions and expirations, and the number of entries in memory."""
+        with self._lock:
+            return dict(self._counters, entries=len(self._memory))
+
+    def __len__(self):
+        return len(self._memory)
+
+
+class CachedTFLClient:
+    """Client to the TfL API that serves repeated requests from a response cache.
+
+    The cached client has the same interface as `TFLClient`, so it can be passed to `JourneyPlannerSearch`
+    in place of the client it wraps.
+
+    Args:
+        client: The TfL client that requests responses not in the cache
+        cache: The response cache
+
+    """
+    def __init__(self, client: TFLClient, cache: Optional[ResponseCache] = None):
+        self.client = client
+        self.cache = cache if cache is not None else ResponseCache()
+
+    def get(self,
+            endpoint,
+            params: Optional[Dict[str, str]] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            projection: Optional[Projection] = None,
+            ):
+        """Get data from the cache or else the TFL API, using the given endpoint and parameters.
+
+        """
+        key = canonical_request_key(endpoint, params, projection)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        status_code, payload = self.client.get(endpoint, params=params, priority=priority, projection=projection)
+        self.cache.put(key, endpoint, status_code, payload)
+        return status_code, payload
+
+
+class AsyncCachedTFLClient:
+    """Asynchronous client to the TfL API that serves repeated requests from a response cache.
+
+    Args:
+        client: The asynchronous TfL client that requests responses not in the cache
+        cache: The response cache, which can be shared with a `CachedTFLClient`
+
+    """
+    def __init__(self, client: AsyncTFLClient, cache: Optional[ResponseCache] = None):
+        self.client = client
+        self.cache = cache if cache is not None else ResponseCache()
+
+    async def get(self,
+                  endpoint,
+                  params: Optional[Dict[str, str]] = None,
+                  priority: Priority = Priority.INTERACTIVE,
+                  projection: Optional[Projection] = None,
+                  ):
+        """Get data from the cache or else the TFL API, using the given endpoint and parameters.
+
+        """
+        key = canonical_request_key(endpoint, params, projection)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        status_code, payload = await self.client.get(endpoint, params=params, priority=priority, projection=projection)
+        self.cache.put(key, endpoint, status_code, payload)
+        return status_code, payload
@@ -0,0 +1,258 @@
+"""Record and replay of responses from the TfL API, which enables offline benchmarks and tests.
+
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote, parse_qsl
+from typing import Optional, Dict, Tuple, Any, Iterator
+import requests
+
+from .client import TFLClient, canonical_request_key
+from .rate_limit import Priority
+from .projection import Projection, project_payload
+
+
+class CassetteNotFoundError(LookupError):
+    """Raised when no recorded response exists for a request."""
+
+
+class CassetteStore:
+    """Store of recorded responses from the TfL API, one JSON file per request in a directory.
+
+    Args:
+        directory: The directory of the cassettes, which is created if it does not exist
+
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{hashlib.sha1(key.encode("utf-8")).hexdigest()}.json')
+
+    def save(self, key: str, status_code: int, payload: Any):
+        """Save the response to the request with the given canonical key."""
+        with open(self._file_path(key), 'w') as f:
+            json.dump({'key': key, 'status_code': status_code, 'payload': payload}, f)
+
+    def load(self, key: str) -> Tuple[int, Any]:
+        """Load the status code and payload recorded for the request with the given canonical key."""
+        try:
+            with open(self._file_path(key), 'r') as f:
+                cassette = json.load(f)
+        except FileNotFoundError:
+            raise CassetteNotFoundError(f'No recorded response for request {key}')
+        return cassette['status_code'], cassette['payload']
+
+    def __contains__(self, key: str):
+        return os.path.exists(self._file_path(key))
+
+    def keys(self) -> Iterator[str]:
+        for file_name in sorted(os.listdir(self.directory)):
+            if file_name.endswith('.json'):
+                with open(os.path.join(self.directory, file_name), 'r') as f:
+                    yield json.load(f)['key']
+
+    def __len__(self):
+        return sum(1 for file_name in os.listdir(self.directory) if file_name.endswith('.json'))
+
+
+class RecordingTFLClient:
+    """Client to the TfL API that records every response into a cassette store, including the responses
+    with status 300 for ambiguous locations.
+
+    Args:
+        client: The TfL client that makes the requests
+        store: The store of the recorded responses
+
+    """
+    def __init__(self, client: TFLClient, store: CassetteStore):
+        self.client = client
+        self.store = store
+
+    def get(self,
+            endpoint,
+            params: Optional[Dict[str, str]] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            projection: Optional[Projection] = None,
+            ):
+        """Get data from the TFL API, using the given endpoint and parameters, and record the response.
+
+        The full payload is recorded, such that it can be replayed with any projection.
+
+        """
+        key = canonical_request_key(endpoint, params)
+        status_code, payload = self.client.get(endpoint, params=params, priority=priority)
+        self.store.save(key, status_code, payload)
+        if projection is not None and status_code == 200:
+            payload = project_payload(payload, projection)
+        return status_code, payload
+
+
+class _FaultInjection:
+    """Latency and errors injected into replayed responses."""
+    def __init__(self, latency, latency_jitter, error_rate, error_status_code, seed):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status_code = error_status_code
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> Tuple[float, bool]:
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            is_error = self._random.random() < self.error_rate
+        return delay, is_error
+
+
+class ReplayTFLClient:
+    """In-process stand-in for the TfL client, which replays recorded responses.
+
+    The latency and error rate of the TfL API can be emulated, such that benchmarks of the planning and the
+    agent tools are repeatable and do not require network access or an app key.
+
+    Args:
+        store: The store of the recorded responses
+        latency: The latency in seconds added to every response
+        latency_jitter: The maximum random latency in seconds added on top of the fixed latency
+        error_rate: The fraction of requests that fail with an HTTP error
+        error_status_code: The status code of the injected errors
+        seed: The seed of the random draws of latency and errors
+
+    """
+    def __init__(self,
+                 store: CassetteStore,
+                 latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_status_code: int = 503,
+                 seed: Optional[int] = None,
+                 ):
+        self.store = store
+        self._faults = _FaultInjection(latency, latency_jitter, error_rate, error_status_code, seed)
+
+    def get(self,
+            endpoint,
+            params: Optional[Dict[str, str]] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            projection: Optional[Projection] = None,
+            ):
+        """Get the recorded response for the given endpoint and parameters.
+
+        """
+        delay, is_error = self._faults.draw()
+        if delay > 0:
+            time.sleep(delay)
+
+        if is_error:
+            response = requests.Response()
+            response.status_code = self._faults.error_status_code
+            response.url = endpoint
+            raise requests.HTTPError(f'{response.status_code} Injected error for url: {endpoint}', response=response)
+
+        status_code, payload = self.store.load(canonical_request_key(endpoint, params))
+        if projection is not None and status_code == 200:
+            payload = project_payload(payload, projection)
+        return status_code, payload
+
+
+class ReplayServer:
+    """Local HTTP server that stands in for the TfL API and replays recorded responses.
+
+    Unlike `ReplayTFLClient`, the server exercises the full HTTP transport of the clients. Point a client to
+    the server with its `base_url` argument. Requests without a recorded response get status 404.
+
+    Args:
+        store: The store of the recorded responses
+        host: The host to bind the server to
+        port: The port to bind the server to; the default 0 selects a free port
+        latency: The latency in seconds added to every response
+        latency_jitter: The maximum random latency in seconds added on top of the fixed latency
+        error_rate: The fraction of requests that fail with an HTTP error
+        error_status_code: The status code of the injected errors
+        seed: The seed of the random draws of latency and errors
+
+    """
+    def __init__(self,
+                 store: CassetteStore,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_status_code: int = 503,
+                 seed: Optional[int] = None,
+                 ):
+        self.store = store
+        self._faults = _FaultInjection(latency, latency_jitter, error_rate, error_status_code, seed)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def _make_handler(self):
+        store = self.store
+        faults = self._faults
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                key = canonical_request_key(unquote(url.path), dict(parse_qsl(url.query)))
+
+                delay, is_error = faults.draw()
+                if delay > 0:
+                    time.sleep(delay)
+
+                if is_error:
+                    self._send(faults.error_status_code, {'message': 'Injected error'})
+                    return
+                try:
+                    status_code, payload = store.load(key)
+                except CassetteNotFoundError as e:
+                    self._send(404, {'message': str(e)})
+                    return
+                self._send(status_code, payload)
+
+            def _send(self, status_code, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return _Handler
+
+    def start(self):
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -4,38 +4,248 @@ Anders Ohrn, 2024 Oct
 
 """
 import os
-from typing import Optional, Dict
+import time
+import random
+from enum import Enum
+from typing import Optional, Dict, Sequence, Union
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .rate_limit import TokenBucketRateLimiter, Priority
+from .coalesce import SingleFlight
+from .projection import Projection, extract_projected
 
 _BASE_URL_TFL = 'https://api.tfl.gov.uk/'
+_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def _prepare_params(params: Optional[Dict[str, str]], app_key: str) -> Dict[str, str]:
+    """Add the app key to the parameters of a request and encode values as the TfL API expects."""
+    params = _encode_params(params)
+    params['app_key'] = app_key
+    return params
+
+
+def _encode_params(params: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Encode the values of the parameters of a request as the TfL API expects.
+
+    Parameters without a value are dropped, enumerations are replaced by their values, and lists are joined
+    with commas.
+
+    """
+    encoded = {}
+    for key, value in (params or {}).items():
+        if value is None:
+            continue
+        elif isinstance(value, (list, tuple)):
+            encoded[key] = ','.join(_param_str(v) for v in value)
+        else:
+            encoded[key] = _param_str(value)
+    return encoded
+
+
+def canonical_request_key(endpoint: str,
+                          params: Optional[Dict[str, str]] = None,
+                          projection: Optional[Projection] = None,
+                          ) -> str:
+    """The canonical key of a request to the TfL API, which is the same for requests that are sure to
+    return the same response. The app key is excluded from the key. Requests with different projections
+    of the payload have different keys.
+
+    """
+    encoded = _encode_params(params)
+    encoded.pop('app_key', None)
+    query = '&'.join(f'{key}={value}' for key, value in sorted(encoded.items()))
+    key = f'{endpoint.strip("/")}?{query}'
+    if projection is not None:
+        key += f'#{projection.key}'
+    return key
+
+
+def _param_str(value) -> str:
+    if isinstance(value, Enum):
+        return str(value.value)
+    return str(value)
 
 
 class TFLClient:
     """Basic client to interact with the TFL API.
 
+    The client owns a pooled HTTP transport, such that connections to the TfL API are kept alive and reused
+    between calls rather than a new TCP and TLS handshake being made for every request. Requests that fail
+    with a rate limit or server error status are retried with jittered exponential backoff, which respects
+    the `Retry-After` header if the TfL API provides one. If the client has a rate limiter, every retry takes
+    a token as well, as in `AsyncTFLClient`.
+
     Args:
         env_var_app_key: The name of the environment variable that holds the app key for the TFL API
+        pool_connections: The number of hosts for which connection pools are cached
+        pool_maxsize: The maximum number of connections kept alive in the pool per host
+        connect_timeout: The timeout in seconds to establish a connection
+        read_timeout: The timeout in seconds to wait for the server to send data
+        max_retries: The maximum number of retries for failed requests
+        backoff_factor: The base factor in seconds of the exponential backoff between retries
+        backoff_jitter: The maximum random jitter in seconds added to each backoff
+        retry_status_codes: The status codes of the responses that are retried
+        rate_limiter: Optional rate limiter that keeps the requests within the quota of the app key; the
+            limiter can be shared with other clients using the same app key
+        base_url: The base URL of the TfL API, which can be set to a stand-in server for testing
+        single_flight: Optional coalescing of identical requests in flight at the same time from several
+            threads into a single request to the TfL API
 
     """
-    def __init__(self, env_var_app_key):
+    def __init__(self,
+                 env_var_app_key,
+                 pool_connections: int = 4,
+                 pool_maxsize: int = 16,
+                 connect_timeout: float = 3.05,
+                 read_timeout: float = 30.0,
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 backoff_jitter: float = 0.5,
+                 retry_status_codes: Sequence[int] = _RETRY_STATUS_CODES,
+                 rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                 base_url: str = _BASE_URL_TFL,
+                 single_flight: Optional[SingleFlight] = None,
+                 ):
         self.app_key = os.getenv(env_var_app_key)
         if self.app_key is None:
             raise ValueError(f'Did not find an app key in environment variable {env_var_app_key}')
 
-    def get(self, endpoint, params: Optional[Dict[str, str]] = None):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.retry_status_codes = retry_status_codes
+        # With a rate limiter, the responses with retry status codes are retried by the client rather than by
+        # the transport, such that every attempt goes through the limiter
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(
+                total=max_retries,
+                connect=max_retries,
+                read=max_retries,
+                status=max_retries if rate_limiter is None else 0,
+                backoff_factor=backoff_factor,
+                backoff_jitter=backoff_jitter,
+                status_forcelist=retry_status_codes if rate_limiter is None else (),
+                allowed_methods=frozenset(['GET']),
+                respect_retry_after_header=rate_limiter is None,
+                raise_on_status=False,
+            ),
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        self.session.headers.update({'Connection': 'keep-alive'})
+
+        self.rate_limiter = rate_limiter
+        self.single_flight = single_flight
+        self._n_requests = 0
+
+    def get(self,
+            endpoint,
+            params: Optional[Dict[str, str]] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            projection: Optional[Projection] = None,
+            ):
         """Get data from the TFL API, using the given endpoint and parameters.
 
+        The priority only matters if the client has a rate limiter, in which case requests of higher
+        priority are let through first when the quota is exhausted. If the client coalesces requests,
+        callers of an identical request that is already in flight share its response.
+
+        If a projection is given, a payload with status 200 is parsed incrementally from the response stream
+        and only the fields in the projection are materialised. Payloads with other status codes, such as
+        the disambiguation options of status 300, are parsed in full.
+
         """
-        if params is None:
-            params = {'app_key': self.app_key}
-        else:
-            params.update({'app_key': self.app_key})
+        if self.single_flight is None:
+            return self._get(endpoint, params, priority, projection)
+        return self.single_flight.do(
+            canonical_request_key(endpoint, params, projection),
+            lambda: self._get(endpoint, params, priority, projection),
+        )
+
+    def _get(self, endpoint, params, priority, projection):
+        params = _prepare_params(params, self.app_key)
+
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(priority)
+            response = self.session.get(
+                f'{self.base_url}{endpoint}',
+                params=params,
+                timeout=self.timeout,
+                stream=projection is not None,
+            )
+            self._n_requests += 1
+
+            if self.rate_limiter is None:
+                break
+            if response.status_code == 429:
+                self.rate_limiter.record_throttled_response()
+            if response.status_code in self.retry_status_codes and attempt < self.max_retries:
+                response.close()
+                time.sleep(self._backoff(attempt, response.headers.get('Retry-After')))
+                continue
+            break
+
+        # A streamed response holds its pooled connection until closed, whether it is read in full or not
+        try:
+            response.raise_for_status()
+
+            if projection is not None and response.status_code == 200:
+                response.raw.decode_content = True
+                return response.status_code, extract_projected(response.raw, projection)
+
+            return response.status_code, response.json()
+        finally:
+            if projection is not None:
+                response.close()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after is not None:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return self.backoff_factor * (2 ** attempt) + random.uniform(0, self.backoff_jitter)
+
+    @property
+    def pool_stats(self) -> Dict[str, Union[int, Dict[str, Dict[str, int]]]]:
+        """Statistics of the connection pools, which are useful to size the pool to the load.
+
+        For each host the number of connections that have been opened, the number of requests sent, and the
+        number of idle connections available for reuse are reported.
+
+        """
+        pools = {}
+        pool_manager = self._adapter.poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            pools[f'{pool.scheme}://{pool.host}:{pool.port}'] = {
+                'num_connections': pool.num_connections,
+                'num_requests': pool.num_requests,
+                'num_idle_connections': sum(conn is not None for conn in list(pool.pool.queue)) if pool.pool is not None else 0,
+                'maxsize': pool.pool.maxsize if pool.pool is not None else 0,
+            }
+        return {
+            'num_requests': self._n_requests,
+            'pools': pools,
+        }
 
-        for key, value in params.items():
-            if isinstance(value, list):
-                params[key] = ','.join(value)
+    def close(self):
+        """Close the pooled connections of the client."""
+        self.session.close()
 
-        response = requests.get(f'{_BASE_URL_TFL}{endpoint}', params=params)
-        response.raise_for_status()
+    def __enter__(self):
+        return self
 
-        return response.status_code, response.json()
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
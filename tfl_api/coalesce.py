@@ -0,0 +1,132 @@
+"""Coalescing of identical requests to the TfL API that are in flight at the same time.
+
+"""
+import asyncio
+import threading
+from typing import Callable, Awaitable, Dict, Any, TypeVar
+
+T = TypeVar('T')
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce identical calls made from several threads at the same time into a single call.
+
+    The first caller with a given key makes the call, and callers with the same key that arrive while the
+    call is in flight wait for it and receive its result, or its error. Once the call is done, the next
+    caller with the key makes a new call; results are not cached.
+
+    """
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._n_calls = 0
+        self._n_coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """Call the function, unless a call with the same key is in flight, in which case wait for its result.
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                is_leader = True
+                self._n_calls += 1
+            else:
+                is_leader = False
+                self._n_coalesced += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """The number of calls made, the number of calls coalesced into them, and the calls in flight."""
+        with self._lock:
+            return {
+                'n_calls': self._n_calls,
+                'n_coalesced': self._n_coalesced,
+                'in_flight': len(self._calls),
+            }
+
+
+class _AsyncCall:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.n_waiters = 0
+
+
+class AsyncSingleFlight:
+    """Coalesce identical calls made from several asyncio tasks at the same time into a single call.
+
+    See `SingleFlight` for the semantics. The call runs as a task of its own, such that a caller that is
+    cancelled does not cancel the call for the other callers; the call is cancelled only once all its callers
+    are. An instance must only be used from a single event loop.
+
+    """
+    def __init__(self):
+        self._calls: Dict[str, _AsyncCall] = {}
+        self._n_calls = 0
+        self._n_coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await the coroutine function, unless a call with the same key is in flight, in which case await
+        its result.
+
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self._n_coalesced += 1
+        else:
+            call = _AsyncCall(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            self._n_calls += 1
+            call.task.add_done_callback(lambda task: self._done(key, call))
+
+        call.n_waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.n_waiters == 1:
+                call.task.cancel()
+            raise
+        finally:
+            call.n_waiters -= 1
+
+    def _done(self, key: str, call: _AsyncCall):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled():
+            # Mark the exception as retrieved, since there may be no caller left waiting for it
+            call.task.exception()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """The number of calls made, the number of calls coalesced into them, and the calls in flight."""
+        return {
+            'n_calls': self._n_calls,
+            'n_coalesced': self._n_coalesced,
+            'in_flight': len(self._calls),
+        }
@@ -6,8 +6,10 @@ from enum import Enum
 from dataclasses import dataclass
 from pydantic import BaseModel, field_validator, ConfigDict
 from datetime import datetime
+import asyncio
 
-from tfl_api import TFLClient
+from tfl_api import TFLClient, AsyncTFLClient, Priority
+from tfl_api.projection import Projection
 
 #
 # Search parameters and functionality for the Journey Planner
@@ -162,9 +164,21 @@ class JourneyPlannerSearchParams(BaseModel):
 class JourneyPlannerSearch:
     """Search for a journey between two locations, given a set of preferences and times.
 
+    Args:
+        client: The TfL client
+        priority: The priority of the searches, which matters if the client is rate limited
+        projection: Optional projection of the payloads, such that only the fields in the projection are
+            materialised from the response; see `JourneyPlannerSearchPayloadProcessor.projection`
+
     """
-    def __init__(self, client: TFLClient):
+    def __init__(self,
+                 client: TFLClient,
+                 priority: Priority = Priority.INTERACTIVE,
+                 projection: Optional[Projection] = None,
+                 ):
         self.client = client
+        self.priority = priority
+        self.projection = projection
         self._endpoint = 'Journey/JourneyResults'
         self.status_code = None
 
@@ -185,15 +199,35 @@ class JourneyPlannerSearch:
             params: The additional parameters for the journey search.
         
         """
-        from_loc = self._normalize_loc(from_loc)
-        to_loc = self._normalize_loc(to_loc)
-        _url = f'{self._endpoint}/{from_loc}/to/{to_loc}'
-        self.status_code, payload = self.client.get(
-            _url,
-            params=params.model_dump(by_alias=True)
-        )
+        self.status_code, payload = self.search(from_loc, to_loc, params)
         return payload
 
+    def search(self,
+               from_loc: Union[str, Tuple[float, float]],
+               to_loc: Union[str, Tuple[float, float]],
+               params: JourneyPlannerSearchParams,
+               priority: Optional[Priority] = None,
+               ) -> Tuple[int, Dict]:
+        """Plan a journey between two locations and return the status code along with the payload.
+
+        Unlike calling the object, the status code is not stored on the object, so the method can be
+        used from several threads at once. The priority of the search object can be overridden for
+        the search, for example for batch searches.
+
+        """
+        return self.client.get(
+            self._url(self._endpoint, from_loc, to_loc),
+            params=params.model_dump(by_alias=True),
+            priority=self.priority if priority is None else priority,
+            projection=self.projection,
+        )
+
+    @staticmethod
+    def _url(endpoint, from_loc, to_loc):
+        from_loc = JourneyPlannerSearch._normalize_loc(from_loc)
+        to_loc = JourneyPlannerSearch._normalize_loc(to_loc)
+        return f'{endpoint}/{from_loc}/to/{to_loc}'
+
     @staticmethod
     def _normalize_loc(loc):
         if isinstance(loc, tuple):
@@ -201,6 +235,62 @@ class JourneyPlannerSearch:
         return loc
 
 
+class AsyncJourneyPlannerSearch:
+    """Search for a journey between two locations without blocking the event loop.
+
+    The search returns the same payloads as `JourneyPlannerSearch`, so the payload processing is unchanged.
+
+    Args:
+        client: The asynchronous TfL client
+        max_concurrency: Optional maximum number of searches in flight at once through this object, in
+            addition to any bound set on the client
+        priority: The priority of the searches, which matters if the client is rate limited
+        projection: Optional projection of the payloads, see `JourneyPlannerSearch`
+
+    """
+    def __init__(self,
+                 client: AsyncTFLClient,
+                 max_concurrency: Optional[int] = None,
+                 priority: Priority = Priority.INTERACTIVE,
+                 projection: Optional[Projection] = None,
+                 ):
+        self.client = client
+        self.priority = priority
+        self.projection = projection
+        self._endpoint = 'Journey/JourneyResults'
+        self.status_code = None
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency is not None else None
+
+    async def __call__(self,
+                       from_loc: Union[str, Tuple[float, float]],
+                       to_loc: Union[str, Tuple[float, float]],
+                       params: JourneyPlannerSearchParams,
+                       ):
+        """Plan a journey between two locations, given a set of preferences and times.
+
+        See `JourneyPlannerSearch.__call__` for the accepted locations. Note that the status code stored on
+        the object is the one of the most recently completed search; concurrent callers should use `search`.
+
+        """
+        self.status_code, payload = await self.search(from_loc, to_loc, params)
+        return payload
+
+    async def search(self,
+                     from_loc: Union[str, Tuple[float, float]],
+                     to_loc: Union[str, Tuple[float, float]],
+                     params: JourneyPlannerSearchParams,
+                     ) -> Tuple[int, Dict]:
+        """Plan a journey between two locations and return the status code along with the payload.
+
+        """
+        _url = JourneyPlannerSearch._url(self._endpoint, from_loc, to_loc)
+        _params = params.model_dump(by_alias=True)
+        if self._semaphore is None:
+            return await self.client.get(_url, params=_params, priority=self.priority, projection=self.projection)
+        async with self._semaphore:
+            return await self.client.get(_url, params=_params, priority=self.priority, projection=self.projection)
+
+
 #
 # Output payload processing parameter and functionality for the Journey Planner
 #
@@ -264,9 +354,23 @@ def _disambiguate_loc(option, match_thrs) -> Optional[Union[str, Tuple[float, fl
         raise RuntimeError(f'Could not disambiguate location in payload: {option}')
 
 
-def _get_nested_value(d: Dict, path: Sequence[str]) -> Any:
-    """Helper function to get a value from a nested dictionary."""
-    return _get_nested_value(d.get(path[0], {}), path[1:]) if path else d
+def _get_path(d: Dict, path: Tuple[str, ...]) -> Any:
+    """Helper function to get a value from a nested dictionary along a precomputed path, without recursion."""
+    for key in path:
+        d = d.get(key, {})
+    return d
+
+
+def _compile_accessor_plan(fields: Sequence[str], mappings: Sequence[FieldMapping]) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """Compile the fields to retrieve into pairs of the target field and its source path split into keys."""
+    source_paths = {mapping.target_field: tuple(mapping.source_path.split('.')) for mapping in mappings}
+    plan = []
+    for field in fields:
+        try:
+            plan.append((field, source_paths[field]))
+        except KeyError:
+            raise ValueError(f'Unknown field to retrieve: {field}')
+    return tuple(plan)
 
 
 class JourneyPlannerSearchPayloadProcessor:
@@ -281,15 +385,23 @@ class JourneyPlannerSearchPayloadProcessor:
     """
     def __init__(self,
                  matching_threshold: float = 900.0,
-                 leg_data_to_retrieve: Sequence[str] = ('mode of transport',),
-                 step_data_to_retrieve: Sequence[str] = ('descriptionHeading', 'description', 'distance', 'skyDirectionDescription'),
+                 leg_data_to_retrieve: Sequence[str] = ('mode_transport',),
+                 step_data_to_retrieve: Sequence[str] = ('description_heading', 'description', 'distance', 'direction'),
                  ):
         self.matching_threshold = matching_threshold
         self.leg_data_to_retrieve = leg_data_to_retrieve
         self.step_data_to_retrieve = step_data_to_retrieve
-        for field in self.leg_data_to_retrieve:
-            if not any(field in mapping.target_field for mapping in JOURNEY_LEG_DATA):
-                raise ValueError(f'Unknown field to retrieve: {field}')
+
+        # The field mappings are compiled once into plans of (target field, source path) pairs, such that
+        # the extraction per journey is a tight loop without look-ups or string splitting
+        self._main_plan = _compile_accessor_plan(
+            [mapping.target_field for mapping in JOURNEY_MAIN_DATA if mapping.target_field != 'legs'],
+            JOURNEY_MAIN_DATA,
+        )
+        self._leg_plan = _compile_accessor_plan(self.leg_data_to_retrieve, JOURNEY_LEG_DATA)
+        self._step_plan = ()
+        if 'instruction_steps' in self.leg_data_to_retrieve:
+            self._step_plan = _compile_accessor_plan(self.step_data_to_retrieve, JOURNEY_STEP_DATA)
 
         self.MATCH_STATUS_TO_DISAMBIGUATE = ['list']
         self.MATCH_STATUS_MATCHED = ['identified']
@@ -298,6 +410,20 @@ class JourneyPlannerSearchPayloadProcessor:
         self._loc_from = None
         self._loc_to = None
 
+    @property
+    def projection(self) -> Projection:
+        """The projection of the journey payloads onto the fields the processor retrieves, which enables
+        the response to be parsed incrementally with only those fields materialised.
+
+        """
+        paths = [f'journeys.item.{".".join(source_path)}' for _, source_path in self._main_plan]
+        for target_field, source_path in self._leg_plan:
+            leg_path = f'journeys.item.legs.item.{".".join(source_path)}'
+            if target_field == 'instruction_steps':
+                paths.extend(f'{leg_path}.item.{".".join(step_path)}' for _, step_path in self._step_plan)
+            paths.append(leg_path)
+        return Projection(paths)
+
     def journeys(self,
                  payload: Dict,
                  ) -> Generator[Dict[str, List[Dict]], None, None]:
@@ -309,25 +435,19 @@ class JourneyPlannerSearchPayloadProcessor:
         constants `JOURNEY_MAIN_DATA`, `JOURNEY_LEG_DATA`, and `JOURNEY_STEP_DATA`.
 
         """
+        main_plan = self._main_plan
+        leg_plan = self._leg_plan
         for journey in payload['journeys']:
-            j_data = {
-                field.target_field: _get_nested_value(journey, field.source_path.split('.'))
-                for field in JOURNEY_MAIN_DATA
-            }
+            j_data = {target_field: _get_path(journey, source_path) for target_field, source_path in main_plan}
 
             legs = []
             for leg in journey['legs']:
                 leg_data = {}
-                for leg_data_key in self.leg_data_to_retrieve:
-                    try:
-                        source_path = next(mapping.source_path for mapping in JOURNEY_LEG_DATA if mapping.target_field == leg_data_key)
-                    except StopIteration:
-                        raise ValueError(f'Unknown field to retrieve: {leg_data_key}')
-
-                    leg_data_value = _get_nested_value(leg, source_path.split('.'))
-                    if leg_data_key == 'instruction_steps':
+                for target_field, source_path in leg_plan:
+                    leg_data_value = _get_path(leg, source_path)
+                    if target_field == 'instruction_steps':
                         leg_data_value = self._collect_step_data(leg_data_value)
-                    leg_data[leg_data_key] = leg_data_value
+                    leg_data[target_field] = leg_data_value
 
                 legs.append(leg_data)
             j_data['legs'] = legs
@@ -335,21 +455,11 @@ class JourneyPlannerSearchPayloadProcessor:
             yield j_data
 
     def _collect_step_data(self, steps: Sequence[Dict]):
-        ret = []
-        for step in steps:
-            step_data = {}
-            for step_data_key in self.step_data_to_retrieve:
-                try:
-                    source_path = next(mapping.source_path for mapping in JOURNEY_STEP_DATA if mapping.target_field == step_data_key)
-                except StopIteration:
-                    raise ValueError(f'Unknown field to retrieve: {step_data_key}')
-
-                step_data_value = _get_nested_value(step, source_path.split('.'))
-                step_data[step_data_key] = step_data_value
-
-            ret.append(step_data)
-
-        return ret
+        step_plan = self._step_plan
+        return [
+            {target_field: _get_path(step, source_path) for target_field, source_path in step_plan}
+            for step in steps
+        ]
 
     def _disambiguate_loc_type(self, type_: str, payload: Dict) -> List:
         """Determine if there are disambiguation options for a location type in the payload, and if so,
@@ -380,6 +490,9 @@ class JourneyPlannerSearchPayloadProcessor:
         If a location sent to the TfL API is ambiguous, the API will return a list of options to choose from.
         This method extracts the disambiguation options such that new searches can be performed.
 
+        Note that the options are stored on the object; to disambiguate payloads from several threads at
+        once, use `disambiguated_locs` instead.
+
         """
         self._loc_from = self._disambiguate_loc_type('from', payload)
         self._loc_to = self._disambiguate_loc_type('to', payload)
@@ -395,6 +508,36 @@ class JourneyPlannerSearchPayloadProcessor:
         except AttributeError:
             raise ValueError(f'Unknown location type: {type_}')
 
+        return self._transform_loc(type_, val, loc)
+
+    def disambiguated_locs(self, payload: Dict, from_loc, to_loc) -> Tuple[List, List]:
+        """Disambiguate the payload from the journey planner and transform the starting and destination
+        locations to their disambiguated locations, without storing any state on the object.
+
+        """
+        return (
+            self._transform_loc('from', self._disambiguate_loc_type('from', payload), from_loc),
+            self._transform_loc('to', self._disambiguate_loc_type('to', payload), to_loc),
+        )
+
+    def resolved_options(self, type_: str, payload: Dict) -> List[Tuple[Union[str, Tuple[float, float]], float]]:
+        """The disambiguation options of a location type in the payload that meet the matching threshold,
+        as pairs of the disambiguated location and its match quality. The list is empty if the location
+        did not need disambiguation.
+
+        """
+        disambiguation = payload.get(f'{type_}LocationDisambiguation', {})
+        if disambiguation.get('matchStatus') not in self.MATCH_STATUS_TO_DISAMBIGUATE:
+            return []
+        ret = []
+        for option in disambiguation['disambiguationOptions']:
+            loc = _disambiguate_loc(option, self.matching_threshold)
+            if loc is not None:
+                ret.append((loc, float(option['matchQuality'])))
+        return ret
+
+    @staticmethod
+    def _transform_loc(type_: str, val: List, loc) -> List:
         if len(val) == 0:
             raise ValueError(f'No disambiguation options found for location type {type_}')
 
@@ -0,0 +1,210 @@
+"""Streaming extraction of select fields from the JSON payloads of the TfL API.
+
+The payloads of the Journey/JourneyResults endpoint are often hundreds of KB, of which only a handful of
+fields are used. Rather than to parse the entire document into memory, the response bytes are parsed
+incrementally and only the fields in a projection are materialised. The projected payload has the same
+structure as the full payload, only with fewer keys, so the payload processing is unchanged.
+
+If all fields of the projection are below the elements of one array, such as the journeys in a journey
+payload, the elements are built one at a time by the parser backend and projected before the next is
+parsed, which is faster than to build the projected document event by event in Python.
+
+"""
+import hashlib
+from typing import Iterable, Any, BinaryIO, Optional, List
+import ijson
+
+
+class Projection:
+    """The fields of a JSON document to materialise, as dot-separated paths.
+
+    Elements of arrays are denoted by `item` in the paths, as in `journeys.item.legs.item.duration`. If a path
+    leads to an object or array, it is materialised in full.
+
+    Args:
+        paths: The paths of the fields to materialise
+
+    """
+    def __init__(self, paths: Iterable[str]):
+        paths = set(paths)
+        self.leaves = frozenset(
+            path for path in paths if not any(other.startswith(path + '.') for other in paths)
+        )
+        ancestors = set()
+        for leaf in self.leaves:
+            parts = leaf.split('.')
+            for k in range(1, len(parts) + 1):
+                ancestors.add('.'.join(parts[:k]))
+        self.allowed = frozenset(ancestors)
+        self.item_prefix = self._common_item_prefix(self.leaves)
+        self.key = hashlib.sha1('|'.join(sorted(self.leaves)).encode('utf-8')).hexdigest()[:12]
+
+    @staticmethod
+    def _common_item_prefix(leaves) -> Optional[str]:
+        """The path of the array elements that all leaves are below, provided it is the only array on the path
+        from the root. Then the elements can be built one at a time by the parser backend.
+
+        """
+        if not leaves:
+            return None
+        common = []
+        for parts in zip(*(leaf.split('.') for leaf in leaves)):
+            if len(set(parts)) > 1:
+                break
+            common.append(parts[0])
+        if 'item' not in common:
+            return None
+        common = common[:common.index('item') + 1]
+        if any(leaf == '.'.join(common) for leaf in leaves):
+            return None
+        return '.'.join(common)
+
+    def __contains__(self, path: str):
+        return path in self.allowed
+
+    def __eq__(self, other):
+        return isinstance(other, Projection) and self.leaves == other.leaves
+
+    def __hash__(self):
+        return hash(self.leaves)
+
+
+class _ProjectedBuilder:
+    """Build the projected document from the events of an incremental JSON parser."""
+    def __init__(self, projection: Projection):
+        self.projection = projection
+        self.root = None
+        self._stack = []
+        self._skip_depth = 0
+        self._skip_next = False
+        self._key = None
+
+    def event(self, prefix: str, event: str, value: Any):
+        if self._skip_depth:
+            if event == 'start_map' or event == 'start_array':
+                self._skip_depth += 1
+            elif event == 'end_map' or event == 'end_array':
+                self._skip_depth -= 1
+            return
+
+        if self._skip_next:
+            self._skip_next = False
+            if event == 'start_map' or event == 'start_array':
+                self._skip_depth = 1
+            return
+
+        if event == 'map_key':
+            # Keys below a fully materialised leaf are kept without look-up in the projection
+            if not self._stack[-1][1] and (f'{prefix}.{value}' if prefix else value) not in self.projection.allowed:
+                self._skip_next = True
+            self._key = value
+        elif event == 'start_map' or event == 'start_array':
+            container = {} if event == 'start_map' else []
+            keep_all = self._stack[-1][1] if self._stack else False
+            if not keep_all and prefix in self.projection.leaves:
+                keep_all = True
+            self._add(container)
+            self._stack.append((container, keep_all))
+        elif event == 'end_map' or event == 'end_array':
+            self._stack.pop()
+        else:
+            self._add(value)
+
+    def _add(self, value):
+        if not self._stack:
+            self.root = value
+            return
+        container = self._stack[-1][0]
+        if isinstance(container, dict):
+            container[self._key] = value
+        else:
+            container.append(value)
+
+
+def extract_projected(stream: BinaryIO, projection: Projection) -> Any:
+    """Parse the JSON document in the stream of bytes incrementally, and materialise only the fields in
+    the projection.
+
+    Args:
+        stream: The file-like object of bytes of the JSON document, such as the raw response stream
+        projection: The fields to materialise
+
+    """
+    if projection.item_prefix is not None:
+        items = [
+            project_payload(item, projection, projection.item_prefix)
+            for item in ijson.items(stream, projection.item_prefix, use_float=True)
+        ]
+        return _wrap_items(items, projection.item_prefix)
+
+    builder = _ProjectedBuilder(projection)
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        builder.event(prefix, event, value)
+    return builder.root
+
+
+def _wrap_items(items: List, item_prefix: str) -> Any:
+    """Wrap the array elements in the objects on the path from the root of the document to the array."""
+    ret = items
+    for key in reversed(item_prefix.split('.')[:-1]):
+        ret = {key: ret}
+    return ret
+
+
+async def extract_projected_async(stream, projection: Projection) -> Any:
+    """Parse the JSON document in the asynchronous stream of bytes incrementally, and materialise only the
+    fields in the projection.
+
+    Args:
+        stream: An object with an asynchronous `read` method that returns bytes
+        projection: The fields to materialise
+
+    """
+    if projection.item_prefix is not None:
+        items = [
+            project_payload(item, projection, projection.item_prefix)
+            async for item in ijson.items_async(stream, projection.item_prefix, use_float=True)
+        ]
+        return _wrap_items(items, projection.item_prefix)
+
+    builder = _ProjectedBuilder(projection)
+    async for prefix, event, value in ijson.parse_async(stream, use_float=True):
+        builder.event(prefix, event, value)
+    return builder.root
+
+
+def project_payload(payload: Any, projection: Projection, _prefix: str = '') -> Any:
+    """Apply the projection to a payload that has already been parsed in full.
+
+    """
+    if _prefix in projection.leaves:
+        return payload
+    if isinstance(payload, dict):
+        ret = {}
+        for key, value in payload.items():
+            path = f'{_prefix}.{key}' if _prefix else key
+            if path in projection.allowed:
+                ret[key] = project_payload(value, projection, path)
+        return ret
+    elif isinstance(payload, list):
+        path = f'{_prefix}.item' if _prefix else 'item'
+        return [project_payload(value, projection, path) for value in payload]
+    return payload
+
+
+class AsyncByteReader:
+    """Adapt an asynchronous iterator of byte chunks, such as `httpx.Response.aiter_bytes()`, to the
+    asynchronous `read` method the incremental parser requires.
+
+    """
+    def __init__(self, chunks):
+        self._chunks = chunks.__aiter__()
+
+    async def read(self, n: int = -1) -> bytes:
+        # The parser reads zero bytes to probe the type of the stream, which must not consume a chunk
+        if n == 0:
+            return b''
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b''
@@ -0,0 +1,177 @@
+"""Client-side rate limiting of requests to the TfL API.
+
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from enum import IntEnum
+from typing import Optional, Dict, Union
+
+
+class Priority(IntEnum):
+    """The priority of a request to the TfL API; lower values go first."""
+    INTERACTIVE = 0
+    BACKGROUND = 10
+    BATCH = 20
+
+
+class TokenBucketRateLimiter:
+    """Token bucket rate limiter that keeps the requests to the TfL API within the quota of the app key.
+
+    Tokens are added to the bucket at a steady rate up to the capacity of the bucket, and every request
+    takes one token. When the bucket is empty, requests wait in a priority queue, such that interactive
+    requests are let through before background and batch requests. The limiter can be shared between
+    threads and asyncio tasks, and between synchronous and asynchronous clients.
+
+    Args:
+        requests_per_minute: The quota of requests per minute
+        burst: The capacity of the bucket, which is the largest burst of requests let through at once;
+            defaults to a tenth of the quota per minute
+
+    """
+    def __init__(self,
+                 requests_per_minute: float = 500.0,
+                 burst: Optional[int] = None,
+                 ):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1, int(requests_per_minute / 10))
+
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        self._n_acquired = 0
+        self._n_throttled = 0
+        self._n_throttled_responses = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def acquire(self,
+                priority: Union[Priority, int] = Priority.INTERACTIVE,
+                timeout: Optional[float] = None,
+                ) -> float:
+        """Take a token from the bucket, blocking the thread until one is available.
+
+        Args:
+            priority: The priority of the request
+            timeout: Optional maximum time in seconds to wait for a token
+
+        Returns:
+            The time in seconds the request waited
+
+        """
+        t_start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    delay = self._try_take(ticket, t_start)
+                    if delay is None:
+                        return time.monotonic() - t_start
+                    if timeout is not None:
+                        remaining = timeout - (time.monotonic() - t_start)
+                        if remaining <= 0:
+                            raise TimeoutError('Timed out waiting for the TfL API rate limiter')
+                        delay = remaining if delay < 0 else min(delay, remaining)
+                    self._cond.wait(None if delay < 0 else delay)
+            except BaseException:
+                self._dequeue(ticket)
+                raise
+
+    async def acquire_async(self,
+                            priority: Union[Priority, int] = Priority.INTERACTIVE,
+                            timeout: Optional[float] = None,
+                            poll_interval: float = 0.05,
+                            ) -> float:
+        """Take a token from the bucket, without blocking the event loop while waiting for one.
+
+        Args:
+            priority: The priority of the request
+            timeout: Optional maximum time in seconds to wait for a token
+            poll_interval: The interval in seconds to check the queue while other requests go first
+
+        Returns:
+            The time in seconds the request waited
+
+        """
+        t_start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_take(ticket, t_start)
+                if delay is None:
+                    return time.monotonic() - t_start
+                delay = poll_interval if delay < 0 else min(delay, poll_interval)
+                if timeout is not None and time.monotonic() - t_start + delay > timeout:
+                    raise TimeoutError('Timed out waiting for the TfL API rate limiter')
+                await asyncio.sleep(delay)
+        except BaseException:
+            with self._cond:
+                self._dequeue(ticket)
+            raise
+
+    def record_throttled_response(self):
+        """Record that the TfL API responded that the quota was exceeded, despite the limiter."""
+        with self._cond:
+            self._n_throttled_responses += 1
+
+    def _enqueue(self, priority):
+        ticket = (int(priority), next(self._seq))
+        heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _dequeue(self, ticket):
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+            self._cond.notify_all()
+
+    def _try_take(self, ticket, t_start) -> Optional[float]:
+        """Take a token for the ticket if it is first in the queue and a token is available. If not, return
+        the time until a token is available, or a negative number if other requests are ahead in the queue.
+        Must be called with the lock held.
+
+        """
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+        if self._waiters[0] != ticket:
+            return -1.0
+        if self._tokens < 1.0:
+            return (1.0 - self._tokens) / self.rate
+
+        heapq.heappop(self._waiters)
+        self._tokens -= 1.0
+        wait = now - t_start
+        self._n_acquired += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        if wait > 0.001:
+            self._n_throttled += 1
+        self._cond.notify_all()
+        return None
+
+    @property
+    def metrics(self) -> Dict[str, float]:
+        """Metrics of the limiter: the depth of the queue, the waiting times, and how many requests were
+        throttled by the limiter or by the TfL API.
+
+        """
+        with self._cond:
+            return {
+                'queue_depth': len(self._waiters),
+                'tokens_available': self._tokens,
+                'n_acquired': self._n_acquired,
+                'n_throttled': self._n_throttled,
+                'throttled_rate': self._n_throttled / self._n_acquired if self._n_acquired else 0.0,
+                'n_throttled_responses': self._n_throttled_responses,
+                'mean_wait': self._total_wait / self._n_acquired if self._n_acquired else 0.0,
+                'max_wait': self._max_wait,
+            }
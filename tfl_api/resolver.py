@@ -0,0 +1,109 @@
+"""Cache of how free-text locations resolved in the TfL Journey API.
+
+"""
+import os
+import json
+import time
+import threading
+from typing import Optional, Dict, List, Tuple, Union, Sequence
+
+Location = Union[str, Tuple[float, float]]
+
+
+def _normalize_name(name: str) -> str:
+    return ' '.join(name.lower().split())
+
+
+class LocationResolverCache:
+    """Remember how free-text locations, such as "Tate Modern" or "King's Cross", were disambiguated by the
+    TfL API, so later searches for the same names can use the resolved locations directly and skip the
+    round trip that returns the disambiguation options.
+
+    A resolution is the list of disambiguated locations, each an ICS code, a Naptan id or a lat/lon pair,
+    along with the match quality the TfL API reported. The cache can be persisted to a JSON file.
+
+    Args:
+        file_path: Optional path to the JSON file the cache is loaded from and saved to
+        max_age: The time in seconds after which a resolution expires
+        autosave: Whether to save the cache to file whenever a resolution is added
+
+    """
+    def __init__(self,
+                 file_path: Optional[str] = None,
+                 max_age: float = 7 * 24 * 3600.0,
+                 autosave: bool = True,
+                 ):
+        self.file_path = file_path
+        self.max_age = max_age
+        self.autosave = autosave
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._n_hits = 0
+        self._n_misses = 0
+
+        if self.file_path is not None and os.path.exists(self.file_path):
+            self.load()
+
+    def get(self, name: Location) -> Optional[List[Location]]:
+        """Get the resolved locations for the name, or None if the name has not been resolved or the
+        resolution has expired.
+
+        """
+        options = self.get_with_quality(name)
+        if options is None:
+            return None
+        return [loc for loc, _ in options]
+
+    def get_with_quality(self, name: Location) -> Optional[List[Tuple[Location, float]]]:
+        """Get the resolved locations for the name along with their match quality."""
+        if not isinstance(name, str):
+            return None
+        key = _normalize_name(name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry['created'] > self.max_age:
+                self._n_misses += 1
+                return None
+            self._n_hits += 1
+            return [
+                (tuple(loc) if isinstance(loc, list) else loc, quality)
+                for loc, quality in entry['options']
+            ]
+
+    def put(self, name: Location, options: Sequence[Tuple[Location, float]]):
+        """Add the resolution of the name, as pairs of resolved location and match quality."""
+        if not isinstance(name, str) or len(options) == 0:
+            return
+        with self._lock:
+            self._entries[_normalize_name(name)] = {
+                'options': [[loc, quality] for loc, quality in options],
+                'created': time.time(),
+            }
+        if self.autosave and self.file_path is not None:
+            self.save()
+
+    def load(self):
+        """Load the resolutions from file, dropping expired ones."""
+        with open(self.file_path, 'r') as f:
+            entries = json.load(f)
+        now = time.time()
+        with self._lock:
+            self._entries = {
+                key: entry for key, entry in entries.items() if now - entry['created'] <= self.max_age
+            }
+
+    def save(self):
+        """Save the resolutions to file."""
+        with self._lock:
+            tmp_path = f'{self.file_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.file_path)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self._n_hits, 'misses': self._n_misses}
+
+    def __len__(self):
+        return len(self._entries)